@@ -0,0 +1,108 @@
+"""
+Activation Benchmark
+Compares the previous activation flow (read profile, read plan, update,
+update_many + insert_one for devices, re-read profile) against the single
+conditional find_one_and_update plus one devices bulk_write. Reports MongoDB
+round-trips and latency per activation.
+
+Needs a MongoDB server (uses a throwaway database).
+Run from backend/: MONGO_URL=mongodb://localhost:27017 python -m benchmarks.bench_activation [--profiles 500]
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from services.esim_service import ESIMService
+from services.plan_catalog import PlanCatalog
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def legacy_activate(db, profile_id: str, user_id: str) -> dict:
+    """The activation flow as it was before the single-round-trip rewrite"""
+    profile = await db.esim_profiles.find_one({"profile_id": profile_id, "user_id": user_id}, {"_id": 0})
+    if profile["status"] == "active":
+        raise ValueError("Profile is already active")
+    plan = await db.plans.find_one({"plan_id": profile["plan_id"]})
+    await db.esim_profiles.update_one({"profile_id": profile_id}, {"$set": {
+        "status": "active",
+        "activation_date": datetime.utcnow(),
+        "expiry_date": datetime.utcnow() + timedelta(days=plan.get("validity_days", 30)),
+        "device_type": "ios",
+        "data_limit_gb": plan.get("data_gb", 0),
+    }})
+    await db.devices.update_many({"profile_id": profile_id, "is_active": True}, {"$set": {"is_active": False}})
+    await db.devices.insert_one({"device_id": str(uuid.uuid4()), "profile_id": profile_id, "is_active": True})
+    return await db.esim_profiles.find_one({"profile_id": profile_id}, {"_id": 0})
+
+
+async def run(url: str, profiles: int) -> None:
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(url, event_listeners=[counter])
+    name = f"esim_bench_{uuid.uuid4().hex[:8]}"
+    db = client[name]
+    try:
+        catalog = PlanCatalog(db, refresh_interval_seconds=0)
+        await catalog.seed_defaults()
+        await catalog.load()
+        await db.esim_profiles.create_index("profile_id", unique=True)
+        await db.devices.create_index("profile_id")
+        service = ESIMService(db, plan_catalog=catalog)
+
+        for mode in ("legacy", "single"):
+            ids = [f"{mode}-{n}" for n in range(profiles)]
+            await db.esim_profiles.insert_many([
+                {"profile_id": pid, "user_id": "u1", "plan_id": "plan_premium_5g", "status": "inactive",
+                 "created_at": datetime.utcnow()}
+                for pid in ids
+            ])
+            latencies = []
+            commands = counter.count
+            for pid in ids:
+                started = time.perf_counter()
+                if mode == "legacy":
+                    await legacy_activate(db, pid, "u1")
+                else:
+                    await service.activate_profile(pid, "u1", "ios")
+                latencies.append((time.perf_counter() - started) * 1000)
+            round_trips = (counter.count - commands) / profiles
+            latencies.sort()
+            print(
+                f"{mode}: round_trips={round_trips:.1f} "
+                f"p50_ms={statistics.median(latencies):.2f} p99_ms={latencies[int(len(latencies) * 0.99) - 1]:.2f}"
+            )
+    finally:
+        await client.drop_database(name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=500)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    args = parser.parse_args()
+    asyncio.run(run(args.mongo_url, args.profiles))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Device Lookup Benchmark
+Compares the original linear fuzzy match over the compatibility list against
+the compiled device catalog, with and without the lookup cache.
+
+Run from backend/: python -m benchmarks.bench_device_lookup [--count 10000] [--repeat 5]
+"""
+
+import argparse
+import random
+import timeit
+
+from services.device_catalog import DeviceCatalog
+
+# Original NexoraAIService.DEVICE_COMPATIBILITY
+LEGACY_COMPATIBILITY = {
+    "ios": [
+        "iPhone XS", "iPhone XS Max", "iPhone XR",
+        "iPhone 11", "iPhone 11 Pro", "iPhone 11 Pro Max",
+        "iPhone SE (2nd)", "iPhone SE (3rd)",
+        "iPhone 12", "iPhone 12 mini", "iPhone 12 Pro", "iPhone 12 Pro Max",
+        "iPhone 13", "iPhone 13 mini", "iPhone 13 Pro", "iPhone 13 Pro Max",
+        "iPhone 14", "iPhone 14 Plus", "iPhone 14 Pro", "iPhone 14 Pro Max",
+        "iPhone 15", "iPhone 15 Plus", "iPhone 15 Pro", "iPhone 15 Pro Max",
+        "iPhone 16", "iPhone 16 Plus", "iPhone 16 Pro", "iPhone 16 Pro Max",
+        "iPad Pro (3rd+)", "iPad Air (3rd+)", "iPad (7th+)", "iPad mini (5th+)",
+        "Apple Watch Series 3+", "Apple Watch SE", "Apple Watch Ultra"
+    ],
+    "android": [
+        "Samsung Galaxy S20+", "Samsung Galaxy S21+", "Samsung Galaxy S22+", "Samsung Galaxy S23+", "Samsung Galaxy S24+",
+        "Samsung Galaxy Z Fold", "Samsung Galaxy Z Flip",
+        "Google Pixel 3+", "Google Pixel 4+", "Google Pixel 5+", "Google Pixel 6+", "Google Pixel 7+", "Google Pixel 8+",
+        "Huawei P40+", "Huawei Mate 40+",
+        "Xiaomi 12+", "Xiaomi 13+", "Xiaomi 14+",
+        "OPPO Find X3+", "OPPO Find X5+",
+        "OnePlus 9+", "OnePlus 10+", "OnePlus 11+", "OnePlus 12+"
+    ],
+}
+
+SAMPLE_MODELS = [
+    ("ios", "iPhone 15 Pro"), ("ios", "iPhone 13"), ("ios", "iPhone XR"), ("ios", "iPhone 8 Plus"),
+    ("ios", "iPhone SE (3rd generation)"), ("ios", "iPad Air (5th generation)"), ("ios", "iPhone14,5"),
+    ("android", "SM-S918B"), ("android", "SM-A546E"), ("android", "Pixel 8 Pro"), ("android", "Pixel 4a"),
+    ("android", "Samsung Galaxy S23 Ultra"), ("android", "Redmi Note 12 Pro"), ("android", "Xiaomi 13T"),
+    ("android", "CPH2305"), ("android", "ONEPLUS A6013"), ("android", "Huawei P30 Pro"),
+]
+
+
+def legacy_fuzzy_match(input_str: str, target: str) -> bool:
+    """Original NexoraAIService._fuzzy_match"""
+    input_lower = input_str.lower().replace(" ", "").replace("-", "")
+    target_lower = target.lower().replace(" ", "").replace("-", "")
+    if input_lower == target_lower:
+        return True
+    if input_lower in target_lower or target_lower in input_lower:
+        return True
+    shorter = min(input_lower, target_lower, key=len)
+    longer = max(input_lower, target_lower, key=len)
+    return shorter in longer
+
+
+def legacy_lookup(platform: str, model: str):
+    """Original verify_device_eligibility model scan: first fuzzy match wins"""
+    for supported_model in LEGACY_COMPATIBILITY[platform]:
+        if legacy_fuzzy_match(model, supported_model):
+            return supported_model
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000, help="lookups per run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lookups = [rng.choice(SAMPLE_MODELS) for _ in range(args.count)]
+    catalog = DeviceCatalog.load()
+    uncached = DeviceCatalog.load(cache_size=0)
+
+    def per_lookup_us(fn) -> float:
+        return timeit.timeit(lambda: [fn(p, m) for p, m in lookups], number=args.repeat) / args.repeat / args.count * 1_000_000
+
+    legacy = per_lookup_us(legacy_lookup)
+    index = per_lookup_us(uncached.lookup)
+    cached = per_lookup_us(catalog.lookup)
+    print(f"lookup: legacy_us={legacy:.2f} index_us={index:.2f} cached_us={cached:.2f} "
+          f"speedup={legacy / index:.1f}x/{legacy / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Login Storm Benchmark
+Measures p50/p99 latency of an unrelated endpoint while a burst of logins
+runs bcrypt, comparing inline hashing against the PasswordHasher pool.
+
+Run from backend/: python -m benchmarks.bench_login_storm [--logins 40] [--pings 200]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from services.auth_service import create_password_context
+from services.password_hasher import PasswordHasher
+
+
+def build_app(mode: str, context, password_hash: str, hasher: PasswordHasher) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login():
+        if mode == "inline":
+            ok = context.verify("CorrectHorse42!", password_hash)
+        else:
+            ok = await hasher.verify("CorrectHorse42!", password_hash)
+        return {"ok": ok}
+
+    @app.get("/ping")
+    async def ping():
+        return {"pong": True}
+
+    return app
+
+
+async def run(mode: str, logins: int, pings: int, rounds: int, workers: int) -> dict:
+    context = create_password_context(rounds)
+    password_hash = context.hash("CorrectHorse42!")
+    hasher = PasswordHasher(context, max_workers=workers, max_queue=logins)
+    app = build_app(mode, context, password_hash, hasher)
+
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+
+        async def timed_ping(i: int):
+            # Latency is measured from the scheduled send time, so a stalled loop
+            # shows up in the numbers instead of silently delaying the sender
+            scheduled = started + i * 0.005
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            await client.get("/ping")
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+
+        await asyncio.gather(
+            *(client.post("/login") for _ in range(logins)),
+            *(timed_ping(i) for i in range(pings)),
+        )
+        elapsed = time.perf_counter() - started
+
+    hasher.shutdown()
+    latencies.sort()
+    return {
+        "mode": mode,
+        "wall_s": round(elapsed, 2),
+        "ping_p50_ms": round(statistics.median(latencies), 2),
+        "ping_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+        "ping_max_ms": round(latencies[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--pings", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=4, help="hashing pool size")
+    args = parser.parse_args()
+
+    for mode in ("inline", "pool"):
+        result = asyncio.run(run(mode, args.logins, args.pings, args.rounds, args.workers))
+        print(" ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
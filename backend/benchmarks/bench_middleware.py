@@ -0,0 +1,138 @@
+"""
+Middleware Stack Benchmark
+Measures per-request overhead of the security middleware stack (rate limit,
+security headers, request logging) as the legacy BaseHTTPMiddleware classes
+versus the raw ASGI implementations, against the same app without middleware.
+
+Run from backend/: python -m benchmarks.bench_middleware [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import logging
+import secrets
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware.rate_limiter import TokenBucketLimiter
+from middleware.security import (
+    CSP_DIRECTIVES,
+    PERMISSIONS_POLICY,
+    RateLimitMiddleware,
+    RequestLoggingMiddleware,
+    SecurityHeadersMiddleware,
+)
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """Previous implementation: same checks, run through BaseHTTPMiddleware"""
+
+    def __init__(self, app, **kwargs):
+        super().__init__(app)
+        self.checker = RateLimitMiddleware(app, **kwargs)
+
+    async def dispatch(self, request: Request, call_next):
+        rejection = await self.checker._check(request.scope)
+        return rejection if rejection is not None else await call_next(request)
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    """Previous implementation: headers rebuilt and set one by one per response"""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = ", ".join(PERMISSIONS_POLICY)
+        response.headers["Content-Security-Policy"] = "; ".join(list(CSP_DIRECTIVES))
+        response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
+        response.headers["Cross-Origin-Resource-Policy"] = "same-origin"
+        response.headers["Strict-Transport-Security"] = "max-age=63072000; includeSubDomains; preload"
+        if request.url.path.startswith("/api/") and "Cache-Control" not in response.headers:
+            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate, max-age=0"
+            response.headers["Pragma"] = "no-cache"
+            response.headers["Expires"] = "0"
+        if "Server" in response.headers:
+            del response.headers["Server"]
+        if "X-Powered-By" in response.headers:
+            del response.headers["X-Powered-By"]
+        return response
+
+
+class LegacyRequestLoggingMiddleware(BaseHTTPMiddleware):
+    """Previous implementation: request ID and access log via BaseHTTPMiddleware"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.helper = RequestLoggingMiddleware(app)
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        request_id = secrets.token_hex(8)
+        log_path = self.helper._sanitize_path(request.url.path)
+        logging.getLogger("esim_security").info(f"[{request_id}] {request.method} {log_path}")
+        response = await call_next(request)
+        duration = time.time() - start_time
+        logging.getLogger("esim_security").info(
+            f"[{request_id}] {request.method} {log_path} - Status: {response.status_code} - Duration: {duration:.3f}s"
+        )
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+def make_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/plans")
+    async def plans():
+        return {"plans": [{"plan_id": "plan_basic_5g", "price": 5000}]}
+
+    if stack == "legacy":
+        app.add_middleware(LegacyRequestLoggingMiddleware)
+        app.add_middleware(LegacySecurityHeadersMiddleware)
+        app.add_middleware(LegacyRateLimitMiddleware, requests_per_minute=10**9, limiter=TokenBucketLimiter())
+    elif stack == "asgi":
+        app.add_middleware(RequestLoggingMiddleware)
+        app.add_middleware(SecurityHeadersMiddleware)
+        app.add_middleware(RateLimitMiddleware, requests_per_minute=10**9, limiter=TokenBucketLimiter())
+    return app
+
+
+async def measure(stack: str, requests: int) -> float:
+    """Mean microseconds per request through httpx's in-process ASGI transport"""
+    transport = httpx.ASGITransport(app=make_app(stack))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):  # Warm-up
+            await client.get("/api/plans")
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/api/plans")
+            assert response.status_code == 200
+        return (time.perf_counter() - started) / requests * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Keep log I/O out of the measurement (messages are still built)
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("esim_security").setLevel(logging.WARNING)
+
+    bare = asyncio.run(measure("none", args.requests))
+    legacy = asyncio.run(measure("legacy", args.requests))
+    asgi = asyncio.run(measure("asgi", args.requests))
+    print(f"no middleware: {bare:.1f} us/request")
+    print(f"legacy stack:  {legacy:.1f} us/request (overhead {legacy - bare:.1f} us)")
+    print(f"asgi stack:    {asgi:.1f} us/request (overhead {asgi - bare:.1f} us)")
+    print(f"overhead reduction: {(legacy - bare) / max(asgi - bare, 0.001):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+MMQR Benchmark
+Compares the original bit-by-bit CRC and slicing TLV parser against the
+table-driven codec, for single and batch validation.
+
+Run from backend/: python -m benchmarks.bench_mmqr [--count 1000] [--repeat 20]
+"""
+
+import argparse
+import timeit
+
+from services.mmqr_codec import crc16_hex
+from services.mmqr_service import MMQRService
+
+
+def legacy_crc(data: str) -> str:
+    """Original MMQRService._calculate_crc"""
+    crc = 0xFFFF
+    polynomial = 0x1021
+    for char in data:
+        crc ^= ord(char) << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = (crc << 1) ^ polynomial
+            else:
+                crc <<= 1
+            crc &= 0xFFFF
+    return f"{crc:04X}"
+
+
+def legacy_parse_tlv(data: str) -> dict:
+    """Original MMQRService.parse_tlv"""
+    result = {}
+    index = 0
+    while index < len(data):
+        if index + 4 > len(data):
+            break
+        tag = data[index:index + 2]
+        length = int(data[index + 2:index + 4])
+        value = data[index + 4:index + 4 + length]
+        result[tag] = value
+        index += 4 + length
+    return result
+
+
+def legacy_validate(qr_string: str) -> bool:
+    """Original parse_mmqr work: top level plus both nested templates, eagerly (no CRC check)"""
+    parsed = legacy_parse_tlv(qr_string)
+    legacy_parse_tlv(parsed.get("26", ""))
+    legacy_parse_tlv(parsed.get("62", ""))
+    return parsed.get("58") == "MM" and parsed.get("53") == "104"
+
+
+def make_qr_strings(count: int) -> list:
+    service = MMQRService()
+    return [service.generate_payment_qr(amount=120000 + n, order_id=f"ORD{n:08d}") for n in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000, help="QR strings per batch")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    service = MMQRService()
+    qr_strings = make_qr_strings(args.count)
+
+    def per_item_us(fn) -> float:
+        return timeit.timeit(fn, number=args.repeat) / args.repeat / args.count * 1_000_000
+
+    legacy = per_item_us(lambda: [legacy_crc(q) for q in qr_strings])
+    table = per_item_us(lambda: [crc16_hex(q) for q in qr_strings])
+    print(f"crc: legacy_us={legacy:.2f} table_us={table:.2f} speedup={legacy / table:.1f}x")
+
+    legacy = per_item_us(lambda: [legacy_parse_tlv(q) for q in qr_strings])
+    offsets = per_item_us(lambda: [service.parse_tlv(q) for q in qr_strings])
+    print(f"parse_tlv: legacy_us={legacy:.2f} offset_us={offsets:.2f} speedup={legacy / offsets:.1f}x")
+
+    # The legacy path never verified the CRC; the new one does, so it does strictly more work
+    legacy = per_item_us(lambda: [legacy_validate(q) + (legacy_crc(q[:-4]) == q[-4:]) for q in qr_strings])
+    single = per_item_us(lambda: [service.validate_payment(q) for q in qr_strings])
+    batch = per_item_us(lambda: service.validate_payments(qr_strings))
+    print(f"validate (with CRC): legacy_us={legacy:.2f} single_us={single:.2f} batch_us={batch:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Serialization Benchmark
+Compares the legacy response path (serialize_doc + jsonable_encoder + stdlib
+json) against ORJSONResponse on realistic list payloads.
+
+Run from backend/: python -m benchmarks.bench_serialization [--items 100] [--repeat 200]
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import timeit
+import uuid
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils.responses import ORJSONResponse
+from utils.serialization import serialize_list
+
+
+def make_profile(n: int) -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "profile_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "iccid": f"89959{n:015d}",
+        "eid": None,
+        "msisdn": f"+9597{n:08d}",
+        "status": "active",
+        "qr_code": f"/api/esim/profiles/{n}/qr.png",
+        "activation_code": f"LPA:1$esim.com.mm${uuid.uuid4().hex[:20].upper()}$",
+        "plan_id": "plan_premium_5g",
+        "data_limit_gb": 50.0,
+        "data_used_gb": n * 0.37,
+        "created_at": now - timedelta(days=n),
+        "activation_date": now - timedelta(days=n - 1),
+        "expiry_date": now + timedelta(days=30),
+        "device_type": "ios",
+        "device_model": "iPhone 15",
+        "device_imei": f"35{n:013d}",
+        "is_5g_enabled": True,
+        "is_volte_enabled": True,
+        "is_roaming_enabled": False,
+    }
+
+
+def make_transaction(n: int) -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "transaction_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "plan_id": "plan_basic_5g",
+        "amount": 5000,
+        "currency": "MMK",
+        "discount_amount": 0.0,
+        "final_amount": 5000.0,
+        "payment_method": "kbz_pay",
+        "status": "completed",
+        "gateway_transaction_id": f"KBZ{n:010d}",
+        "gateway_response": {
+            "code": "0",
+            "message": "success",
+            "received_at": now,
+            "payload": {"merch_order_id": str(uuid.uuid4()), "trade_status": "PAY_SUCCESS", "total_amount": "5000"},
+        },
+        "created_at": now - timedelta(hours=n),
+        "completed_at": now - timedelta(hours=n) + timedelta(minutes=2),
+    }
+
+
+def make_ticket(n: int) -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "ticket_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "subject": "Cannot activate eSIM on new device",
+        "description": "After transferring my eSIM the new phone shows 'No Service'. " * 4,
+        "category": "activation",
+        "priority": "high",
+        "status": "open",
+        "created_at": now - timedelta(hours=n),
+        "updated_at": None,
+        "response_count": n % 5,
+    }
+
+
+def legacy_path(docs: list) -> bytes:
+    return JSONResponse({"items": jsonable_encoder(serialize_list(docs))}).body
+
+
+def fast_path(docs: list) -> bytes:
+    return ORJSONResponse({"items": docs}).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100, help="documents per response")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, factory in (("profiles", make_profile), ("transactions", make_transaction), ("tickets", make_ticket)):
+        docs = [factory(n) for n in range(args.items)]
+        # The fast path receives documents already projected without _id
+        projected = [{k: v for k, v in d.items() if k != "_id"} for d in docs]
+
+        legacy = timeit.timeit(lambda: legacy_path(docs), number=args.repeat) / args.repeat * 1000
+        fast = timeit.timeit(lambda: fast_path(projected), number=args.repeat) / args.repeat * 1000
+        print(f"{name}: legacy_ms={legacy:.3f} orjson_ms={fast:.3f} speedup={legacy / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
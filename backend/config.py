@@ -8,7 +8,7 @@ from __future__ import annotations
 
 import os
 from functools import lru_cache
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 
 from pydantic import field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -71,6 +71,56 @@ class Settings(BaseSettings):
     LOCKOUT_DURATION_MINUTES: int = 30
     SESSION_TIMEOUT_MINUTES: int = 30
 
+    # Password hashing (bcrypt runs on a bounded worker pool)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_REHASH_ON_LOGIN: bool = False  # rehash on login when BCRYPT_ROUNDS changes
+
+    # Authenticated user cache (per worker; invalidated across workers via Redis when set)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_ENTRIES: int = 10000
+
+    # Plan catalog (in memory; other workers pick up admin edits within this interval)
+    PLAN_CATALOG_REFRESH_SECONDS: int = 30
+    ICCID_PREFIX: str = "89959"  # 89 telecom + 95 Myanmar + issuer digit
+    ICCID_BLOCK_SIZE: int = 1000  # serials reserved per worker per counter round-trip
+    PROVISIONING_CHUNK_SIZE: int = 500  # profiles per insert_many / checkpoint
+    PROVISIONING_QR_WORKERS: int = 2  # processes for bulk CPU work (QR rendering, MMQR batch validation)
+    USAGE_INGEST_TOKEN: Optional[str] = None  # bearer token for POST /api/usage/records
+    USAGE_FLUSH_SECONDS: float = 5.0  # aggregated usage is written at least this often
+    USAGE_DROP_DIR: Optional[str] = None  # directory watched for CSV/NDJSON usage files
+    STATUS_REFRESH_SECONDS: int = 60  # /api/status counters are at most this old
+    LIFECYCLE_SWEEP_SECONDS: int = 60  # expiry/low-balance sweep interval (one leader per deployment)
+    LIFECYCLE_BATCH_SIZE: int = 500  # profiles per update_many
+    LIFECYCLE_EXPIRING_SOON_DAYS: int = 3
+    LIFECYCLE_LOW_BALANCE_PERCENT: float = 10.0  # notify when this much of the plan's data is left
+    VERIFICATION_ORDER_TTL_HOURS: int = 72  # registration orders not updated for this long are dropped
+    VERIFICATION_ORDER_CACHE_SIZE: int = 2048  # serialized orders kept per worker
+    DEVICE_CATALOG_PATH: Optional[str] = None  # eSIM device catalog JSON (defaults to data/device_catalog.json)
+    # Pending-payment reconciliation; 0 disables the periodic run (admins can still trigger it)
+    RECONCILIATION_INTERVAL_SECONDS: int = 300
+    RECONCILIATION_STALE_SECONDS: int = 900  # only payments pending at least this long are checked
+    PROMO_HOLD_MINUTES: int = 30  # promo uses held by payments pending longer are released
+    RECONCILIATION_GATEWAY_CONCURRENCY: Dict[str, int] = {}  # per-gateway caps, e.g. {"kbz_pay": 2}
+    RECONCILIATION_GATEWAY_RATE: Dict[str, float] = {}  # per-gateway requests per second
+
+    # Promo code metadata cache (redemption itself is always an atomic database update)
+    PROMO_CACHE_TTL_SECONDS: int = 30
+
+    # Outbound HTTP (pooled per upstream; shared by Supabase, Transactease, gateways)
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_RETRIES: int = 2  # idempotent calls only
+
+    # Supabase bulk writes (audit logs and other append-only rows)
+    SUPABASE_BULK_MAX_BATCH: int = 500
+    SUPABASE_BULK_FLUSH_SECONDS: float = 2.0
+    SUPABASE_BULK_MAX_QUEUE: int = 10000
+    SUPABASE_SPILL_DIR: str = "/tmp/esim-supabase-spill"  # rows kept here while Supabase is down
+
     # CORS
     # Allow override via CSV env: CORS_ORIGINS="https://a.com,https://b.com"
     CORS_ORIGINS: List[str] = [
@@ -121,6 +171,13 @@ class Settings(BaseSettings):
     LOG_FORMAT: str = (
         "%(asctime)s %(levelname)s %(name)s %(trace_id)s %(message)s"
     )
+    LOG_QUEUE_SIZE: int = 10000  # records beyond this are dropped, never blocking requests
+    LOG_SAMPLE_RATE: float = 1.0  # fraction of successful requests logged per route
+    LOG_ROUTE_SAMPLE_RATES: Dict[str, float] = {}  # per-route overrides, e.g. {"/api/plans": 0.01}
+    LOG_SLOW_REQUEST_SECONDS: float = 1.0  # slower requests are always logged
+
+    # Metrics (set PROMETHEUS_MULTIPROC_DIR in the environment when running several workers)
+    METRICS_TOKEN: Optional[str] = None  # bearer token required by /api/metrics when set
 
     # API Documentation - Disabled in production by default
     ENABLE_DOCS: bool = False
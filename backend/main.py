@@ -5,11 +5,13 @@ Enterprise-grade eSIM management platform
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 from motor.motor_asyncio import AsyncIOMotorClient
+from concurrent.futures import ProcessPoolExecutor
 import logging
 import os
+import secrets
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -22,11 +24,31 @@ settings = get_settings()
 # Import routers
 from routers import auth_router, esim_router, plans_router, payments_router, support_router
 from routers.esim_registration import router as esim_registration_router
+from routers.usage import router as usage_router
 
 # Import services
-from services.auth_service import AuthService
+from services.auth_service import AuthService, create_password_context
+from services.password_hasher import PasswordHasher, HasherBusyError
+from services.user_cache import UserCache
 from services.esim_service import ESIMService
+from services.qr_store import QRCodeStore
+from services.id_allocator import ICCIDAllocator
+from services.provisioning_service import ProvisioningService
+from services.mmqr_batch import MMQRBatchVerifier
+from services.device_catalog import DeviceCatalog
+from services.nexora_ai_service import nexora_ai
+from services.verification_store import VerificationOrderStore
+from services.usage_service import UsageIngestor, UsageFileImporter
+from services.plan_catalog import PlanCatalog
+from services.status_aggregator import StatusAggregator
+from services.lifecycle_scheduler import LifecycleScheduler
+from services.reconciliation_service import ReconciliationService
+from services.promo_service import PromoService
+from services.http_client import OutboundHTTP, set_http_client
+from services.bulk_writer import BulkWriter
+from services.supabase_service import get_supabase_service
 from services.payment_service import PaymentService, KBZPayGateway, WaveMoneyGateway, AYAPayGateway
+from services.metrics import SERVICE_STATS, MongoCommandListener, render_metrics, mark_worker_dead
 
 # Import middleware
 from middleware.security import (
@@ -35,11 +57,18 @@ from middleware.security import (
     RequestLoggingMiddleware,
     get_cors_config
 )
+from middleware.metrics import MetricsMiddleware
+from middleware.rate_limiter import create_rate_limiter
+from utils.redis_client import create_redis_client
+from utils.responses import ORJSONResponse
+from utils.structured_logging import configure_logging
 
-# Configure logging
-logging.basicConfig(
+# Configure logging (records are written by a background thread)
+configure_logging(
     level=settings.LOG_LEVEL,
-    format=settings.LOG_FORMAT
+    json_output=settings.LOG_JSON,
+    fmt=settings.LOG_FORMAT,
+    queue_size=settings.LOG_QUEUE_SIZE
 )
 logger = logging.getLogger(__name__)
 
@@ -50,6 +79,12 @@ ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 ENVIRONMENT = settings.ENVIRONMENT
 
+# Shared Redis client (None when REDIS_URL is unset)
+redis_client = create_redis_client(settings.REDIS_URL)
+
+# Shared rate limiter backend (Redis when available, in-process otherwise)
+rate_limiter = create_rate_limiter(redis_client)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -58,7 +93,7 @@ async def lifespan(app: FastAPI):
     logger.info(f"Starting eSIM Myanmar Server in {ENVIRONMENT} mode")
     
     # Connect to MongoDB
-    client = AsyncIOMotorClient(MONGO_URL)
+    client = AsyncIOMotorClient(MONGO_URL, event_listeners=[MongoCommandListener()])
     db = client.get_database()
     
     # Test connection
@@ -70,6 +105,49 @@ async def lifespan(app: FastAPI):
         raise
     
     # Initialize services
+    http_client = OutboundHTTP(
+        timeout_seconds=settings.HTTP_TIMEOUT_SECONDS,
+        connect_timeout_seconds=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        retries=settings.HTTP_RETRIES,
+    )
+    set_http_client(http_client)
+    
+    supabase_writer = None
+    if settings.SUPABASE_SERVICE_ROLE_KEY:
+        supabase_service = get_supabase_service()
+        supabase_writer = BulkWriter(
+            supabase_service.bulk_insert,
+            max_batch=settings.SUPABASE_BULK_MAX_BATCH,
+            flush_interval_seconds=settings.SUPABASE_BULK_FLUSH_SECONDS,
+            max_queue=settings.SUPABASE_BULK_MAX_QUEUE,
+            spill_dir=settings.SUPABASE_SPILL_DIR,
+        )
+        supabase_service.writer = supabase_writer
+        await supabase_writer.start()
+    
+    password_hasher = PasswordHasher(
+        create_password_context(settings.BCRYPT_ROUNDS),
+        max_workers=settings.PASSWORD_HASH_WORKERS,
+        max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    )
+    
+    user_cache = UserCache(
+        ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+        max_entries=settings.USER_CACHE_MAX_ENTRIES,
+        redis=redis_client,
+    )
+    await user_cache.start()
+    
+    plan_catalog = PlanCatalog(db, refresh_interval_seconds=settings.PLAN_CATALOG_REFRESH_SECONDS)
+    await plan_catalog.seed_defaults()
+    await plan_catalog.load()
+    await plan_catalog.start()
+    
+    status_aggregator = StatusAggregator(db, refresh_interval_seconds=settings.STATUS_REFRESH_SECONDS)
+    await status_aggregator.start()
+    
     auth_service = AuthService(
         db=db,
         secret_key=SECRET_KEY,
@@ -79,11 +157,53 @@ async def lifespan(app: FastAPI):
         min_password_length=settings.MIN_PASSWORD_LENGTH,
         max_failed_attempts=settings.MAX_LOGIN_ATTEMPTS,
         lockout_duration_minutes=settings.LOCKOUT_DURATION_MINUTES,
+        password_hasher=password_hasher,
+        rehash_on_login=settings.PASSWORD_REHASH_ON_LOGIN,
+        user_cache=user_cache,
+    )
+    
+    qr_store = QRCodeStore(db)
+    iccid_allocator = ICCIDAllocator(db, prefix=settings.ICCID_PREFIX, block_size=settings.ICCID_BLOCK_SIZE)
+    esim_service = ESIMService(
+        db=db,
+        qr_store=qr_store,
+        plan_catalog=plan_catalog,
+        iccid_allocator=iccid_allocator
+    )
+    
+    if settings.DEVICE_CATALOG_PATH:
+        nexora_ai.device_catalog = DeviceCatalog.load(settings.DEVICE_CATALOG_PATH)
+    nexora_ai.order_store = VerificationOrderStore(
+        db,
+        ttl_hours=settings.VERIFICATION_ORDER_TTL_HOURS,
+        cache_size=settings.VERIFICATION_ORDER_CACHE_SIZE
     )
     
-    esim_service = ESIMService(db=db)
+    # CPU-bound work (bulk QR rendering, bulk MMQR validation) runs off the event loop's threads
+    process_pool = ProcessPoolExecutor(max_workers=settings.PROVISIONING_QR_WORKERS)
+    mmqr_batch_verifier = MMQRBatchVerifier(executor=process_pool)
+    provisioning_service = ProvisioningService(
+        db=db,
+        esim_service=esim_service,
+        qr_executor=process_pool,
+        chunk_size=settings.PROVISIONING_CHUNK_SIZE
+    )
+    
+    usage_ingestor = UsageIngestor(db, flush_interval_seconds=settings.USAGE_FLUSH_SECONDS)
+    usage_importer = None
+    if settings.USAGE_DROP_DIR:
+        usage_importer = UsageFileImporter(usage_ingestor, settings.USAGE_DROP_DIR)
+    
+    lifecycle_scheduler = LifecycleScheduler(
+        db,
+        interval_seconds=settings.LIFECYCLE_SWEEP_SECONDS,
+        batch_size=settings.LIFECYCLE_BATCH_SIZE,
+        expiring_soon_days=settings.LIFECYCLE_EXPIRING_SOON_DAYS,
+        low_balance_percent=settings.LIFECYCLE_LOW_BALANCE_PERCENT
+    )
     
-    payment_service = PaymentService(db=db)
+    promo_service = PromoService(db, cache_ttl_seconds=settings.PROMO_CACHE_TTL_SECONDS)
+    payment_service = PaymentService(db=db, plan_catalog=plan_catalog, promo_service=promo_service)
     
     # Add payment gateways (sandbox mode for development)
     is_sandbox = ENVIRONMENT != "production"
@@ -118,24 +238,92 @@ async def lifespan(app: FastAPI):
             )
         )
     
+    reconciliation_service = ReconciliationService(
+        db,
+        payment_service,
+        stale_after_seconds=settings.RECONCILIATION_STALE_SECONDS,
+        promo_hold_minutes=settings.PROMO_HOLD_MINUTES,
+        gateway_concurrency=settings.RECONCILIATION_GATEWAY_CONCURRENCY,
+        gateway_rate_per_second=settings.RECONCILIATION_GATEWAY_RATE,
+        interval_seconds=settings.RECONCILIATION_INTERVAL_SECONDS
+    )
+    
     # Store in app state
     app.state.db = db
     app.state.mongo_client = client
     app.state.auth_service = auth_service
     app.state.esim_service = esim_service
+    app.state.provisioning_service = provisioning_service
+    app.state.mmqr_batch_verifier = mmqr_batch_verifier
+    app.state.usage_ingestor = usage_ingestor
+    app.state.usage_ingest_token = settings.USAGE_INGEST_TOKEN
     app.state.payment_service = payment_service
+    app.state.reconciliation_service = reconciliation_service
+    app.state.plan_catalog = plan_catalog
+    app.state.status_aggregator = status_aggregator
+    app.state.lifecycle_scheduler = lifecycle_scheduler
+    app.state.promo_service = promo_service
+    app.state.http_client = http_client
+    
+    # Export the services' stats() counters on /api/metrics
+    SERVICE_STATS.register("http_client", http_client.stats, label="upstream")
+    if supabase_writer is not None:
+        SERVICE_STATS.register("bulk_writer", supabase_writer.stats)
+    SERVICE_STATS.register("user_cache", user_cache.stats)
+    SERVICE_STATS.register("plan_catalog", plan_catalog.stats)
+    SERVICE_STATS.register("status_aggregator", status_aggregator.stats)
+    SERVICE_STATS.register("id_allocator", iccid_allocator.stats)
+    SERVICE_STATS.register("verification_store", nexora_ai.order_store.stats)
+    SERVICE_STATS.register("provisioning", provisioning_service.stats)
+    SERVICE_STATS.register("usage", usage_ingestor.stats)
+    SERVICE_STATS.register("lifecycle", lifecycle_scheduler.stats)
+    SERVICE_STATS.register("promo", promo_service.stats)
+    SERVICE_STATS.register("payment", payment_service.stats)
+    SERVICE_STATS.register("reconciliation", reconciliation_service.stats)
     
     # Create indexes
     await create_indexes(db)
     
+    # Background workers query indexed collections (and the unique indexes keep
+    # their writes idempotent), so they start only once create_indexes is done
+    await provisioning_service.start()
+    await usage_ingestor.start()
+    if usage_importer is not None:
+        await usage_importer.start()
+    await payment_service.start()
+    await reconciliation_service.start()
+    await lifecycle_scheduler.start()
+    
     logger.info("Application startup complete")
     
     yield
     
     # Shutdown
     logger.info("Shutting down application")
+    SERVICE_STATS.clear()
+    await plan_catalog.stop()
+    await status_aggregator.stop()
+    await lifecycle_scheduler.stop()
+    await reconciliation_service.stop()
+    await payment_service.stop()
+    await provisioning_service.stop()
+    if usage_importer is not None:
+        await usage_importer.stop()
+    await usage_ingestor.stop()
+    process_pool.shutdown(wait=False, cancel_futures=True)
+    await user_cache.stop()
+    await rate_limiter.close()
+    if redis_client is not None:
+        await redis_client.aclose()
+    password_hasher.shutdown()
+    if supabase_writer is not None:
+        get_supabase_service().writer = None
+        await supabase_writer.stop()
+    await http_client.aclose()
+    set_http_client(None)
     client.close()
     logger.info("MongoDB connection closed")
+    mark_worker_dead()
 
 
 async def create_indexes(db):
@@ -151,16 +339,39 @@ async def create_indexes(db):
         await db.esim_profiles.create_index("iccid", unique=True)
         await db.esim_profiles.create_index("profile_id", unique=True)
         await db.esim_profiles.create_index([("user_id", 1), ("status", 1)])
+        await db.esim_profiles.create_index([("status", 1), ("expiry_date", 1)])
+        await db.esim_profiles.create_index([("user_id", 1), ("created_at", -1), ("profile_id", -1)])
+        
+        # Usage rollups (per-bucket documents are keyed by _id)
+        await db.usage_rollups.create_index([("iccid", 1), ("granularity", 1), ("bucket", 1)])
+        await db.usage_batches.create_index("received_at", expireAfterSeconds=7 * 24 * 3600)
+        
+        # Lifecycle events (consumed by notification senders)
+        await db.profile_events.create_index([("delivered_at", 1), ("created_at", 1)])
+        await db.profile_events.create_index("profile_id")
+        
+        # Bulk provisioning jobs
+        await db.provisioning_jobs.create_index("job_id", unique=True)
+        await db.provisioning_jobs.create_index([("status", 1), ("lease_until", 1), ("created_at", 1)])
         
         # Transactions collection
         await db.transactions.create_index("transaction_id", unique=True)
         await db.transactions.create_index("user_id")
         await db.transactions.create_index([("user_id", 1), ("created_at", -1)])
+        await db.transactions.create_index([("user_id", 1), ("created_at", -1), ("transaction_id", -1)])
+        await db.transactions.create_index([("fulfillment.state", 1), ("fulfillment.next_attempt_at", 1)])
+        await db.transactions.create_index([("status", 1), ("created_at", 1), ("transaction_id", 1)])
+        await db.reconciliation_reports.create_index("started_at", expireAfterSeconds=90 * 24 * 3600)
+        
+        # Registration order verifications
+        await db.verification_orders.create_index("expires_at", expireAfterSeconds=0)
+        await db.verification_orders.create_index("user_id")
         
         # Support tickets collection
         await db.support_tickets.create_index("ticket_id", unique=True)
         await db.support_tickets.create_index("user_id")
         await db.support_tickets.create_index([("status", 1), ("priority", 1)])
+        await db.support_tickets.create_index([("user_id", 1), ("created_at", -1), ("ticket_id", -1)])
         
         # Refresh tokens collection
         await db.refresh_tokens.create_index("token_id", unique=True)
@@ -172,6 +383,9 @@ async def create_indexes(db):
         await db.password_reset_tokens.create_index("user_id")
         await db.password_reset_tokens.create_index("expires_at", expireAfterSeconds=0)
         
+        # Promo codes collection (last: fails if legacy data has duplicate codes)
+        await db.promo_codes.create_index("code", unique=True)
+        
         logger.info("Database indexes created")
     except Exception as e:
         logger.warning(f"Index creation warning: {e}")
@@ -183,18 +397,26 @@ app = FastAPI(
     description="Enterprise eSIM Management Platform for Myanmar and ASEAN",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/api/docs" if ENVIRONMENT != "production" and settings.ENABLE_DOCS else None,
     redoc_url="/api/redoc" if ENVIRONMENT != "production" and settings.ENABLE_DOCS else None
 )
 
 # Add middleware (order matters - last added is first executed)
-app.add_middleware(RequestLoggingMiddleware)
+app.add_middleware(
+    RequestLoggingMiddleware,
+    sample_rate=settings.LOG_SAMPLE_RATE,
+    route_sample_rates=settings.LOG_ROUTE_SAMPLE_RATES,
+    slow_request_seconds=settings.LOG_SLOW_REQUEST_SECONDS,
+)
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(
     RateLimitMiddleware,
     requests_per_minute=settings.RATE_LIMIT_PER_MINUTE,
     burst_limit=settings.RATE_LIMIT_BURST,
+    limiter=rate_limiter,
 )
+app.add_middleware(MetricsMiddleware)
 
 # CORS configuration
 cors_config = get_cors_config()
@@ -213,6 +435,7 @@ app.include_router(plans_router)
 app.include_router(payments_router)
 app.include_router(support_router)
 app.include_router(esim_registration_router)
+app.include_router(usage_router)
 
 
 # Root endpoints
@@ -246,25 +469,40 @@ async def health_check(request: Request):
 
 @app.get("/api/status")
 async def system_status(request: Request):
-    """System status endpoint"""
-    db = request.app.state.db
-    
-    # Get counts
-    user_count = await db.users.count_documents({})
-    profile_count = await db.esim_profiles.count_documents({})
-    active_profiles = await db.esim_profiles.count_documents({"status": "active"})
+    """System status endpoint (cached, approximate counters)"""
+    snapshot = await request.app.state.status_aggregator.snapshot()
     
     return {
         "status": "operational",
-        "metrics": {
-            "total_users": user_count,
-            "total_profiles": profile_count,
-            "active_profiles": active_profiles
-        },
+        "metrics": snapshot["metrics"],
+        "metrics_as_of": snapshot["as_of"],
+        "metrics_stale_seconds": snapshot["stale_seconds"],
         "version": "1.0.0"
     }
 
 
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus metrics (optionally protected by METRICS_TOKEN)"""
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not secrets.compare_digest(request.headers.get("Authorization", ""), expected):
+            return JSONResponse(status_code=401, content={"detail": "Unauthorized"})
+    
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.exception_handler(HasherBusyError)
+async def hasher_busy_handler(request: Request, exc: HasherBusyError):
+    """Shed load when the password hashing pool is saturated"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -0,0 +1,43 @@
+"""
+Metrics Middleware for eSIM Myanmar Platform
+Per-route latency histograms and in-flight gauge as a raw ASGI middleware
+"""
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import time
+
+from services.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, UNMATCHED_ROUTE, status_class
+
+
+class MetricsMiddleware:
+    """
+    Record request latency by method, route template and status class
+    Route templates come from the matched FastAPI route, keeping label cardinality bounded
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        status_code = 500
+        
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, status_class(status_code)).observe(
+                time.perf_counter() - start_time
+            )
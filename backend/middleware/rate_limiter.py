@@ -0,0 +1,151 @@
+"""
+Rate Limiter Backends for eSIM Myanmar Platform
+Pluggable limiter engines used by RateLimitMiddleware:
+- TokenBucketLimiter: in-process, O(1) per check, monotonic clock, idle-key eviction
+- RedisRateLimiter: shared fixed-window counters so limits hold across uvicorn workers
+"""
+
+from collections import OrderedDict
+import logging
+import math
+import time
+
+logger = logging.getLogger('esim_security')
+
+
+class RateLimiter:
+    """Base rate limiter interface"""
+
+    async def hit(self, key: str, limit: int, window_seconds: float = 60.0) -> bool:
+        """Consume one request for key. Returns True if the request is allowed."""
+        raise NotImplementedError
+
+    async def block(self, key: str, seconds: int) -> None:
+        """Block key for the given number of seconds"""
+        raise NotImplementedError
+
+    async def blocked_for(self, key: str) -> int:
+        """Return remaining block time in seconds (0 if not blocked)"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release backend resources"""
+        return None
+
+
+class TokenBucketLimiter(RateLimiter):
+    """
+    In-process token bucket limiter
+    Each key holds [tokens, last_refill, last_seen]; buckets refill at limit/window per second.
+    Keys are kept in access order so idle buckets are evicted from the front in O(1).
+    """
+
+    def __init__(self, idle_ttl_seconds: float = 3600.0, max_keys: int = 100_000, clock=time.monotonic):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._blocks: "OrderedDict[str, float]" = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        """Drop buckets idle for longer than the TTL and enforce the key cap"""
+        buckets = self._buckets
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if now - oldest[2] < self.idle_ttl_seconds and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+        blocks = self._blocks
+        while blocks and next(iter(blocks.values())) <= now:
+            blocks.popitem(last=False)
+
+    async def hit(self, key: str, limit: int, window_seconds: float = 60.0) -> bool:
+        now = self._clock()
+        bucket = self._buckets.get(key)
+
+        if bucket is None:
+            # [tokens, last_refill, last_seen]
+            bucket = [float(limit), now, now]
+            self._buckets[key] = bucket
+        else:
+            self._buckets.move_to_end(key)
+            refill_rate = limit / window_seconds
+            bucket[0] = min(float(limit), bucket[0] + (now - bucket[1]) * refill_rate)
+            bucket[1] = now
+            bucket[2] = now
+
+        self._evict(now)
+
+        if bucket[0] < 1.0:
+            return False
+
+        bucket[0] -= 1.0
+        return True
+
+    async def block(self, key: str, seconds: int) -> None:
+        # Re-inserting keeps blocks roughly ordered by expiry; expired entries behind a
+        # longer block are dropped lazily by blocked_for() or once the front expires
+        self._blocks.pop(key, None)
+        self._blocks[key] = self._clock() + seconds
+
+    async def blocked_for(self, key: str) -> int:
+        until = self._blocks.get(key)
+        if until is None:
+            return 0
+        remaining = until - self._clock()
+        if remaining <= 0:
+            del self._blocks[key]
+            return 0
+        return math.ceil(remaining)
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Redis-backed fixed-window limiter
+    One INCR + EXPIRE pipeline per check keeps counts consistent across workers.
+    Fails open (allows the request) if Redis is unreachable.
+    The Redis client is owned (and closed) by the application.
+    """
+
+    def __init__(self, redis, prefix: str = "esim:rl", clock=time.time):
+        self.redis = redis
+        self.prefix = prefix
+        self._clock = clock
+
+    async def hit(self, key: str, limit: int, window_seconds: float = 60.0) -> bool:
+        window = int(window_seconds)
+        bucket = int(self._clock() // window)
+        redis_key = f"{self.prefix}:{key}:{bucket}"
+
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.incr(redis_key)
+            pipe.expire(redis_key, window + 1)
+            count, _ = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Rate limiter backend unavailable: {e}")
+            return True
+
+        return int(count) <= limit
+
+    async def block(self, key: str, seconds: int) -> None:
+        try:
+            await self.redis.set(f"{self.prefix}:block:{key}", 1, ex=seconds)
+        except Exception as e:
+            logger.error(f"Rate limiter backend unavailable: {e}")
+
+    async def blocked_for(self, key: str) -> int:
+        try:
+            ttl = await self.redis.ttl(f"{self.prefix}:block:{key}")
+        except Exception as e:
+            logger.error(f"Rate limiter backend unavailable: {e}")
+            return 0
+        return max(0, int(ttl))
+
+
+def create_rate_limiter(redis=None) -> RateLimiter:
+    """Return a Redis-backed limiter when a Redis client is available, else an in-process one"""
+    if redis is not None:
+        return RedisRateLimiter(redis)
+    return TokenBucketLimiter()
@@ -1,14 +1,14 @@
 """
 Security Middleware for eSIM Myanmar Platform
 Enterprise-grade security: rate limiting, headers, logging, webhook validation
+Implemented as raw ASGI middlewares: no per-request task or body-stream
+wrapping, and static header blocks are encoded once at startup
 ESIM MYANMAR COMPANY LIMITED - 2025-2026
 """
 
-from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from collections import defaultdict
-from datetime import datetime, timedelta
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Dict, Optional, Tuple
 import time
 import logging
 import hashlib
@@ -17,26 +17,49 @@ import secrets
 import re
 import os
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from .rate_limiter import RateLimiter, TokenBucketLimiter
+from utils.structured_logging import request_id_var
+
 logger = logging.getLogger('esim_security')
 
+RawHeaders = Tuple[Tuple[bytes, bytes], ...]
+
+
+def get_header(scope: Scope, name: bytes) -> Optional[str]:
+    """First value of a request header (name must be lowercase bytes)"""
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def encode_headers(headers: Dict[str, str]) -> RawHeaders:
+    """Encode a header mapping into an ASGI raw header block"""
+    return tuple((name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items())
+
+
+def _client_host(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else 'unknown'
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+
+class RateLimitMiddleware:
     """
-    Enterprise rate limiting with per-IP, per-endpoint, and sliding window limits
+    Enterprise rate limiting with per-IP and per-endpoint limits
+    Counting is delegated to a pluggable limiter backend (in-process or Redis)
     """
     
-    def __init__(self, app, requests_per_minute: int = 60, burst_limit: int = 10):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        requests_per_minute: int = 60,
+        burst_limit: int = 10,
+        limiter: Optional[RateLimiter] = None
+    ):
+        self.app = app
         self.requests_per_minute = requests_per_minute
         self.burst_limit = burst_limit
-        self.request_counts = defaultdict(list)
-        self.blocked_ips = {}
-        self.suspicious_ips = defaultdict(int)
+        self.limiter = limiter or TokenBucketLimiter()
         
         # Endpoint-specific limits (security hardened)
         self.endpoint_limits = {
@@ -50,14 +73,15 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             '/api/esim/profiles': 20,
             '/api/support/tickets': 10
         }
+        self.exempt_paths = frozenset({'/health', '/api/health', '/'})
         
         # Whitelist for internal services
         self.whitelisted_ips = set(os.getenv('WHITELISTED_IPS', '').split(','))
     
-    def _get_client_ip(self, request: Request) -> str:
+    def _get_client_ip(self, scope: Scope) -> str:
         """Extract client IP with proxy header validation"""
         # Check X-Forwarded-For (trusted proxies only)
-        forwarded = request.headers.get('X-Forwarded-For')
+        forwarded = get_header(scope, b'x-forwarded-for')
         if forwarded:
             # Take the first IP (client IP)
             ip = forwarded.split(',')[0].strip()
@@ -66,11 +90,11 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 return ip
         
         # Check X-Real-IP
-        real_ip = request.headers.get('X-Real-IP')
+        real_ip = get_header(scope, b'x-real-ip')
         if real_ip and self._is_valid_ip(real_ip):
             return real_ip
         
-        return request.client.host if request.client else 'unknown'
+        return _client_host(scope)
     
     def _is_valid_ip(self, ip: str) -> bool:
         """Validate IP address format"""
@@ -82,63 +106,41 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         """Generate rate limit key"""
         return f"{ip}:{path}"
     
-    def _is_rate_limited(self, key: str, limit: int) -> bool:
-        """Check if request should be rate limited using sliding window"""
-        now = datetime.now()
-        minute_ago = now - timedelta(minutes=1)
-        
-        # Clean old entries
-        self.request_counts[key] = [
-            ts for ts in self.request_counts[key] 
-            if ts > minute_ago
-        ]
-        
-        # Check limit
-        if len(self.request_counts[key]) >= limit:
-            return True
-        
-        # Record request
-        self.request_counts[key].append(now)
-        return False
+    async def _is_rate_limited(self, key: str, limit: int) -> bool:
+        """Check if request should be rate limited"""
+        return not await self.limiter.hit(key, limit, window_seconds=60)
     
-    def _detect_suspicious_activity(self, client_ip: str, path: str) -> bool:
+    async def _detect_suspicious_activity(self, client_ip: str, path: str) -> bool:
         """Detect and track suspicious activity patterns"""
-        # Track failed auth attempts
+        # Track auth attempts (more than 20 per hour is treated as suspicious)
         if '/auth/' in path:
-            self.suspicious_ips[client_ip] += 1
-            if self.suspicious_ips[client_ip] > 20:
+            if not await self.limiter.hit(f"suspicious:{client_ip}", 20, window_seconds=3600):
                 logger.warning(f"Suspicious activity detected from {client_ip}")
                 return True
         return False
     
-    async def dispatch(self, request: Request, call_next):
-        client_ip = self._get_client_ip(request)
-        path = request.url.path
-        
-        # Skip rate limiting for whitelisted IPs
-        if client_ip in self.whitelisted_ips:
-            return await call_next(request)
+    async def _check(self, scope: Scope) -> Optional[JSONResponse]:
+        """Return a 429 response if the request must be rejected"""
+        client_ip = self._get_client_ip(scope)
+        path = scope["path"]
         
-        # Skip rate limiting for health checks
-        if path in ['/health', '/api/health', '/']:
-            return await call_next(request)
+        # Skip rate limiting for whitelisted IPs and health checks
+        if client_ip in self.whitelisted_ips or path in self.exempt_paths:
+            return None
         
         # Check if IP is blocked
-        if client_ip in self.blocked_ips:
-            if datetime.now() < self.blocked_ips[client_ip]:
-                logger.warning(f"Blocked IP attempted access: {client_ip}")
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Too many requests. Please try again later."},
-                    headers={"Retry-After": "900"}
-                )
-            else:
-                del self.blocked_ips[client_ip]
-                self.suspicious_ips[client_ip] = 0
+        retry_after = await self.limiter.blocked_for(client_ip)
+        if retry_after:
+            logger.warning(f"Blocked IP attempted access: {client_ip}")
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests. Please try again later."},
+                headers={"Retry-After": str(retry_after)}
+            )
         
         # Check for suspicious activity
-        if self._detect_suspicious_activity(client_ip, path):
-            self.blocked_ips[client_ip] = datetime.now() + timedelta(hours=1)
+        if await self._detect_suspicious_activity(client_ip, path):
+            await self.limiter.block(client_ip, 3600)
             logger.error(f"IP blocked for 1 hour due to suspicious activity: {client_ip}")
             return JSONResponse(
                 status_code=429,
@@ -150,13 +152,13 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         limit = self.endpoint_limits.get(path, self.requests_per_minute)
         key = self._get_rate_limit_key(client_ip, path)
         
-        if self._is_rate_limited(key, limit):
+        if await self._is_rate_limited(key, limit):
             logger.warning(f"Rate limit exceeded: {client_ip} on {path}")
             
             # Block IP for repeated violations
             global_key = self._get_rate_limit_key(client_ip, 'global')
-            if self._is_rate_limited(global_key, self.requests_per_minute * 2):
-                self.blocked_ips[client_ip] = datetime.now() + timedelta(minutes=15)
+            if await self._is_rate_limited(global_key, self.requests_per_minute * 2):
+                await self.limiter.block(client_ip, 900)
                 logger.error(f"IP blocked for 15 minutes: {client_ip}")
             
             return JSONResponse(
@@ -165,164 +167,273 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 headers={"Retry-After": "60"}
             )
         
-        response = await call_next(request)
-        return response
+        return None
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        rejection = await self._check(scope)
+        if rejection is not None:
+            await rejection(scope, receive, send)
+            return
+        
+        await self.app(scope, receive, send)
+
+
+# Permissions Policy (Feature Policy) - Restrictive
+PERMISSIONS_POLICY = [
+    "geolocation=()",
+    "microphone=()",
+    "camera=()",
+    "payment=(self)",
+    "usb=()",
+    "magnetometer=()",
+    "gyroscope=()",
+    "accelerometer=()",
+    "autoplay=()",
+    "encrypted-media=(self)",
+    "fullscreen=(self)"
+]
+
+# Content Security Policy - Enterprise Telecom Grade
+CSP_DIRECTIVES = [
+    "default-src 'self'",
+    "script-src 'self' 'unsafe-inline' https://www.googletagmanager.com https://www.google-analytics.com https://cdn.jsdelivr.net",
+    "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com",
+    "font-src 'self' https://fonts.gstatic.com data:",
+    "img-src 'self' data: https: blob:",
+    "connect-src 'self' https://api.esim.com.mm https://*.supabase.co https://www.google-analytics.com wss://*.supabase.co",
+    "frame-ancestors 'none'",
+    "base-uri 'self'",
+    "form-action 'self'",
+    "upgrade-insecure-requests",
+    "block-all-mixed-content"
+]
+
+SECURITY_HEADERS = {
+    # Core Security Headers
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Permissions-Policy": ", ".join(PERMISSIONS_POLICY),
+    "Content-Security-Policy": "; ".join(CSP_DIRECTIVES),
+    # Cross-Origin Policies
+    "Cross-Origin-Opener-Policy": "same-origin",
+    "Cross-Origin-Resource-Policy": "same-origin",
+    # HSTS - 2 years with preload
+    "Strict-Transport-Security": "max-age=63072000; includeSubDomains; preload",
+}
 
+# Cache Control for API responses (unless the route set its own, e.g. QR images)
+API_NO_CACHE_HEADERS = {
+    "Cache-Control": "no-store, no-cache, must-revalidate, proxy-revalidate, max-age=0",
+    "Pragma": "no-cache",
+    "Expires": "0",
+}
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+# Server identification headers
+STRIPPED_HEADERS = (b"server", b"x-powered-by")
+
+
+class SecurityHeadersMiddleware:
     """
     Enterprise-grade security headers for telecom platform
     OWASP compliant with CSP, HSTS, and modern security policies
     """
     
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Core Security Headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        
-        # Permissions Policy (Feature Policy) - Restrictive
-        response.headers["Permissions-Policy"] = (
-            "geolocation=(), "
-            "microphone=(), "
-            "camera=(), "
-            "payment=(self), "
-            "usb=(), "
-            "magnetometer=(), "
-            "gyroscope=(), "
-            "accelerometer=(), "
-            "autoplay=(), "
-            "encrypted-media=(self), "
-            "fullscreen=(self)"
-        )
-        
-        # Content Security Policy - Enterprise Telecom Grade
-        csp_directives = [
-            "default-src 'self'",
-            "script-src 'self' 'unsafe-inline' https://www.googletagmanager.com https://www.google-analytics.com https://cdn.jsdelivr.net",
-            "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com",
-            "font-src 'self' https://fonts.gstatic.com data:",
-            "img-src 'self' data: https: blob:",
-            "connect-src 'self' https://api.esim.com.mm https://*.supabase.co https://www.google-analytics.com wss://*.supabase.co",
-            "frame-ancestors 'none'",
-            "base-uri 'self'",
-            "form-action 'self'",
-            "upgrade-insecure-requests",
-            "block-all-mixed-content"
-        ]
-        response.headers["Content-Security-Policy"] = "; ".join(csp_directives)
-        
-        # Cross-Origin Policies
-        response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
-        response.headers["Cross-Origin-Resource-Policy"] = "same-origin"
-        
-        # HSTS - 2 years with preload
-        response.headers["Strict-Transport-Security"] = "max-age=63072000; includeSubDomains; preload"
+    def __init__(
+        self,
+        app: ASGIApp,
+        headers: Optional[Dict[str, str]] = None,
+        api_headers: Optional[Dict[str, str]] = None,
+        api_prefix: str = "/api/"
+    ):
+        self.app = app
+        self.api_prefix = api_prefix
+        # Encoded once; appended as-is to every response start message
+        self.headers = encode_headers(SECURITY_HEADERS if headers is None else headers)
+        self.api_headers = encode_headers(API_NO_CACHE_HEADERS if api_headers is None else api_headers)
+        self.replaced = frozenset(STRIPPED_HEADERS) | {name for name, _ in self.headers}
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Cache Control for API responses
-        if request.url.path.startswith("/api/"):
-            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate, max-age=0"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
+        is_api = scope["path"].startswith(self.api_prefix)
         
-        # Remove server identification headers
-        if "Server" in response.headers:
-            del response.headers["Server"]
-        if "X-Powered-By" in response.headers:
-            del response.headers["X-Powered-By"]
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [h for h in message.get("headers", ()) if h[0] not in self.replaced]
+                headers.extend(self.headers)
+                if is_api and not any(name == b"cache-control" for name, _ in headers):
+                    headers.extend(self.api_headers)
+                message["headers"] = headers
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_with_headers)
+
 
+# Fallback sanitization for requests that matched no route (e.g. 404 probes)
+_UUID_SEGMENT = re.compile(r'/[a-f0-9-]{36}')
+_NUMERIC_SEGMENT = re.compile(r'/\d+')
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+
+class RequestLoggingMiddleware:
     """
     Comprehensive request logging for audit trail and security monitoring
+    Emits one structured access record per request, keyed by route template;
+    successful requests can be sampled per route, errors and slow requests never are
     """
     
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: float = 1.0,
+        route_sample_rates: Optional[Dict[str, float]] = None,
+        slow_request_seconds: float = 1.0
+    ):
+        self.app = app
         self.sensitive_paths = ['/api/auth/', '/api/payments/', '/api/admin/']
+        self.sample_every = self._every(sample_rate)
+        self.route_sample_every = {
+            route: self._every(rate) for route, rate in (route_sample_rates or {}).items()
+        }
+        self.slow_request_seconds = slow_request_seconds
+        self._route_counts: Dict[str, int] = {}
+    
+    @staticmethod
+    def _every(rate: float) -> int:
+        """Sampling rate as 'log one in N'; 0 disables success logging"""
+        return 0 if rate <= 0 else max(1, round(1 / min(rate, 1.0)))
+    
+    def _sampled(self, route: Optional[str]) -> int:
+        """Return N if this success should be logged as one-in-N, else 0"""
+        key = route or '<unmatched>'
+        every = self.route_sample_every.get(key, self.sample_every)
+        if every <= 1:
+            return every
+        count = self._route_counts.get(key, 0)
+        self._route_counts[key] = count + 1
+        return every if count % every == 0 else 0
     
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Generate secure request ID
-        request_id = secrets.token_hex(8)
+        start_time = time.perf_counter()
         
-        # Get client info
-        client_ip = self._get_client_ip(request)
-        user_agent = request.headers.get('User-Agent', 'Unknown')[:200]
+        # Generate secure request ID; also stamped on every log record of this request
+        request_id = secrets.token_hex(8)
+        token = request_id_var.set(request_id)
+        request_id_header = (b"x-request-id", request_id.encode())
+        status_code = 500
         
-        # Log request (sanitized)
-        log_path = self._sanitize_path(request.url.path)
-        logger.info(f"[{request_id}] {request.method} {log_path} - IP: {client_ip}")
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Add request ID to response headers
+                headers = list(message.get("headers", ()))
+                headers.append(request_id_header)
+                message["headers"] = headers
+            await send(message)
         
         try:
-            response = await call_next(request)
-            
-            # Calculate duration
-            duration = time.time() - start_time
-            
-            # Log response
-            log_level = logging.WARNING if response.status_code >= 400 else logging.INFO
-            logger.log(
-                log_level,
-                f"[{request_id}] {request.method} {log_path} - "
-                f"Status: {response.status_code} - Duration: {duration:.3f}s"
-            )
-            
-            # Add request ID to response headers
-            response.headers["X-Request-ID"] = request_id
-            
-            # Log security events
-            if response.status_code == 401:
-                logger.warning(f"[{request_id}] Unauthorized access attempt from {client_ip}")
-            elif response.status_code == 403:
-                logger.warning(f"[{request_id}] Forbidden access attempt from {client_ip}")
-            
-            return response
-            
+            await self.app(scope, receive, send_with_request_id)
         except Exception as e:
-            duration = time.time() - start_time
-            logger.error(
-                f"[{request_id}] {request.method} {log_path} - "
-                f"Error: {type(e).__name__} - Duration: {duration:.3f}s"
-            )
+            self._log(scope, logging.ERROR, status_code, start_time, 1, error=type(e).__name__)
             raise
+        else:
+            duration = time.perf_counter() - start_time
+            if status_code >= 400:
+                self._log(scope, logging.WARNING, status_code, start_time, 1)
+                # Log security events
+                if status_code in (401, 403):
+                    logger.warning(
+                        "%s access attempt from %s",
+                        "Unauthorized" if status_code == 401 else "Forbidden",
+                        self._get_client_ip(scope)
+                    )
+            elif duration >= self.slow_request_seconds:
+                self._log(scope, logging.WARNING, status_code, start_time, 1)
+            elif logger.isEnabledFor(logging.INFO):
+                every = self._sampled(self._route(scope))
+                if every:
+                    self._log(scope, logging.INFO, status_code, start_time, every)
+        finally:
+            request_id_var.reset(token)
+    
+    def _log(
+        self,
+        scope: Scope,
+        level: int,
+        status_code: int,
+        start_time: float,
+        sampled: int,
+        error: Optional[str] = None
+    ) -> None:
+        route = self._route(scope) or self._sanitize_path(scope["path"])
+        duration_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        # Arguments are interpolated by the log writer thread, not here
+        logger.log(
+            level,
+            "%s %s %s %.2fms",
+            scope["method"], route, error or status_code, duration_ms,
+            extra={
+                "method": scope["method"],
+                "route": route,
+                "status": status_code,
+                "duration_ms": duration_ms,
+                "client_ip": self._get_client_ip(scope),
+                "sampled": sampled,
+                **({"error": error} if error else {}),
+            }
+        )
     
-    def _get_client_ip(self, request: Request) -> str:
+    @staticmethod
+    def _route(scope: Scope) -> Optional[str]:
+        """Path template of the matched FastAPI route (set on the scope by the router)"""
+        route = scope.get("route")
+        return getattr(route, "path", None)
+    
+    def _get_client_ip(self, scope: Scope) -> str:
         """Extract client IP"""
-        forwarded = request.headers.get('X-Forwarded-For')
+        forwarded = get_header(scope, b'x-forwarded-for')
         if forwarded:
             return forwarded.split(',')[0].strip()
-        return request.client.host if request.client else 'unknown'
+        return _client_host(scope)
     
     def _sanitize_path(self, path: str) -> str:
         """Sanitize path for logging (remove sensitive data)"""
         # Remove potential tokens or IDs from path for logging
-        sanitized = re.sub(r'/[a-f0-9-]{36}', '/[ID]', path)
-        sanitized = re.sub(r'/\d+', '/[NUM]', sanitized)
+        sanitized = _UUID_SEGMENT.sub('/[ID]', path)
+        sanitized = _NUMERIC_SEGMENT.sub('/[NUM]', sanitized)
         return sanitized
 
-
-class WebhookValidationMiddleware(BaseHTTPMiddleware):
+class WebhookValidationMiddleware:
     """
     Validate webhook signatures from payment gateways
     """
     
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.webhook_paths = {
             '/api/payments/callback/kbz': 'KBZ_PAY_WEBHOOK_SECRET',
             '/api/payments/callback/wave': 'WAVE_MONEY_WEBHOOK_SECRET',
             '/api/payments/callback/aya': 'AYA_PAY_WEBHOOK_SECRET'
         }
     
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        path = scope["path"]
         
         # Check if this is a webhook endpoint
         if path in self.webhook_paths:
@@ -331,21 +442,23 @@ class WebhookValidationMiddleware(BaseHTTPMiddleware):
             
             if secret:
                 # Get signature from headers
-                signature = request.headers.get('X-Webhook-Signature') or \
-                           request.headers.get('X-Signature') or \
-                           request.headers.get('Authorization')
+                signature = get_header(scope, b'x-webhook-signature') or \
+                           get_header(scope, b'x-signature') or \
+                           get_header(scope, b'authorization')
                 
                 if not signature:
                     logger.warning(f"Webhook request without signature: {path}")
-                    return JSONResponse(
+                    response = JSONResponse(
                         status_code=401,
                         content={"detail": "Missing webhook signature"}
                     )
+                    await response(scope, receive, send)
+                    return
                 
                 # Validate signature (implementation depends on gateway)
                 # This is a placeholder - actual implementation varies by gateway
                 
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 
 # CORS configuration for production
@@ -77,7 +77,7 @@ async def get_current_user(
         )
     
     email = payload.get("sub")
-    user = await auth_service.users.find_one({"email": email})
+    user = await auth_service.get_authenticated_user(email)
     
     if not user:
         raise HTTPException(
@@ -274,7 +274,7 @@ async def setup_2fa(
     auth_service = request.app.state.auth_service
 
     # Verify password
-    if not auth_service.verify_password(data.password, current_user["password"]):
+    if not await auth_service.verify_user_password(current_user["user_id"], data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid password",
@@ -325,7 +325,7 @@ async def disable_2fa(
     auth_service = request.app.state.auth_service
 
     # Verify password
-    if not auth_service.verify_password(data.password, current_user["password"]):
+    if not await auth_service.verify_user_password(current_user["user_id"], data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid password",
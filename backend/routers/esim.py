@@ -2,10 +2,13 @@
 eSIM Router for eSIM Myanmar Platform
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Request, status
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from .auth import get_current_user
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.responses import ORJSONResponse
+from services.provisioning_service import MAX_BULK_QUANTITY
 
 router = APIRouter(prefix="/api/esim", tags=["eSIM Management"])
 
@@ -16,6 +19,12 @@ class CreateProfileRequest(BaseModel):
     device_type: Optional[str] = None
 
 
+class BulkCreateProfilesRequest(BaseModel):
+    quantity: int = Field(..., ge=1, le=MAX_BULK_QUANTITY)
+    plan_id: Optional[str] = None
+    device_type: Optional[str] = None
+
+
 class ActivateProfileRequest(BaseModel):
     device_type: str
     device_model: Optional[str] = None
@@ -47,17 +56,72 @@ async def create_profile(
     return {"message": "eSIM profile created", "profile": profile}
 
 
+@router.post("/profiles/bulk", status_code=status.HTTP_202_ACCEPTED)
+async def create_profiles_bulk(
+    request: Request,
+    data: BulkCreateProfilesRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Queue bulk provisioning of eSIM profiles (partners and admins)"""
+    if current_user.get("role") not in ("partner", "admin"):
+        raise HTTPException(status_code=403, detail="Bulk provisioning requires a partner account")
+    
+    provisioning_service = request.app.state.provisioning_service
+    
+    try:
+        job = await provisioning_service.submit(
+            user_id=current_user["user_id"],
+            quantity=data.quantity,
+            plan_id=data.plan_id,
+            device_type=data.device_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"message": "Bulk provisioning queued", "job": job}
+
+
+@router.get("/profiles/bulk/{job_id}")
+async def get_bulk_job(
+    request: Request,
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get bulk provisioning job progress and per-item failures"""
+    provisioning_service = request.app.state.provisioning_service
+    
+    job = await provisioning_service.get_job(job_id, current_user["user_id"])
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return ORJSONResponse({"job": job})
+
+
 @router.get("/profiles")
 async def get_profiles(
     request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all user's eSIM profiles"""
+    """Get user's eSIM profiles (paginated with next_cursor)"""
     esim_service = request.app.state.esim_service
     
-    profiles = await esim_service.get_user_profiles(current_user["user_id"])
+    try:
+        profiles, next_cursor = await esim_service.get_user_profiles(
+            current_user["user_id"],
+            limit=limit,
+            cursor=cursor,
+            fields=fields
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"profiles": profiles}
+    return ORJSONResponse({"profiles": profiles, "next_cursor": next_cursor})
 
 
 @router.get("/profiles/{profile_id}")
@@ -80,6 +144,39 @@ async def get_profile(
     return {"profile": profile}
 
 
+@router.get("/profiles/{profile_id}/qr.png")
+async def get_profile_qr(
+    request: Request,
+    profile_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get eSIM activation QR code image"""
+    esim_service = request.app.state.esim_service
+    
+    # ETags are the quoted content key of the image
+    if_none_match = request.headers.get("if-none-match", "").strip()
+    cached_key = if_none_match.removeprefix("W/").strip('"') or None
+    
+    result = await esim_service.get_qr_png(profile_id, current_user["user_id"], cached_key)
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    key, png = result
+    headers = {
+        "ETag": f'"{key}"',
+        "Cache-Control": "private, max-age=86400"
+    }
+    if key == cached_key:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if png is None:
+        raise HTTPException(status_code=503, detail="QR code temporarily unavailable")
+    
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
 @router.post("/profiles/{profile_id}/activate")
 async def activate_profile(
     request: Request,
@@ -146,6 +243,27 @@ async def get_profile_usage(
     return {"usage": usage}
 
 
+@router.get("/profiles/{profile_id}/usage/history")
+async def get_profile_usage_history(
+    request: Request,
+    profile_id: str,
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    days: int = Query(30, ge=1, le=366),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get hourly or daily usage rollups"""
+    esim_service = request.app.state.esim_service
+    
+    try:
+        history = await esim_service.get_usage_history(
+            profile_id, current_user["user_id"], granularity=granularity, days=days
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return ORJSONResponse({"profile_id": profile_id, "granularity": granularity, "history": history})
+
+
 @router.post("/profiles/{profile_id}/qr/regenerate")
 async def regenerate_qr(
     request: Request,
@@ -3,15 +3,21 @@ eSIM Registration Router
 Handles MPT, ATOM U9, MYTEL eSIM registration, payment, and QR issuance
 """
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 from datetime import datetime
 import base64
 import re
 
+import orjson
+
 from services.mmqr_service import mmqr_service, phone_validator, PaymentStatus
+from services.mmqr_batch import MAX_BATCH_SIZE, parse_batch
 from services.nexora_ai_service import nexora_ai, VerificationStatus
+from services.verification_store import OrderUpdateConflict
+from .auth import get_admin_user
 
 
 router = APIRouter(prefix="/api/esim-registration", tags=["eSIM Registration"])
@@ -145,6 +151,7 @@ async def register_esim(request: RegistrationRequest):
         device_model=request.device_info.device_model,
         os_version=request.device_info.os_version
     )
+    await nexora_ai.save_order(order)
     
     # Generate payment QR
     payment_qr = mmqr_service.generate_payment_qr(
@@ -184,31 +191,39 @@ async def verify_payment(request: PaymentVerificationRequest):
     Step 4: Verify MMQR payment
     """
     # Get existing order
-    order = nexora_ai.get_verification_status(request.order_id)
+    order = await nexora_ai.get_verification_status(request.order_id)
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Verify payment
-    payment_result = nexora_ai.verify_payment(request.mmqr_data)
-    order.verifications.append(payment_result)
+    results = [nexora_ai.verify_payment(request.mmqr_data)]
+    payment_result = results[0]
     
     # Verify screenshot if provided
     if request.screenshot_base64:
-        screenshot_result = nexora_ai.verify_screenshot(request.screenshot_base64, "payment")
-        order.verifications.append(screenshot_result)
+        results.append(nexora_ai.verify_screenshot(request.screenshot_base64, "payment"))
     
-    # Update overall status
-    statuses = [v.status for v in order.verifications]
+    def apply_results(order):
+        order.verifications.extend(results)
+        
+        # Update overall status
+        statuses = [v.status for v in order.verifications]
+        
+        if VerificationStatus.FAILED in statuses:
+            order.overall_status = VerificationStatus.FAILED
+        elif all(s == VerificationStatus.VERIFIED for s in statuses):
+            order.overall_status = VerificationStatus.VERIFIED
+        else:
+            order.overall_status = VerificationStatus.REQUIRES_REVIEW
     
-    if VerificationStatus.FAILED in statuses:
-        order.overall_status = VerificationStatus.FAILED
-    elif all(s == VerificationStatus.VERIFIED for s in statuses):
-        order.overall_status = VerificationStatus.VERIFIED
-    else:
-        order.overall_status = VerificationStatus.REQUIRES_REVIEW
+    try:
+        order = await nexora_ai.update_order(request.order_id, apply_results)
+    except OrderUpdateConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
-    order.updated_at = datetime.utcnow().isoformat()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
     
     return VerificationResponse(
         success=payment_result.status == VerificationStatus.VERIFIED,
@@ -254,10 +269,10 @@ async def upload_screenshot(
     result = nexora_ai.verify_screenshot(base64_data, verification_type)
     
     # Update order if exists
-    order = nexora_ai.get_verification_status(order_id)
-    if order:
-        order.verifications.append(result)
-        order.updated_at = datetime.utcnow().isoformat()
+    try:
+        await nexora_ai.update_order(order_id, lambda order: order.verifications.append(result))
+    except OrderUpdateConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
     return VerificationResponse(
         success=result.status in [VerificationStatus.VERIFIED, VerificationStatus.REQUIRES_REVIEW],
@@ -278,7 +293,7 @@ async def issue_esim(order_id: str):
     """
     Step 5: Issue eSIM QR code after all verifications pass
     """
-    order = nexora_ai.get_verification_status(order_id)
+    order = await nexora_ai.get_verification_status(order_id)
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -313,7 +328,7 @@ async def get_order_status(order_id: str):
     """
     Get order status and verification details
     """
-    order = nexora_ai.get_verification_status(order_id)
+    order = await nexora_ai.get_verification_status(order_id)
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -348,7 +363,7 @@ async def parse_mmqr(qr_string: str):
     """
     try:
         parsed = mmqr_service.parse_mmqr(qr_string)
-        validation = mmqr_service.validate_payment(qr_string)
+        validation = mmqr_service.validate_parsed(parsed)
         
         return {
             "success": True,
@@ -367,6 +382,41 @@ async def parse_mmqr(qr_string: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/mmqr/verify-batch")
+async def verify_mmqr_batch(
+    request: Request,
+    expected_amount: Optional[float] = Query(None, gt=0),
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Validate many MMQR strings at once (back-office reconciliation)
+    Accepts a JSON array or NDJSON body, or either as a multipart "file" upload.
+    Streams NDJSON: one result per input in order, then a summary line.
+    """
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing file upload")
+        body = await upload.read()
+    else:
+        body = await request.body()
+    
+    try:
+        qr_strings = parse_batch(body)
+    except (ValueError, orjson.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if len(qr_strings) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} QR strings per batch")
+    
+    verifier = request.app.state.mmqr_batch_verifier
+    return StreamingResponse(
+        verifier.verify_ndjson(qr_strings, expected_amount),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.get("/providers")
 async def get_providers():
     """
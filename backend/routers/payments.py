@@ -2,12 +2,13 @@
 Payments Router for eSIM Myanmar Platform
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime
 
-from .auth import get_current_user
+from .auth import get_current_user, get_admin_user
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.responses import ORJSONResponse
 
 router = APIRouter(prefix="/api/payments", tags=["Payments"])
 
@@ -86,18 +87,25 @@ async def get_payment(
 @router.get("")
 async def get_payment_history(
     request: Request,
-    limit: int = 50,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get user's payment history"""
     payment_service = request.app.state.payment_service
     
-    transactions = await payment_service.get_user_transactions(
-        current_user["user_id"],
-        limit=limit
-    )
+    try:
+        transactions, next_cursor = await payment_service.get_user_transactions(
+            current_user["user_id"],
+            limit=limit,
+            cursor=cursor,
+            fields=fields
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"transactions": transactions}
+    return ORJSONResponse({"transactions": transactions, "next_cursor": next_cursor})
 
 
 @router.post("/callback")
@@ -144,6 +152,27 @@ async def request_refund(
     return {"message": "Refund requested", "refund": result}
 
 
+@router.post("/reconciliation/run")
+async def run_reconciliation(
+    request: Request,
+    current_user: dict = Depends(get_admin_user)
+):
+    """Reconcile stale pending payments with their gateways now (admin)"""
+    report = await request.app.state.reconciliation_service.run()
+    return ORJSONResponse({"report": report})
+
+
+@router.get("/reconciliation/reports")
+async def get_reconciliation_reports(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Get recent reconciliation reports (admin)"""
+    reports = await request.app.state.reconciliation_service.recent_reports(limit)
+    return ORJSONResponse({"reports": reports})
+
+
 @router.get("/methods/available")
 async def get_payment_methods(request: Request):
     """Get available payment methods"""
@@ -193,25 +222,14 @@ async def validate_promo_code(
     current_user: dict = Depends(get_current_user)
 ):
     """Validate promo code"""
-    db = request.app.state.db
-    
-    promo = await db.promo_codes.find_one({
-        "code": promo_code.upper(),
-        "is_active": True,
-        "valid_until": {"$gte": datetime.utcnow()}
-    })
-    
-    if not promo:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid or expired promo code"
-        )
+    promo_service = request.app.state.promo_service
     
-    # Check if applicable to plan
-    if promo.get("applicable_plans") and plan_id not in promo["applicable_plans"]:
+    try:
+        promo = await promo_service.check(promo_code, plan_id)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Promo code not applicable to this plan"
+            detail=str(e)
         )
     
     return {
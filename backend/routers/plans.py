@@ -9,7 +9,7 @@ from datetime import datetime
 import uuid
 
 from .auth import get_current_user, get_admin_user
-from utils.serialization import serialize_doc, serialize_list
+from utils.responses import ORJSONResponse
 
 router = APIRouter(prefix="/api/plans", tags=["Plans"])
 
@@ -38,82 +38,6 @@ class PlanUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
-# Default plans
-DEFAULT_PLANS = [
-    {
-        "plan_id": "plan_basic_5g",
-        "name": "Basic 5G",
-        "data_gb": 10.0,
-        "validity_days": 30,
-        "price": 5000,
-        "currency": "MMK",
-        "features": ["5G Network", "VoLTE", "Basic Roaming"],
-        "plan_type": "prepaid",
-        "is_popular": False,
-        "is_active": True
-    },
-    {
-        "plan_id": "plan_premium_5g",
-        "name": "Premium 5G",
-        "data_gb": 50.0,
-        "validity_days": 30,
-        "price": 20000,
-        "currency": "MMK",
-        "features": ["5G Network", "VoLTE", "Advanced Roaming", "Entertainment Bundle"],
-        "plan_type": "prepaid",
-        "is_popular": True,
-        "is_active": True
-    },
-    {
-        "plan_id": "plan_enterprise",
-        "name": "Enterprise Unlimited",
-        "data_gb": 999.0,
-        "validity_days": 365,
-        "price": 500000,
-        "currency": "MMK",
-        "features": ["5G Network", "VoLTE", "Global Roaming", "Priority Support", "Dedicated Account Manager"],
-        "plan_type": "postpaid",
-        "is_popular": False,
-        "is_active": True
-    },
-    {
-        "plan_id": "plan_tourist_7d",
-        "name": "Tourist 7-Day",
-        "data_gb": 5.0,
-        "validity_days": 7,
-        "price": 3000,
-        "currency": "MMK",
-        "features": ["4G/5G Network", "VoLTE"],
-        "plan_type": "prepaid",
-        "is_popular": False,
-        "is_active": True
-    },
-    {
-        "plan_id": "plan_data_booster",
-        "name": "Data Booster 20GB",
-        "data_gb": 20.0,
-        "validity_days": 30,
-        "price": 8000,
-        "currency": "MMK",
-        "features": ["5G Network", "VoLTE", "Roaming"],
-        "plan_type": "prepaid",
-        "is_popular": False,
-        "is_active": True
-    }
-]
-
-
-async def ensure_default_plans(db):
-    """Ensure default plans exist in database"""
-    plans_collection = db.plans
-    
-    existing = await plans_collection.count_documents({})
-    if existing == 0:
-        for plan in DEFAULT_PLANS:
-            plan["created_at"] = datetime.utcnow()
-            await plans_collection.insert_one(plan)
-
-
 @router.get("")
 async def get_plans(
     request: Request,
@@ -121,28 +45,19 @@ async def get_plans(
     is_active: bool = True
 ):
     """Get all available plans"""
-    db = request.app.state.db
-    
-    # Ensure default plans exist
-    await ensure_default_plans(db)
-    
-    # Build query
-    query = {"is_active": is_active}
-    if plan_type:
-        query["plan_type"] = plan_type
+    plan_catalog = request.app.state.plan_catalog
     
-    cursor = db.plans.find(query)
-    plans = await cursor.to_list(length=100)
+    plans = plan_catalog.list_plans(plan_type=plan_type, is_active=is_active)
     
-    return {"plans": serialize_list(plans)}
+    return ORJSONResponse({"plans": plans})
 
 
 @router.get("/{plan_id}")
 async def get_plan(request: Request, plan_id: str):
     """Get specific plan by ID"""
-    db = request.app.state.db
+    plan_catalog = request.app.state.plan_catalog
     
-    plan = await db.plans.find_one({"plan_id": plan_id})
+    plan = plan_catalog.get(plan_id)
     
     if not plan:
         raise HTTPException(
@@ -150,7 +65,7 @@ async def get_plan(request: Request, plan_id: str):
             detail="Plan not found"
         )
     
-    return {"plan": serialize_doc(plan)}
+    return {"plan": plan}
 
 
 @router.post("")
@@ -171,8 +86,10 @@ async def create_plan(
     }
     
     await db.plans.insert_one(plan)
+    plan.pop("_id", None)
+    await request.app.state.plan_catalog.invalidate()
     
-    return {"message": "Plan created", "plan": serialize_doc(plan)}
+    return {"message": "Plan created", "plan": plan}
 
 
 @router.put("/{plan_id}")
@@ -204,9 +121,11 @@ async def update_plan(
     )
     
     # Get updated plan
-    plan = await db.plans.find_one({"plan_id": plan_id})
+    plan_catalog = request.app.state.plan_catalog
+    await plan_catalog.invalidate()
+    plan = plan_catalog.get(plan_id)
     
-    return {"message": "Plan updated", "plan": serialize_doc(plan)}
+    return {"message": "Plan updated", "plan": plan}
 
 
 @router.delete("/{plan_id}")
@@ -235,13 +154,15 @@ async def delete_plan(
             detail="Plan not found"
         )
     
+    await request.app.state.plan_catalog.invalidate()
+    
     return {"message": "Plan deleted"}
 
 
 @router.get("/compare/{plan_ids}")
 async def compare_plans(request: Request, plan_ids: str):
     """Compare multiple plans"""
-    db = request.app.state.db
+    plan_catalog = request.app.state.plan_catalog
     
     ids = plan_ids.split(",")
     if len(ids) < 2 or len(ids) > 4:
@@ -250,7 +171,6 @@ async def compare_plans(request: Request, plan_ids: str):
             detail="Provide 2-4 plan IDs separated by commas"
         )
     
-    cursor = db.plans.find({"plan_id": {"$in": ids}})
-    plans = await cursor.to_list(length=4)
+    plans = [plan for plan in map(plan_catalog.get, dict.fromkeys(ids)) if plan]
     
-    return {"plans": serialize_list(plans), "comparison_count": len(plans)}
+    return ORJSONResponse({"plans": plans, "comparison_count": len(plans)})
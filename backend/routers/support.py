@@ -2,16 +2,25 @@
 Support Router for eSIM Myanmar Platform
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 import uuid
 
 from .auth import get_current_user, get_admin_user
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_projection, paginate
+from utils.responses import ORJSONResponse
 
 router = APIRouter(prefix="/api/support", tags=["Support"])
 
+# Fields selectable with fields= on ticket listings
+TICKET_FIELDS = {
+    "ticket_id", "user_id", "subject", "description", "category", "priority",
+    "status", "profile_id", "transaction_id", "preferred_contact", "assigned_to",
+    "created_at", "updated_at", "resolved_at", "response_count", "last_response_at"
+}
+
 
 # Request Models
 class CreateTicketRequest(BaseModel):
@@ -72,7 +81,9 @@ async def create_ticket(
 async def get_tickets(
     request: Request,
     status: Optional[str] = None,
-    limit: int = 50,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get user's support tickets"""
@@ -82,13 +93,20 @@ async def get_tickets(
     if status:
         query["status"] = status
     
-    cursor = db.support_tickets.find(query).sort("created_at", -1).limit(limit)
-    tickets = await cursor.to_list(length=limit)
-    
-    for ticket in tickets:
-        ticket.pop("_id", None)
+    try:
+        projection = build_projection(fields, TICKET_FIELDS, "ticket_id")
+        tickets, next_cursor = await paginate(
+            db.support_tickets,
+            query,
+            "ticket_id",
+            limit=limit,
+            cursor=cursor,
+            projection=projection
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"tickets": tickets}
+    return ORJSONResponse({"tickets": tickets, "next_cursor": next_cursor})
 
 
 @router.get("/tickets/{ticket_id}")
@@ -100,10 +118,10 @@ async def get_ticket(
     """Get specific ticket"""
     db = request.app.state.db
     
-    ticket = await db.support_tickets.find_one({
-        "ticket_id": ticket_id,
-        "user_id": current_user["user_id"]
-    })
+    ticket = await db.support_tickets.find_one(
+        {"ticket_id": ticket_id, "user_id": current_user["user_id"]},
+        {"_id": 0}
+    )
     
     if not ticket:
         raise HTTPException(
@@ -111,15 +129,10 @@ async def get_ticket(
             detail="Ticket not found"
         )
     
-    ticket.pop("_id", None)
-    
     # Get messages
-    cursor = db.ticket_messages.find({"ticket_id": ticket_id}).sort("created_at", 1)
+    cursor = db.ticket_messages.find({"ticket_id": ticket_id}, {"_id": 0}).sort("created_at", 1)
     messages = await cursor.to_list(length=100)
     
-    for msg in messages:
-        msg.pop("_id", None)
-    
     return {"ticket": ticket, "messages": messages}
 
 
@@ -223,7 +236,7 @@ async def get_faq(
     if category:
         query["category"] = category
     
-    cursor = db.faq.find(query).sort("order", 1)
+    cursor = db.faq.find(query, {"_id": 0}).sort("order", 1)
     items = await cursor.to_list(length=100)
     
     # If no FAQ items, return defaults
@@ -266,9 +279,6 @@ async def get_faq(
             }
         ]
     
-    for item in items:
-        item.pop("_id", None)
-    
     return {"faq": items}
 
 
@@ -290,13 +300,10 @@ async def admin_get_tickets(
     if priority:
         query["priority"] = priority
     
-    cursor = db.support_tickets.find(query).sort("created_at", -1).limit(limit)
+    cursor = db.support_tickets.find(query, {"_id": 0}).sort("created_at", -1).limit(limit)
     tickets = await cursor.to_list(length=limit)
     
-    for ticket in tickets:
-        ticket.pop("_id", None)
-    
-    return {"tickets": tickets}
+    return ORJSONResponse({"tickets": tickets})
 
 
 @router.put("/admin/tickets/{ticket_id}")
@@ -0,0 +1,42 @@
+"""
+Usage Ingestion Router for eSIM Myanmar Platform
+Batched CDR-style usage records from the network mediation system
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+import secrets
+
+router = APIRouter(prefix="/api/usage", tags=["Usage Metering"])
+
+MAX_RECORDS_PER_BATCH = 10_000
+
+
+class UsageBatchRequest(BaseModel):
+    batch_id: Optional[str] = Field(None, max_length=128)
+    records: List[Dict[str, Any]] = Field(..., max_length=MAX_RECORDS_PER_BATCH)
+
+
+async def verify_ingest_token(request: Request):
+    """Require the shared ingestion bearer token"""
+    expected = request.app.state.usage_ingest_token
+    if not expected:
+        raise HTTPException(status_code=503, detail="Usage ingestion is not configured")
+    
+    provided = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not secrets.compare_digest(provided, expected):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid ingestion token")
+
+
+@router.post("/records", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(verify_ingest_token)])
+async def ingest_usage_records(request: Request, data: UsageBatchRequest):
+    """
+    Accept a batch of usage records ({iccid, bytes | bytes_up + bytes_down, timestamp})
+    Records are aggregated in memory and flushed in bulk every few seconds;
+    resend a failed batch with the same batch_id to avoid double counting
+    """
+    usage_ingestor = request.app.state.usage_ingestor
+    
+    result = await usage_ingestor.ingest(data.records, batch_id=data.batch_id)
+    return result
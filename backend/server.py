@@ -16,6 +16,7 @@ import base64
 
 # Import serialization utilities
 from utils.serialization import serialize_doc, serialize_list
+from services.id_allocator import ICCIDAllocator
 
 load_dotenv()
 
@@ -48,6 +49,7 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 10080
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/esim_myanmar")
 client = AsyncIOMotorClient(MONGO_URL)
 db = client.get_database()
+iccid_allocator = ICCIDAllocator(db)
 
 # Collections
 users_collection = db.users
@@ -235,7 +237,7 @@ async def create_esim_profile(current_user: dict = Depends(get_current_user)):
     profile = {
         "profile_id": str(uuid.uuid4()),
         "user_id": current_user["user_id"],
-        "iccid": f"89959{uuid.uuid4().hex[:15]}",
+        "iccid": await iccid_allocator.allocate(),
         "status": "inactive",
         "qr_code": None,
         "activation_code": None,
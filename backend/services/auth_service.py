@@ -14,12 +14,20 @@ import secrets
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from .password_hasher import PasswordHasher
+from .user_cache import UserCache, USER_CACHE_PROJECTION
+
 logger = logging.getLogger(__name__)
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
+def create_password_context(bcrypt_rounds: int = 12) -> CryptContext:
+    """Build a bcrypt context with the configured cost factor"""
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=bcrypt_rounds)
+
+
 class AuthService:
     """Authentication service with enhanced security"""
 
@@ -33,6 +41,9 @@ class AuthService:
         min_password_length: int = 12,
         max_failed_attempts: int = 5,
         lockout_duration_minutes: int = 30,
+        password_hasher: Optional[PasswordHasher] = None,
+        rehash_on_login: bool = False,
+        user_cache: Optional[UserCache] = None,
     ):
         self.db = db
         self.users = db.users
@@ -48,18 +59,34 @@ class AuthService:
         self.max_failed_attempts = max_failed_attempts
         self.lockout_duration_minutes = lockout_duration_minutes
 
+        # bcrypt runs on a bounded worker pool, never on the event loop
+        self.password_hasher = password_hasher or PasswordHasher(pwd_context)
+        self.rehash_on_login = rehash_on_login
+
+        # Projected user records for get_current_user
+        self.user_cache = user_cache or UserCache()
+
     # ------------------ Password hashing and validation ------------------
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify password against hash"""
+        if not hashed_password:
+            return False
         try:
-            verified = pwd_context.verify(plain_password, hashed_password)
-            return verified
-        except Exception:
+            return await self.password_hasher.verify(plain_password, hashed_password)
+        except ValueError:
+            # Malformed or unknown hash format
             return False
 
-    def get_password_hash(self, password: str) -> str:
+    async def get_password_hash(self, password: str) -> str:
         """Hash password"""
-        return pwd_context.hash(password)
+        return await self.password_hasher.hash(password)
+
+    async def verify_user_password(self, user_id: str, plain_password: str) -> bool:
+        """Verify a password against the stored hash for user_id"""
+        user = await self.users.find_one({"user_id": user_id}, {"password": 1})
+        if not user:
+            return False
+        return await self.verify_password(plain_password, user.get("password", ""))
 
     def validate_password(self, password: str) -> None:
         """Validate password policy."""
@@ -117,6 +144,7 @@ class AuthService:
             {"user_id": user_id, "revoked": False},
             {"$set": {"revoked": True, "revoked_at": datetime.utcnow()}}
         )
+        await self.invalidate_user(user_id=user_id)
 
     async def rotate_refresh_token(self, user_id: str, old_token_id: str) -> Tuple[str, datetime]:
         """Rotate refresh token: revoke old and issue a new one."""
@@ -135,6 +163,39 @@ class AuthService:
             logger.warning(f"Token decode error: {e}")
             return None
 
+    # ------------------ Authenticated user lookup ------------------
+    async def get_authenticated_user(self, email: str) -> Optional[dict]:
+        """Return the projected user record for an access token subject (cached)"""
+        user = self.user_cache.get(email)
+        if user is not None:
+            return user
+
+        generation = self.user_cache.generation
+        user = await self.users.find_one({"email": email}, USER_CACHE_PROJECTION)
+        if user:
+            self.user_cache.put(user, generation=generation)
+        return user
+
+    async def invalidate_user(self, user_id: Optional[str] = None, email: Optional[str] = None):
+        """Hook: drop cached user state after any change that affects authorization"""
+        await self.user_cache.invalidate(user_id=user_id, email=email)
+
+    async def update_user_status(self, user_id: str, status: str):
+        """Change account status (active, suspended, ...)"""
+        await self.users.update_one(
+            {"user_id": user_id},
+            {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+        )
+        await self.invalidate_user(user_id=user_id)
+
+    async def update_user_role(self, user_id: str, role: str):
+        """Change account role"""
+        await self.users.update_one(
+            {"user_id": user_id},
+            {"$set": {"role": role, "updated_at": datetime.utcnow()}}
+        )
+        await self.invalidate_user(user_id=user_id)
+
     # ------------------ Authentication ------------------
     async def authenticate_user(self, email: str, password: str) -> Optional[dict]:
         """Authenticate user with email and password"""
@@ -150,7 +211,7 @@ class AuthService:
             return None
 
         # Verify password
-        if not self.verify_password(password, user.get("password", "")):
+        if not await self.verify_password(password, user.get("password", "")):
             # Increment failed attempts
             await self._handle_failed_login(user)
             return None
@@ -163,12 +224,13 @@ class AuthService:
                 "last_login": datetime.utcnow(),
             }
         }
-        # Optional: rehash password if needed
-        try:
-            if pwd_context.needs_update(user.get("password", "")):
-                update_doc["$set"]["password"] = self.get_password_hash(password)
-        except Exception:
-            pass
+        # Opt-in: rehash password when the cost factor or scheme has changed
+        if self.rehash_on_login:
+            try:
+                if self.password_hasher.needs_update(user.get("password", "")):
+                    update_doc["$set"]["password"] = await self.get_password_hash(password)
+            except ValueError:
+                pass
 
         await self.users.update_one({"_id": user["_id"]}, update_doc)
         return user
@@ -197,7 +259,7 @@ class AuthService:
         user_doc = {
             "user_id": str(uuid.uuid4()),
             "email": email_norm,
-            "password": self.get_password_hash(user_data["password"]),
+            "password": await self.get_password_hash(user_data["password"]),
             "full_name": user_data["full_name"],
             "phone_number": user_data["phone_number"],
             "country": user_data.get("country", "Myanmar"),
@@ -220,7 +282,7 @@ class AuthService:
         token_id = str(uuid.uuid4())
         secret_part = secrets.token_urlsafe(32)
         plaintext_token = f"{token_id}.{secret_part}"
-        token_hash = self.get_password_hash(plaintext_token)
+        token_hash = await self.get_password_hash(plaintext_token)
         expires_at = datetime.utcnow() + timedelta(minutes=30)  # 30 minutes validity
 
         await self.password_reset_tokens.insert_one({
@@ -251,7 +313,7 @@ class AuthService:
             return None
 
         # Verify token hash against full plaintext token
-        if not self.verify_password(token, rec.get("token_hash", "")):
+        if not await self.verify_password(token, rec.get("token_hash", "")):
             return None
 
         # Enforce password policy
@@ -264,7 +326,7 @@ class AuthService:
 
         await self.users.update_one(
             {"user_id": rec["user_id"]},
-            {"$set": {"password": self.get_password_hash(new_password), "updated_at": datetime.utcnow()}}
+            {"$set": {"password": await self.get_password_hash(new_password), "updated_at": datetime.utcnow()}}
         )
 
         # Mark token as used
@@ -321,6 +383,7 @@ class AuthService:
             }
         )
         await self.clear_pending_2fa_secret(user_id)
+        await self.invalidate_user(user_id=user_id)
 
     async def disable_2fa(self, user_id: str):
         """Disable 2FA for user"""
@@ -335,3 +398,4 @@ class AuthService:
             }
         )
         await self.clear_pending_2fa_secret(user_id)
+        await self.invalidate_user(user_id=user_id)
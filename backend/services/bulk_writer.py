@@ -0,0 +1,265 @@
+"""
+Bulk Writer for eSIM Myanmar Platform
+Buffers append-only rows (audit logs, transactions, tickets) and flushes them
+as bulk inserts by size or time, spilling to disk while the upstream is down
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Files not touched for this long are no longer being appended to by their writer
+SPILL_SETTLE_SECONDS = 30.0
+
+SendBatch = Callable[[str, List[Dict[str, Any]]], Awaitable[bool]]
+
+_STOP = object()
+
+
+class BulkWriter:
+    """Buffered, bounded writer flushing per-table batches through send(table, rows)"""
+
+    def __init__(
+        self,
+        send: SendBatch,
+        max_batch: int = 500,
+        flush_interval_seconds: float = 2.0,
+        max_queue: int = 10_000,
+        put_timeout_seconds: float = 1.0,
+        spill_dir: Optional[str] = None,
+        replay_interval_seconds: float = 30.0
+    ):
+        self.send = send
+        self.max_batch = max_batch
+        self.flush_interval_seconds = flush_interval_seconds
+        self.put_timeout_seconds = put_timeout_seconds
+        self.spill_dir = spill_dir
+        self.replay_interval_seconds = replay_interval_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._buffers: Dict[str, List[dict]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._spill_lock = asyncio.Lock()
+        self._next_replay = 0.0
+        self._spill_pending = False  # Spill files exist, so the loop must wake up to replay them
+
+        # Metrics
+        self.written = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+
+    @property
+    def spill_path(self) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, f"spill-{os.getpid()}.jsonl")
+
+    async def start(self) -> None:
+        """Start the flush task (replays rows spilled by earlier runs)"""
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still queued or buffered, then stop"""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def write(self, table: str, row: Dict[str, Any]) -> None:
+        """
+        Queue a row for bulk insert
+        Waits for space when the queue is full (backpressure); rows that still
+        cannot be queued after put_timeout_seconds are spilled to disk
+        """
+        self.written += 1
+        try:
+            await asyncio.wait_for(self._queue.put((table, row)), self.put_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"Bulk writer queue full, spilling {table} row")
+            await self._spill(table, [row])
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of writer metrics"""
+        return {
+            "queued": self._queue.qsize(),
+            "buffered": sum(len(rows) for rows in self._buffers.values()),
+            "written": self.written,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+        }
+
+    # ------------------ Flushing ------------------
+    async def _run(self) -> None:
+        await self._replay()
+        deadline = None
+        while True:
+            wake_at = deadline
+            if self._spill_pending:
+                wake_at = self._next_replay if deadline is None else min(deadline, self._next_replay)
+            timeout = None if wake_at is None else max(0.0, wake_at - time.monotonic())
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _STOP:
+                await self._drain()
+                return
+
+            if item is not None:
+                table, row = item
+                rows = self._buffers.setdefault(table, [])
+                rows.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval_seconds
+                if len(rows) >= self.max_batch:
+                    await self._flush_table(table)
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                await self._flush_all()
+            if not any(self._buffers.values()):
+                deadline = None
+            if now >= self._next_replay:
+                await self._replay()
+
+    async def _drain(self) -> None:
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                table, row = item
+                self._buffers.setdefault(table, []).append(row)
+        await self._flush_all()
+
+    async def _flush_all(self) -> None:
+        for table in list(self._buffers):
+            await self._flush_table(table)
+
+    async def _flush_table(self, table: str) -> None:
+        rows = self._buffers.pop(table, [])
+        for start in range(0, len(rows), self.max_batch):
+            batch = rows[start:start + self.max_batch]
+            if await self._send(table, batch):
+                self.flushed += len(batch)
+            else:
+                await self._spill(table, batch)
+
+    async def _send(self, table: str, rows: List[dict]) -> bool:
+        self.batches += 1
+        try:
+            ok = await self.send(table, rows)
+        except Exception as e:
+            logger.error(f"Bulk insert into {table} failed: {e}")
+            ok = False
+        if not ok:
+            self.failed_batches += 1
+        return ok
+
+    # ------------------ Spill file ------------------
+    async def _spill(self, table: str, rows: List[dict]) -> None:
+        path = self.spill_path
+        if path is None:
+            logger.error(f"Dropping {len(rows)} {table} rows: upstream unavailable and no spill dir")
+            self.dropped += len(rows)
+            return
+
+        line = dumps({"table": table, "rows": rows}) + b"\n"
+        try:
+            async with self._spill_lock:
+                await asyncio.to_thread(_append, path, line)
+        except OSError as e:
+            # Full disk or permissions: losing these rows must not stop the flush loop
+            logger.error(f"Dropping {len(rows)} {table} rows: upstream unavailable and spill failed: {e}")
+            self.dropped += len(rows)
+            return
+        self.spilled += len(rows)
+        self._spill_pending = True
+
+    def _spill_files(self) -> List[str]:
+        # replay-*.jsonl left behind by a crash mid-replay are picked up again once settled
+        return [
+            path
+            for pattern in ("spill-*.jsonl", "replay-*.jsonl")
+            for path in glob.glob(os.path.join(self.spill_dir, pattern))
+        ]
+
+    def _claimable_spill_files(self) -> List[str]:
+        files = []
+        now = time.time()
+        for path in self._spill_files():
+            try:
+                settled = now - os.path.getmtime(path) >= SPILL_SETTLE_SECONDS
+            except OSError:
+                continue
+            if path == self.spill_path or settled:
+                files.append(path)
+        return files
+
+    async def _replay(self) -> None:
+        """Re-send spilled batches; stops at the first failure and keeps the rest"""
+        self._next_replay = time.monotonic() + self.replay_interval_seconds
+        if not self.spill_dir:
+            return
+
+        async with self._spill_lock:
+            claimed = []
+            for path in self._claimable_spill_files():
+                target = os.path.join(self.spill_dir, f"replay-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+                try:
+                    os.rename(path, target)
+                except OSError:
+                    continue  # Claimed by another worker
+                claimed.append(target)
+
+        for path in claimed:
+            batches = await asyncio.to_thread(_read_batches, path)
+            for index, (table, rows) in enumerate(batches):
+                if not await self._send(table, rows):
+                    # Upstream still down: keep this and the remaining batches
+                    for table_left, rows_left in batches[index:]:
+                        await self._spill(table_left, rows_left)
+                    break
+                self.replayed += len(rows)
+                # Keep the claim fresh so other workers do not treat it as abandoned
+                await asyncio.to_thread(os.utime, path)
+            await asyncio.to_thread(os.remove, path)
+
+        # Also covers files of other workers that are not settled yet
+        self._spill_pending = bool(await asyncio.to_thread(self._spill_files))
+
+
+def _append(path: str, line: bytes) -> None:
+    with open(path, "ab") as f:
+        f.write(line)
+
+
+def _read_batches(path: str) -> List[Tuple[str, List[dict]]]:
+    batches = []
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                batches.append((entry["table"], entry["rows"]))
+            except (ValueError, KeyError):
+                logger.error(f"Skipping corrupt line in spill file {path}")
+    return batches
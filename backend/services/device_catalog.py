@@ -0,0 +1,180 @@
+"""
+Device Catalog for eSIM Myanmar Platform
+eSIM compatibility lookups against a catalog loaded from a data file
+(data/device_catalog.json by default). Model families are compiled into a
+word trie and manufacturer model codes into a prefix trie, so a lookup walks
+the reported model string once instead of fuzzy-matching every entry.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parent.parent / "data" / "device_catalog.json"
+
+_TOKEN = re.compile(r"[a-z]+|\d+")
+_ORDINAL_SUFFIXES = frozenset({"st", "nd", "rd", "th"})
+_CODE_SEPARATORS = re.compile(r"[\s\-_]+")
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    """Lowercase words and numbers: 'Galaxy S21+ (5G)' -> ('galaxy', 's', '21', '5', 'g')"""
+    return tuple(_TOKEN.findall(text.lower()))
+
+
+def compact_code(text: str) -> str:
+    """Model code without separators: 'SM-G991B' -> 'smg991b'"""
+    return _CODE_SEPARATORS.sub("", text.lower())
+
+
+@dataclass(frozen=True)
+class DeviceEntry:
+    """One catalog line: a model family with an optional generation range"""
+    label: str
+    family: str
+    min_generation: Optional[int] = None
+    max_generation: Optional[int] = None
+    ordinal: bool = False  # Generation written as '3rd', '7th', ...
+
+    def generation_matches(self, rest: Tuple[str, ...]) -> bool:
+        """Check the words that follow the family name"""
+        if self.min_generation is None and self.max_generation is None:
+            return True
+
+        generation = None
+        if self.ordinal:
+            # 'iPad Pro 12.9-inch (3rd generation)': the number followed by an ordinal suffix
+            for number, suffix in zip(rest, rest[1:]):
+                if number.isdigit() and suffix in _ORDINAL_SUFFIXES:
+                    generation = int(number)
+                    break
+        elif rest and rest[0].isdigit():
+            # The generation must follow the family directly ('Xiaomi 13', not 'Xiaomi Redmi Note 13')
+            generation = int(rest[0])
+
+        if generation is None:
+            return False
+        if self.min_generation is not None and generation < self.min_generation:
+            return False
+        if self.max_generation is not None and generation > self.max_generation:
+            return False
+        return True
+
+
+class _Node:
+    __slots__ = ("children", "entry")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.entry: Optional[DeviceEntry] = None
+
+
+class PlatformIndex:
+    """Compiled lookup structures for one platform (ios, android)"""
+
+    def __init__(self, min_version: str, entries: List[dict]):
+        self.min_version = min_version
+        self.entries: List[DeviceEntry] = []
+        self._families = _Node()
+        self._codes = _Node()
+        self.max_family_words = 0
+
+        for raw in entries:
+            entry = DeviceEntry(
+                label=raw["label"],
+                family=raw["family"],
+                min_generation=raw.get("min_generation"),
+                max_generation=raw.get("max_generation"),
+                ordinal=raw.get("ordinal", False),
+            )
+            self.entries.append(entry)
+            for name in [entry.family, *raw.get("aliases", [])]:
+                words = tokenize(name)
+                self.max_family_words = max(self.max_family_words, len(words))
+                self._insert(self._families, words, entry)
+            for prefix in raw.get("code_prefixes", []):
+                self._insert(self._codes, compact_code(prefix), entry)
+
+    @staticmethod
+    def _insert(root: _Node, keys, entry: DeviceEntry) -> None:
+        node = root
+        for key in keys:
+            node = node.children.setdefault(key, _Node())
+        node.entry = entry
+
+    def _match_family(self, words: Tuple[str, ...]) -> Optional[DeviceEntry]:
+        for start in range(len(words)):
+            # Longest family starting here ('iPhone SE' before 'iPhone')
+            node = self._families
+            deepest: Optional[Tuple[DeviceEntry, int]] = None
+            for position in range(start, min(len(words), start + self.max_family_words)):
+                node = node.children.get(words[position])
+                if node is None:
+                    break
+                if node.entry is not None:
+                    deepest = (node.entry, position + 1)
+            if deepest is not None:
+                entry, end = deepest
+                if entry.generation_matches(words[end:]):
+                    return entry
+        return None
+
+    def _match_code(self, model: str) -> Optional[DeviceEntry]:
+        for word in model.split():
+            node = self._codes
+            matched = None
+            for char in compact_code(word):
+                node = node.children.get(char)
+                if node is None:
+                    break
+                if node.entry is not None:
+                    matched = node.entry
+            if matched is not None:
+                return matched
+        return None
+
+    def match(self, model: str) -> Optional[DeviceEntry]:
+        """Catalog entry covering the reported model, or None"""
+        return self._match_family(tokenize(model)) or self._match_code(model)
+
+
+class DeviceCatalog:
+    """eSIM device catalog with cached lookups"""
+
+    def __init__(self, data: dict, cache_size: int = 4096):
+        self.version = data.get("version")
+        self.platforms: Dict[str, PlatformIndex] = {
+            name: PlatformIndex(platform.get("min_version", "0"), platform.get("models", []))
+            for name, platform in data.get("platforms", {}).items()
+        }
+        # User-agent model strings repeat heavily; cache per (platform, model)
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def load(cls, path=None, cache_size: int = 4096) -> "DeviceCatalog":
+        """Load and compile a catalog file (the bundled one by default)"""
+        path = Path(path) if path else DEFAULT_CATALOG_PATH
+        with open(path, encoding="utf-8") as f:
+            catalog = cls(json.load(f), cache_size=cache_size)
+        logger.info(f"Loaded device catalog {catalog.version} from {path}")
+        return catalog
+
+    def _lookup(self, platform: str, model: str) -> Optional[DeviceEntry]:
+        index = self.platforms.get(platform)
+        if index is None:
+            return None
+        return index.match(model)
+
+    def min_version(self, platform: str) -> Optional[str]:
+        index = self.platforms.get(platform)
+        return index.min_version if index else None
+
+    def counts(self) -> Dict[str, int]:
+        """Catalog entries per platform"""
+        return {name: len(index.entries) for name, index in self.platforms.items()}
@@ -6,74 +6,69 @@ Handles eSIM profile management, activation, and transfers
 from datetime import datetime, timedelta
 from typing import Optional, List
 import uuid
-import qrcode
-import io
-import base64
 import logging
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from utils.serialization import serialize_doc, serialize_list
+from pymongo import InsertOne, ReturnDocument, UpdateMany
+from utils.pagination import DEFAULT_PAGE_SIZE, build_projection, paginate
+from services.qr_store import QRCodeStore, qr_url
+from services.id_allocator import ICCIDAllocator, generate_activation_code
+from services.usage_service import BYTES_PER_GB
 
 logger = logging.getLogger(__name__)
 
+# Fields selectable with fields= on profile listings
+PROFILE_FIELDS = {
+    "profile_id", "user_id", "iccid", "eid", "msisdn", "status", "qr_code",
+    "activation_code", "plan_id", "data_limit_gb", "data_used_gb", "created_at",
+    "activation_date", "expiry_date", "device_type", "device_model", "device_imei",
+    "is_5g_enabled", "is_volte_enabled", "is_roaming_enabled", "updated_at"
+}
+
 
 class ESIMService:
     """eSIM profile management service"""
     
-    def __init__(self, db: AsyncIOMotorDatabase, smdp_client=None):
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        smdp_client=None,
+        qr_store: Optional[QRCodeStore] = None,
+        plan_catalog=None,
+        iccid_allocator: Optional[ICCIDAllocator] = None
+    ):
         self.db = db
         self.profiles = db.esim_profiles
         self.devices = db.devices
         self.transfers = db.esim_transfers
         self.smdp_client = smdp_client  # SM-DP+ integration client
+        self.qr_store = qr_store or QRCodeStore(db)
+        self.plan_catalog = plan_catalog  # In-memory PlanCatalog; falls back to the database
+        self.iccid_allocator = iccid_allocator or ICCIDAllocator(db)
+        self._plan_terms_version = None
+        self._plan_terms_cache = {}
     
-    def _generate_iccid(self) -> str:
-        """Generate ICCID (Integrated Circuit Card Identifier)"""
-        # Format: 89 (telecom) + 95 (Myanmar) + 9 (mobile) + 15 random digits
-        return f"89959{uuid.uuid4().hex[:15].upper()}"
-    
-    def _generate_activation_code(self) -> str:
-        """Generate activation code for manual entry"""
-        return f"LPA:1$esim.com.mm${uuid.uuid4().hex[:20].upper()}$"
-    
-    def _generate_qr_code(self, data: str) -> str:
-        """Generate QR code as base64 string"""
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=10,
-            border=4
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="#1e2f3c", back_color="white")
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        
-        return f"data:image/png;base64,{img_str}"
-    
-    async def create_profile(
+    def build_profile(
         self,
         user_id: str,
+        profile_id: str,
+        iccid: str,
+        activation_code: str,
+        qr_code_key: Optional[str],
         plan_id: Optional[str] = None,
-        device_type: Optional[str] = None
+        device_type: Optional[str] = None,
+        **extra
     ) -> dict:
-        """Create new eSIM profile"""
-        
-        iccid = self._generate_iccid()
-        activation_code = self._generate_activation_code()
-        qr_data = activation_code
-        
-        profile = {
-            "profile_id": str(uuid.uuid4()),
+        """Build a new, inactive profile document"""
+        return {
+            "profile_id": profile_id,
             "user_id": user_id,
             "iccid": iccid,
             "eid": None,
             "msisdn": None,
             "status": "inactive",
-            "qr_code": self._generate_qr_code(qr_data),
+            "qr_code": qr_url(profile_id),
+            "qr_code_key": qr_code_key,
             "activation_code": activation_code,
             "plan_id": plan_id,
             "data_limit_gb": 0.0,
@@ -86,21 +81,61 @@ class ESIMService:
             "device_imei": None,
             "is_5g_enabled": True,
             "is_volte_enabled": True,
-            "is_roaming_enabled": False
+            "is_roaming_enabled": False,
+            **extra
         }
+    
+    async def create_profile(
+        self,
+        user_id: str,
+        plan_id: Optional[str] = None,
+        device_type: Optional[str] = None
+    ) -> dict:
+        """Create new eSIM profile"""
+        
+        activation_code = generate_activation_code()
+        qr_code_key = await self.qr_store.store(activation_code)
+        profile = self.build_profile(
+            user_id=user_id,
+            profile_id=str(uuid.uuid4()),
+            iccid=await self.iccid_allocator.allocate(),
+            activation_code=activation_code,
+            qr_code_key=qr_code_key,
+            plan_id=plan_id,
+            device_type=device_type
+        )
         
         await self.profiles.insert_one(profile)
         logger.info(f"Created eSIM profile: {profile['profile_id']} for user: {user_id}")
         
-        return serialize_doc(profile)
+        profile.pop("_id", None)
+        return profile
     
-    async def get_user_profiles(self, user_id: str) -> List[dict]:
-        """Get all profiles for a user"""
-        cursor = self.profiles.find({"user_id": user_id})
-        profiles = await cursor.to_list(length=100)
+    async def get_user_profiles(
+        self,
+        user_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> tuple:
+        """Get a page of a user's profiles, newest first. Returns (profiles, next_cursor)."""
+        # Legacy documents may still hold an inline base64 image, so never read it back
+        projection = build_projection(fields, PROFILE_FIELDS, "profile_id", exclude=["qr_code"])
+        include_qr = not fields or projection.pop("qr_code", None) == 1
+        
+        profiles, next_cursor = await paginate(
+            self.profiles,
+            {"user_id": user_id},
+            "profile_id",
+            limit=limit,
+            cursor=cursor,
+            projection=projection
+        )
+        if include_qr:
+            for profile in profiles:
+                profile["qr_code"] = qr_url(profile["profile_id"])
         
-        # Serialize profiles
-        return serialize_list(profiles)
+        return profiles, next_cursor
     
     async def get_profile(self, profile_id: str, user_id: Optional[str] = None) -> Optional[dict]:
         """Get single profile by ID"""
@@ -108,8 +143,63 @@ class ESIMService:
         if user_id:
             query["user_id"] = user_id
         
-        profile = await self.profiles.find_one(query)
-        return serialize_doc(profile)
+        profile = await self.profiles.find_one(query, {"_id": 0, "qr_code": 0})
+        if profile:
+            profile["qr_code"] = qr_url(profile_id)
+        return profile
+    
+    async def get_qr_png(
+        self,
+        profile_id: str,
+        user_id: str,
+        cached_key: Optional[str] = None
+    ) -> Optional[tuple]:
+        """Get (key, PNG bytes) of a profile's QR image; bytes are None if cached_key is current"""
+        profile = await self.profiles.find_one(
+            {"profile_id": profile_id, "user_id": user_id},
+            {"_id": 0, "qr_code_key": 1, "activation_code": 1}
+        )
+        if not profile or not profile.get("activation_code"):
+            return None
+        
+        key = profile.get("qr_code_key")
+        if key and key == cached_key:
+            return key, None
+        
+        png = await self.qr_store.load(key) if key else None
+        if png is None:
+            # Profiles created before the QR store (or whose image was lost)
+            key = await self.qr_store.store(profile["activation_code"])
+            await self.profiles.update_one(
+                {"profile_id": profile_id},
+                {"$set": {"qr_code_key": key, "qr_code": qr_url(profile_id)}}
+            )
+            png = await self.qr_store.load(key)
+        
+        return key, png
+    
+    def _plan_terms(self, field: str, default):
+        """
+        Expression resolving a plan field from the profile's own plan_id
+        Built from the in-memory catalog (rebuilt when its version changes), so
+        activation needs no plan lookup round-trip
+        """
+        if self._plan_terms_version != self.plan_catalog.version:
+            plans = self.plan_catalog.list_plans(is_active=True) + self.plan_catalog.list_plans(is_active=False)
+            terms = {}
+            for name, fallback in (("validity_days", 30), ("data_gb", 0)):
+                branches = [
+                    {"case": {"$eq": ["$plan_id", plan["plan_id"]]}, "then": {"$literal": plan.get(name, fallback)}}
+                    for plan in plans
+                ]
+                # $switch requires at least one branch
+                terms[name] = (
+                    {"$switch": {"branches": branches, "default": {"$literal": fallback}}}
+                    if branches else {"$literal": fallback}
+                )
+            self._plan_terms_cache = terms
+            self._plan_terms_version = self.plan_catalog.version
+        return self._plan_terms_cache[field]
     
     async def activate_profile(
         self,
@@ -119,47 +209,50 @@ class ESIMService:
         device_model: Optional[str] = None,
         device_imei: Optional[str] = None
     ) -> dict:
-        """Activate eSIM profile"""
+        """Activate eSIM profile (exactly once, even under concurrent requests)"""
+        now = datetime.utcnow()
+        query = {"profile_id": profile_id, "user_id": user_id, "status": {"$ne": "active"}}
+        
+        if self.plan_catalog is not None:
+            validity_days = self._plan_terms("validity_days", 30)
+            data_gb = self._plan_terms("data_gb", 0)
+        else:
+            # No catalog: resolve the plan up front (the conditional update below still guards the race)
+            profile = await self.profiles.find_one(query, {"_id": 0, "plan_id": 1})
+            plan = await self.db.plans.find_one({"plan_id": profile["plan_id"]}) if profile and profile.get("plan_id") else None
+            validity_days = {"$literal": plan.get("validity_days", 30) if plan else 30}
+            data_gb = {"$literal": plan.get("data_gb", 0) if plan else 0}
+        
+        # Pipeline update so expiry and data limit come from the profile's plan in
+        # the same write; client-supplied values are wrapped in $literal
+        profile = await self.profiles.find_one_and_update(
+            query,
+            [{"$set": {
+                "status": "active",
+                "activation_date": {"$literal": now},
+                "expiry_date": {"$add": [{"$literal": now}, {"$multiply": [validity_days, 86_400_000]}]},
+                "device_type": {"$literal": device_type},
+                "device_model": {"$literal": device_model},
+                "device_imei": {"$literal": device_imei},
+                "data_limit_gb": data_gb,
+            }}],
+            projection={"_id": 0, "qr_code": 0},
+            return_document=ReturnDocument.AFTER
+        )
         
-        profile = await self.get_profile(profile_id, user_id)
-        if not profile:
+        if profile is None:
+            if await self.profiles.find_one({"profile_id": profile_id, "user_id": user_id}, {"_id": 1}):
+                raise ValueError("Profile is already active")
             raise ValueError("Profile not found")
         
-        if profile["status"] == "active":
-            raise ValueError("Profile is already active")
-        
-        # Get plan details if plan_id exists
-        plan = None
-        if profile.get("plan_id"):
-            plan = await self.db.plans.find_one({"plan_id": profile["plan_id"]})
-        
-        # Calculate expiry date
-        validity_days = plan.get("validity_days", 30) if plan else 30
-        expiry_date = datetime.utcnow() + timedelta(days=validity_days)
-        
-        # Update profile
-        update_data = {
-            "status": "active",
-            "activation_date": datetime.utcnow(),
-            "expiry_date": expiry_date,
-            "device_type": device_type,
-            "device_model": device_model,
-            "device_imei": device_imei,
-            "data_limit_gb": plan.get("data_gb", 0) if plan else 0
-        }
-        
-        await self.profiles.update_one(
-            {"profile_id": profile_id},
-            {"$set": update_data}
-        )
+        profile["qr_code"] = qr_url(profile_id)
         
         # Record device
         await self._record_device(user_id, profile_id, device_type, device_model, device_imei)
         
         logger.info(f"Activated eSIM profile: {profile_id}")
         
-        # Return updated profile
-        return await self.get_profile(profile_id)
+        return profile
     
     async def transfer_profile(
         self,
@@ -199,8 +292,9 @@ class ESIMService:
         await self.transfers.insert_one(transfer_record)
         
         # Generate new QR code
-        new_activation_code = self._generate_activation_code()
-        new_qr_code = self._generate_qr_code(new_activation_code)
+        new_activation_code = generate_activation_code()
+        new_qr_code = qr_url(profile_id)
+        new_qr_code_key = await self.qr_store.store(new_activation_code)
         
         # Update profile with new device info
         await self.profiles.update_one(
@@ -211,12 +305,15 @@ class ESIMService:
                     "device_model": target_device_model,
                     "device_imei": target_device_imei,
                     "qr_code": new_qr_code,
+                    "qr_code_key": new_qr_code_key,
                     "activation_code": new_activation_code,
                     "updated_at": datetime.utcnow()
                 }
             }
         )
         
+        await self.qr_store.delete(profile.get("qr_code_key"))
+        
         # Record new device
         await self._record_device(user_id, profile_id, target_device_type, target_device_model, target_device_imei)
         
@@ -251,13 +348,14 @@ class ESIMService:
             "is_active": True
         }
         
-        # Deactivate previous device for this profile
-        await self.devices.update_many(
-            {"profile_id": profile_id, "is_active": True},
-            {"$set": {"is_active": False}}
+        # Deactivate previous device for this profile and insert the new one in one round-trip
+        await self.devices.bulk_write(
+            [
+                UpdateMany({"profile_id": profile_id, "is_active": True}, {"$set": {"is_active": False}}),
+                InsertOne(device_record),
+            ],
+            ordered=True
         )
-        
-        await self.devices.insert_one(device_record)
     
     async def get_usage(self, profile_id: str, user_id: str) -> dict:
         """Get usage statistics for profile"""
@@ -275,25 +373,61 @@ class ESIMService:
             "days_remaining": (profile.get("expiry_date") - datetime.utcnow()).days if profile.get("expiry_date") else None
         }
     
+    async def get_usage_history(
+        self,
+        profile_id: str,
+        user_id: str,
+        granularity: str = "day",
+        days: int = 30
+    ) -> List[dict]:
+        """Get precomputed hourly or daily usage rollups for a profile"""
+        if granularity not in ("hour", "day"):
+            raise ValueError("Granularity must be 'hour' or 'day'")
+        
+        profile = await self.profiles.find_one(
+            {"profile_id": profile_id, "user_id": user_id},
+            {"_id": 0, "iccid": 1}
+        )
+        if not profile:
+            raise ValueError("Profile not found")
+        
+        since = datetime.utcnow() - timedelta(days=days)
+        rollups = await self.db.usage_rollups.find(
+            {"iccid": profile["iccid"], "granularity": granularity, "bucket": {"$gte": since}},
+            {"_id": 0, "bucket": 1, "bytes": 1, "records": 1}
+        ).sort("bucket", 1).to_list(length=None)
+        
+        return [
+            {
+                "bucket": rollup["bucket"],
+                "data_used_gb": round(rollup["bytes"] / BYTES_PER_GB, 4),
+                "records": rollup["records"]
+            }
+            for rollup in rollups
+        ]
+    
     async def regenerate_qr(self, profile_id: str, user_id: str) -> dict:
         """Regenerate QR code for profile"""
         profile = await self.get_profile(profile_id, user_id)
         if not profile:
             raise ValueError("Profile not found")
         
-        new_activation_code = self._generate_activation_code()
-        new_qr_code = self._generate_qr_code(new_activation_code)
+        new_activation_code = generate_activation_code()
+        new_qr_code = qr_url(profile_id)
+        new_qr_code_key = await self.qr_store.store(new_activation_code)
         
         await self.profiles.update_one(
             {"profile_id": profile_id},
             {
                 "$set": {
                     "qr_code": new_qr_code,
+                    "qr_code_key": new_qr_code_key,
                     "activation_code": new_activation_code,
                     "updated_at": datetime.utcnow()
                 }
             }
         )
+        await self.qr_store.delete(profile.get("qr_code_key"))
         
         return {
             "profile_id": profile_id,
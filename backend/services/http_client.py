@@ -0,0 +1,178 @@
+"""
+Outbound HTTP Client for eSIM Myanmar Platform
+One pooled httpx.AsyncClient per upstream origin, shared by all integrations,
+with retries for idempotent calls and per-upstream latency/error metrics
+"""
+
+from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+from services.metrics import OUTBOUND_REQUEST_DURATION, OUTBOUND_RETRIES
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class OutboundHTTP:
+    """App-scoped outbound HTTP layer"""
+
+    def __init__(
+        self,
+        timeout_seconds: float = 10.0,
+        connect_timeout_seconds: float = 5.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry_seconds: float = 30.0,
+        retries: int = 2,
+        backoff_base_seconds: float = 0.2,
+        backoff_max_seconds: float = 2.0,
+        http2: Optional[bool] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.timeout = httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry_seconds
+        )
+        self.retries = retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        # HTTP/2 needs the optional h2 package; negotiated per origin via ALPN
+        self.http2 = _http2_available() if http2 is None else http2
+        self.transport = transport  # For tests (e.g. httpx.MockTransport)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        """Pooled client for the origin of url"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(origin)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self.transport
+            )
+            self._clients[origin] = client
+        return client
+
+    def _record(self, upstream: str, elapsed_ms: float, error: bool, retried: bool) -> None:
+        stats = self._stats.get(upstream)
+        if stats is None:
+            stats = self._stats[upstream] = {
+                "requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0
+            }
+        stats["requests"] += 1
+        stats["errors"] += error
+        stats["retries"] += retried
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        OUTBOUND_REQUEST_DURATION.labels(upstream, "error" if error else "ok").observe(elapsed_ms / 1000)
+        if retried:
+            OUTBOUND_RETRIES.labels(upstream).inc()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many workers hitting the same outage
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt)))
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        upstream: Optional[str] = None,
+        retry: Optional[bool] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request through the pooled client for url's origin
+        Idempotent methods are retried on transport errors and 429/502/503/504;
+        pass retry=True for calls made idempotent by other means (e.g. an idempotency key)
+        """
+        method = method.upper()
+        upstream = upstream or urlsplit(url).netloc
+        retries = self.retries if (method in IDEMPOTENT_METHODS if retry is None else retry) else 0
+        client = self.client(url)
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if attempt < retries:
+                    self._record(upstream, elapsed_ms, error=True, retried=True)
+                    logger.warning(f"{upstream} {method} failed ({e!r}), retrying")
+                    await asyncio.sleep(self._backoff(attempt))
+                    attempt += 1
+                    continue
+                self._record(upstream, elapsed_ms, error=True, retried=False)
+                raise
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            failed = response.status_code >= 500
+            if response.status_code in RETRY_STATUS_CODES and attempt < retries:
+                self._record(upstream, elapsed_ms, error=failed, retried=True)
+                await response.aclose()
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            self._record(upstream, elapsed_ms, error=failed, retried=False)
+            return response
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-upstream request, error, retry and latency metrics"""
+        return {
+            upstream: {
+                "requests": s["requests"],
+                "errors": s["errors"],
+                "retries": s["retries"],
+                "avg_ms": round(s["total_ms"] / s["requests"], 2) if s["requests"] else 0.0,
+                "max_ms": round(s["max_ms"], 2),
+            }
+            for upstream, s in self._stats.items()
+        }
+
+    async def aclose(self) -> None:
+        """Close all pooled connections"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+# Process-wide instance; the application lifespan installs its configured one
+_http_client: Optional[OutboundHTTP] = None
+
+
+def get_http_client() -> OutboundHTTP:
+    """Get the shared outbound HTTP client (created with defaults if none was installed)"""
+    global _http_client
+    if _http_client is None:
+        _http_client = OutboundHTTP()
+    return _http_client
+
+
+def set_http_client(client: Optional[OutboundHTTP]) -> None:
+    """Install the shared outbound HTTP client"""
+    global _http_client
+    _http_client = client
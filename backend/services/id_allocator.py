@@ -0,0 +1,131 @@
+"""
+ID Allocator for eSIM Myanmar Platform
+Numeric ICCIDs with Luhn check digits, handed out from memory out of blocks
+reserved per worker from a MongoDB counter (hi/lo allocation), plus random
+activation codes
+"""
+
+from typing import List, Optional
+import asyncio
+import logging
+import secrets
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# 89 (telecom) + 95 (Myanmar) + 9 (mobile)
+DEFAULT_ICCID_PREFIX = "89959"
+ICCID_LENGTH = 20  # Including the check digit
+
+
+def luhn_check_digit(digits: str) -> str:
+    """Luhn (mod 10) check digit for a string of digits"""
+    total = 0
+    # Double every second digit from the right, starting with the rightmost
+    for position, char in enumerate(reversed(digits)):
+        value = int(char)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def luhn_valid(number: str) -> bool:
+    """Check a number whose last digit is its Luhn check digit"""
+    return number.isdigit() and len(number) > 1 and luhn_check_digit(number[:-1]) == number[-1]
+
+
+def generate_activation_code() -> str:
+    """LPA activation code with an unguessable 80-bit matching ID (no database access)"""
+    return f"LPA:1$esim.com.mm${secrets.token_hex(10).upper()}$"
+
+
+class ICCIDAllocator:
+    """
+    Hi/lo ICCID allocator
+    Each worker reserves block_size serials with one atomic $inc and then
+    allocates from memory; the next block is fetched in the background once
+    the current one runs low. Serials skipped by a crashed worker are never reused.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        prefix: str = DEFAULT_ICCID_PREFIX,
+        block_size: int = 1000,
+        counter_id: str = "iccid"
+    ):
+        if not prefix.isdigit() or len(prefix) >= ICCID_LENGTH - 1:
+            raise ValueError("ICCID prefix must be numeric and shorter than the ICCID")
+        self.counters = db.id_counters
+        self.prefix = prefix
+        self.block_size = block_size
+        self.counter_id = f"{counter_id}:{prefix}"
+        self.serial_width = ICCID_LENGTH - 1 - len(prefix)
+        self._next = 0
+        self._end = 0
+        self._prefetch: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        # Metrics
+        self.allocated = 0
+        self.blocks = 0
+
+    async def _reserve_block(self) -> range:
+        counter = await self.counters.find_one_and_update(
+            {"_id": self.counter_id},
+            {"$inc": {"next": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        end = counter["next"]
+        if end > 10 ** self.serial_width:
+            raise RuntimeError(f"ICCID serial space exhausted for prefix {self.prefix}")
+        self.blocks += 1
+        return range(end - self.block_size, end)
+
+    async def _take_block(self) -> None:
+        if self._prefetch is not None:
+            try:
+                block = await self._prefetch
+            except Exception as e:
+                logger.warning(f"ICCID block prefetch failed: {e}")
+                block = await self._reserve_block()
+            self._prefetch = None
+        else:
+            block = await self._reserve_block()
+        self._next, self._end = block.start, block.stop
+
+    def _format(self, serial: int) -> str:
+        body = f"{self.prefix}{serial:0{self.serial_width}d}"
+        return body + luhn_check_digit(body)
+
+    async def allocate_many(self, count: int) -> List[str]:
+        """Allocate count ICCIDs (database access only when a block is used up)"""
+        iccids = []
+        async with self._lock:
+            while len(iccids) < count:
+                if self._next >= self._end:
+                    await self._take_block()
+                take = min(count - len(iccids), self._end - self._next)
+                iccids.extend(self._format(serial) for serial in range(self._next, self._next + take))
+                self._next += take
+
+            # Reserve the next block ahead of time once 10% or less of this one remains
+            if self._prefetch is None and self._end - self._next <= self.block_size // 10:
+                self._prefetch = asyncio.create_task(self._reserve_block())
+
+        self.allocated += count
+        return iccids
+
+    async def allocate(self) -> str:
+        """Allocate one ICCID"""
+        return (await self.allocate_many(1))[0]
+
+    def stats(self) -> dict:
+        """Snapshot of allocator metrics"""
+        return {"allocated": self.allocated, "blocks": self.blocks, "remaining": self._end - self._next}
@@ -0,0 +1,71 @@
+"""
+Lease for eSIM Myanmar Platform
+Leader election through a single MongoDB document: the holder renews it
+periodically and any worker may take it over once it lapses.
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable
+import logging
+import os
+import socket
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class MongoLease:
+    """A named, expiring lease held by at most one worker"""
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        lease_id: str,
+        lease_seconds: float,
+        worker_id: str = None,
+        clock: Callable[[], datetime] = datetime.utcnow
+    ):
+        self.collection = collection
+        self.lease_id = lease_id
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or default_worker_id()
+        self._clock = clock
+        self.held = False
+
+    async def acquire(self) -> bool:
+        """Take or renew the lease; False while another worker holds it"""
+        now = self._clock()
+        try:
+            lease = await self.collection.find_one_and_update(
+                {
+                    "_id": self.lease_id,
+                    "$or": [{"owner": self.worker_id}, {"lease_until": {"$lte": now}}],
+                },
+                {"$set": {"owner": self.worker_id, "lease_until": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The lease document exists and is held by someone else, so the upsert collided
+            lease = None
+
+        held = lease is not None
+        if held != self.held:
+            logger.info(f"{'Acquired' if held else 'Lost'} lease {self.lease_id} ({self.worker_id})")
+        self.held = held
+        return held
+
+    async def release(self) -> None:
+        """Let another worker take over immediately"""
+        await self.collection.update_one(
+            {"_id": self.lease_id, "owner": self.worker_id},
+            {"$set": {"lease_until": self._clock()}}
+        )
+        self.held = False
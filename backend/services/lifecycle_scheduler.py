@@ -0,0 +1,244 @@
+"""
+Lifecycle Scheduler for eSIM Myanmar Platform
+Periodically expires profiles past their expiry_date and emits expiring-soon
+and low-balance events. Only the worker holding the MongoDB lease sweeps;
+the others stand by and take over when the lease lapses.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Callable
+import asyncio
+import logging
+import time
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+
+from services.lease import MongoLease
+from services.metrics import LIFECYCLE_BATCH_SIZE, LIFECYCLE_EVENTS, LIFECYCLE_SWEEP_DURATION
+
+logger = logging.getLogger(__name__)
+
+LIFECYCLE_LEASE_ID = "lease:lifecycle"
+
+# Statuses that run out when expiry_date passes
+EXPIRABLE_STATUSES = ["active", "suspended"]
+
+PROFILE_FIELDS = {
+    "_id": 0,
+    "profile_id": 1,
+    "user_id": 1,
+    "iccid": 1,
+    "expiry_date": 1,
+    "data_limit_gb": 1,
+    "data_used_gb": 1,
+}
+
+
+def event_id(event_type: str, profile: dict) -> str:
+    """Deterministic event key, so a re-run sweep cannot emit the same event twice"""
+    if event_type == "low_balance":
+        marker = profile.get("data_limit_gb")
+    else:
+        marker = profile["expiry_date"].strftime("%Y%m%d%H%M%S")
+    return f"{profile['profile_id']}:{event_type}:{marker}"
+
+
+class LifecycleScheduler:
+    """Leader-elected sweeper for profile expiry and balance notices"""
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        interval_seconds: float = 60.0,
+        batch_size: int = 500,
+        expiring_soon_days: int = 3,
+        low_balance_percent: float = 10.0,
+        lease_seconds: Optional[float] = None,
+        clock: Callable[[], datetime] = datetime.utcnow
+    ):
+        self.profiles = db.esim_profiles
+        self.events = db.profile_events
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.expiring_soon = timedelta(days=expiring_soon_days)
+        # Notify once data_used_gb reaches this fraction of data_limit_gb
+        self.low_balance_ratio = 1 - low_balance_percent / 100
+        self.lease = MongoLease(db.app_meta, LIFECYCLE_LEASE_ID, lease_seconds or interval_seconds * 3, clock=clock)
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.sweeps = 0
+        self.expired = 0
+        self.events_emitted = 0
+        self.last_sweep_seconds: Optional[float] = None
+
+    # ------------------ Leader election ------------------
+    @property
+    def is_leader(self) -> bool:
+        return self.lease.held
+
+    async def acquire_lease(self) -> bool:
+        """Take or renew the lifecycle lease; False while another worker holds it"""
+        return await self.lease.acquire()
+
+    async def release_lease(self) -> None:
+        """Let another worker take over immediately"""
+        await self.lease.release()
+
+    # ------------------ Sweep ------------------
+    async def sweep(self) -> Dict[str, int]:
+        """Run one pass: expire, then emit expiring-soon and low-balance events"""
+        started = time.perf_counter()
+        outcome = "error"
+        now = self._clock()
+        try:
+            result = {
+                "expired": await self._expire(now),
+                "expiring_soon": await self._notify_expiring_soon(now),
+                "low_balance": await self._notify_low_balance(),
+            }
+            outcome = "ok"
+        finally:
+            self.last_sweep_seconds = time.perf_counter() - started
+            LIFECYCLE_SWEEP_DURATION.labels(outcome).observe(self.last_sweep_seconds)
+
+        self.sweeps += 1
+        self.expired += result["expired"]
+        if any(result.values()):
+            logger.info(f"Lifecycle sweep: {result} in {self.last_sweep_seconds:.3f}s")
+        return result
+
+    async def _batches(self, query: dict):
+        """Yield batches of matching profiles; each batch must stop matching once handled"""
+        while True:
+            batch = await self.profiles.find(query, PROFILE_FIELDS).limit(self.batch_size).to_list(length=None)
+            if not batch:
+                return
+            yield batch
+            if len(batch) < self.batch_size:
+                return
+
+    async def _expire(self, now: datetime) -> int:
+        query = {"status": {"$in": EXPIRABLE_STATUSES}, "expiry_date": {"$lte": now}}
+        expired = 0
+        async for batch in self._batches(query):
+            # Events first: a crash in between re-emits (deduplicated) rather than losing them
+            await self._emit("expired", batch, now)
+            result = await self.profiles.update_many(
+                {**query, "profile_id": {"$in": [p["profile_id"] for p in batch]}},
+                {"$set": {"status": "expired", "expired_at": now}}
+            )
+            LIFECYCLE_BATCH_SIZE.labels("expired").observe(len(batch))
+            expired += result.modified_count
+        return expired
+
+    async def _notify_expiring_soon(self, now: datetime) -> int:
+        # lifecycle_notices.expiring_soon holds the expiry_date we last warned about,
+        # so a renewal (new expiry_date) is warned about again
+        query = {
+            "status": "active",
+            "expiry_date": {"$gt": now, "$lte": now + self.expiring_soon},
+            "$expr": {"$ne": ["$lifecycle_notices.expiring_soon", "$expiry_date"]},
+        }
+        return await self._notify("expiring_soon", query, "$expiry_date", now)
+
+    async def _notify_low_balance(self) -> int:
+        # lifecycle_notices.low_balance holds the data_limit_gb we last warned about,
+        # so a top-up (new data_limit_gb) is warned about again
+        query = {
+            "status": "active",
+            "data_limit_gb": {"$gt": 0},
+            "$expr": {
+                "$and": [
+                    {"$gte": ["$data_used_gb", {"$multiply": ["$data_limit_gb", self.low_balance_ratio]}]},
+                    {"$ne": ["$lifecycle_notices.low_balance", "$data_limit_gb"]},
+                ]
+            },
+        }
+        return await self._notify("low_balance", query, "$data_limit_gb", self._clock())
+
+    async def _notify(self, event_type: str, query: dict, marker: str, now: datetime) -> int:
+        notified = 0
+        async for batch in self._batches(query):
+            await self._emit(event_type, batch, now)
+            await self.profiles.update_many(
+                {"profile_id": {"$in": [p["profile_id"] for p in batch]}},
+                [{"$set": {f"lifecycle_notices.{event_type}": marker}}]
+            )
+            LIFECYCLE_BATCH_SIZE.labels(event_type).observe(len(batch))
+            notified += len(batch)
+        return notified
+
+    async def _emit(self, event_type: str, profiles: List[dict], now: datetime) -> None:
+        """Append events to profile_events for notification consumers"""
+        events = []
+        for profile in profiles:
+            limit = profile.get("data_limit_gb") or 0
+            used = profile.get("data_used_gb") or 0
+            events.append({
+                "_id": event_id(event_type, profile),
+                "type": event_type,
+                "profile_id": profile["profile_id"],
+                "user_id": profile.get("user_id"),
+                "iccid": profile.get("iccid"),
+                "expiry_date": profile.get("expiry_date"),
+                "data_remaining_gb": round(max(0, limit - used), 3),
+                "created_at": now,
+                "delivered_at": None,
+            })
+
+        inserted = len(events)
+        try:
+            await self.events.insert_many(events, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+            inserted -= len(errors)  # Already emitted by an earlier sweep
+
+        self.events_emitted += inserted
+        LIFECYCLE_EVENTS.labels(event_type).inc(inserted)
+
+    def stats(self) -> Dict[str, object]:
+        """Snapshot of scheduler metrics"""
+        return {
+            "is_leader": self.is_leader,
+            "sweeps": self.sweeps,
+            "expired": self.expired,
+            "events_emitted": self.events_emitted,
+            "last_sweep_seconds": self.last_sweep_seconds,
+        }
+
+    # ------------------ Background loop ------------------
+    async def start(self) -> None:
+        """Start competing for the lease and sweeping while holding it"""
+        if self._task is None and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sweeping and hand the lease over"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            if self.is_leader:
+                try:
+                    await self.release_lease()
+                except Exception as e:
+                    logger.warning(f"Failed to release lifecycle lease: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.acquire_lease():
+                    await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Lifecycle sweep failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
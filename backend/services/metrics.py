@@ -0,0 +1,187 @@
+"""
+Metrics for eSIM Myanmar Platform
+Prometheus instruments for request latency, in-flight requests, MongoDB
+commands, outbound HTTP calls, password hashing and profile lifecycle sweeps, plus the stats()
+counters of the in-process services (caches, queues, background workers).
+
+Multiprocess: when uvicorn runs several workers, start it with
+PROMETHEUS_MULTIPROC_DIR pointing at an empty, writable directory; every
+worker then writes to shared files and /api/metrics aggregates all of them.
+"""
+
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from pymongo import monitoring
+
+# Fixed buckets (seconds) shared by all latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label for requests that matched no route, so probes cannot blow up cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "esim_http_request_duration_seconds",
+    "HTTP request latency by route template and status class",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "esim_http_requests_in_flight",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "esim_mongo_command_duration_seconds",
+    "MongoDB command latency by command name and outcome",
+    ["command", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_REQUEST_DURATION = Histogram(
+    "esim_outbound_request_duration_seconds",
+    "Outbound HTTP latency by upstream and outcome",
+    ["upstream", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_RETRIES = Counter(
+    "esim_outbound_retries_total",
+    "Outbound HTTP attempts that were retried",
+    ["upstream"],
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "esim_password_hash_pending",
+    "bcrypt operations queued or running on the password hashing pool",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "esim_password_hash_rejected_total",
+    "bcrypt operations rejected because the password hashing queue was full",
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "esim_password_hash_duration_seconds",
+    "Password hashing time by operation (hash/verify) and phase (wait in queue/run)",
+    ["operation", "phase"],
+    buckets=LATENCY_BUCKETS,
+)
+LIFECYCLE_SWEEP_DURATION = Histogram(
+    "esim_lifecycle_sweep_duration_seconds",
+    "Duration of profile lifecycle sweeps by outcome",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS + (30.0, 60.0),
+)
+LIFECYCLE_BATCH_SIZE = Histogram(
+    "esim_lifecycle_batch_size",
+    "Profiles handled per lifecycle batch by action",
+    ["action"],
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+LIFECYCLE_EVENTS = Counter(
+    "esim_lifecycle_events_total",
+    "Profile lifecycle events emitted by type",
+    ["type"],
+)
+
+
+def status_class(status_code: int) -> str:
+    """Collapse a status code into 2xx/3xx/4xx/5xx"""
+    return f"{status_code // 100}xx"
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every MongoDB command (pass via AsyncIOMotorClient(event_listeners=[...]))"""
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        MONGO_COMMAND_DURATION.labels(event.command_name, "ok").observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        MONGO_COMMAND_DURATION.labels(event.command_name, "error").observe(event.duration_micros / 1_000_000)
+
+
+# stats() fields that only ever grow; every other numeric field is exported as a gauge
+STATS_COUNTERS = frozenset({
+    "accepted", "adopted", "allocated", "batches", "blocks", "computed", "conflicts",
+    "dropped", "duplicate_batches", "errors", "events_emitted", "evictions", "exhausted",
+    "expired", "failed", "failed_batches", "flushed", "flushes", "fulfilled",
+    "fulfillment_failures", "hits", "invalidations", "items_failed", "jobs_completed",
+    "loads", "misses", "profiles_created", "reclaimed", "redeemed", "rejected", "released",
+    "replayed", "requests", "resolved", "retries", "runs", "spilled", "submitted",
+    "sweeps", "unmatched", "written",
+})
+
+
+class ServiceStatsCollector:
+    """
+    Exports the stats() snapshots of registered services as esim_<service>_<field>
+    gauges and counters, read at scrape time. These live in process memory, so in
+    multiprocess mode they describe the worker answering the scrape and carry its pid.
+    """
+
+    def __init__(self):
+        # name -> (stats callable, label for nested per-key stats such as per-upstream)
+        self._sources: Dict[str, Tuple[Callable[[], Dict[str, Any]], Optional[str]]] = {}
+
+    def register(self, name: str, stats: Callable[[], Dict[str, Any]], label: Optional[str] = None) -> None:
+        self._sources[name] = (stats, label)
+
+    def clear(self) -> None:
+        self._sources.clear()
+
+    def describe(self) -> list:
+        # Metric names depend on what is registered at scrape time
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        base_labels = {"pid": str(os.getpid())} if multiprocess_enabled() else {}
+        for name, (stats, label) in list(self._sources.items()):
+            snapshot = stats()
+            if label is None:
+                rows = [(base_labels, snapshot)]
+            else:
+                rows = [({**base_labels, label: key}, values) for key, values in snapshot.items()]
+
+            families: Dict[str, Metric] = {}
+            for labels, values in rows:
+                for field, value in values.items():
+                    if isinstance(value, bool):
+                        value = int(value)
+                    elif not isinstance(value, (int, float)):
+                        continue  # None (nothing measured yet) and non-numeric details
+                    family = families.get(field)
+                    if family is None:
+                        kind = CounterMetricFamily if field in STATS_COUNTERS else GaugeMetricFamily
+                        family = families[field] = kind(
+                            f"esim_{name}_{field}", f"{name} stats(): {field}", labels=list(labels)
+                        )
+                    family.add_metric(list(labels.values()), value)
+            yield from families.values()
+
+
+SERVICE_STATS = ServiceStatsCollector()
+REGISTRY.register(SERVICE_STATS)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus text exposition (aggregated across workers in multiprocess mode)"""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(SERVICE_STATS)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live gauges from the shared files on shutdown"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
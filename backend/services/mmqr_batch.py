@@ -0,0 +1,238 @@
+"""
+MMQR Batch Verification for eSIM Myanmar Platform
+Validates thousands of MMQR payment strings for back-office reconciliation:
+identical payloads are validated once, large batches are fanned out across a
+process pool, and results stream back in input order followed by a summary.
+
+CLI, run from backend/:
+    python -m services.mmqr_batch payments.ndjson [--expected-amount 120000] [--workers 4] > results.ndjson
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+import argparse
+import asyncio
+import sys
+
+import orjson
+
+from services.mmqr_service import MMQRService
+
+MAX_BATCH_SIZE = 50_000
+
+
+def validate_chunk(qr_strings: List[str], expected_amount: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Validate a chunk of MMQR strings (module level so process pools can pickle it)"""
+    return MMQRService().validate_payments(qr_strings, expected_amount)
+
+
+def parse_ndjson_line(line: str) -> Optional[str]:
+    """One QR string per line: a JSON string, a {"qr": ...} object or the bare string"""
+    line = line.strip()
+    if not line:
+        return None
+    if line[0] in "\"{":
+        value = orjson.loads(line)
+        if isinstance(value, dict):
+            value = value.get("qr") or value.get("qr_string")
+        if not isinstance(value, str):
+            raise ValueError("Each NDJSON line must be a QR string or an object with a 'qr' field")
+        return value
+    return line
+
+
+def parse_ndjson(body: bytes) -> List[str]:
+    """QR strings from an NDJSON upload"""
+    qr_strings = []
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise ValueError("Input must be UTF-8")
+    for number, line in enumerate(text.splitlines(), start=1):
+        try:
+            qr = parse_ndjson_line(line)
+        except (orjson.JSONDecodeError, ValueError) as e:
+            raise ValueError(f"Line {number}: {e}")
+        if qr is not None:
+            qr_strings.append(qr)
+    return qr_strings
+
+
+def parse_batch(body: bytes) -> List[str]:
+    """QR strings from a JSON array or an NDJSON document"""
+    if body.lstrip()[:1] == b"[":
+        qr_strings = orjson.loads(body)
+        if not all(isinstance(qr, str) for qr in qr_strings):
+            raise ValueError("JSON input must be an array of QR strings")
+        return qr_strings
+    return parse_ndjson(body)
+
+
+def format_amount(amount: float) -> str:
+    """Fixed-point amount without trailing zeros: 1200000.0 -> '1200000', 1500.5 -> '1500.5'"""
+    return f"{amount:.2f}".rstrip("0").rstrip(".")
+
+
+class BatchSummary:
+    """Totals per merchant and per amount, counted once per distinct payload"""
+
+    def __init__(self):
+        self.total = 0
+        self.unique = 0
+        self.valid = 0
+        self.invalid = 0
+        self.by_merchant: Dict[str, Dict[str, Any]] = {}
+        self.by_amount: Dict[str, int] = {}
+
+    def add(self, result: Dict[str, Any]) -> None:
+        self.unique += 1
+        if result["valid"]:
+            self.valid += 1
+        else:
+            self.invalid += 1
+
+        data = result.get("data") or {}
+        merchant_key = data.get("merchant_id") or "unknown"
+        merchant = self.by_merchant.get(merchant_key)
+        if merchant is None:
+            merchant = self.by_merchant[merchant_key] = {
+                "merchant_name": data.get("merchant_name"),
+                "count": 0,
+                "valid": 0,
+                "valid_amount": 0.0,
+            }
+        merchant["count"] += 1
+        if result["valid"]:
+            merchant["valid"] += 1
+            merchant["valid_amount"] += data.get("amount") or 0.0
+
+        amount = data.get("amount")
+        amount_key = "none" if amount is None else format_amount(amount)
+        self.by_amount[amount_key] = self.by_amount.get(amount_key, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "unique": self.unique,
+            "duplicates": self.total - self.unique,
+            "valid": self.valid,
+            "invalid": self.invalid,
+            "by_merchant": self.by_merchant,
+            "by_amount": self.by_amount,
+        }
+
+
+class MMQRBatchVerifier:
+    """Deduplicating, optionally multi-process MMQR batch validation"""
+
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        chunk_size: int = 500,
+        parallel_threshold: int = 2000
+    ):
+        self.executor = executor  # e.g. a ProcessPoolExecutor; batches run inline without one
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
+
+    async def _validate_unique(self, unique: List[str], expected_amount: Optional[float]) -> AsyncIterator[List[dict]]:
+        chunks = [unique[i:i + self.chunk_size] for i in range(0, len(unique), self.chunk_size)]
+        if self.executor is not None and len(unique) >= self.parallel_threshold:
+            loop = asyncio.get_running_loop()
+            futures = [loop.run_in_executor(self.executor, validate_chunk, chunk, expected_amount) for chunk in chunks]
+            for future in futures:
+                yield await future
+        else:
+            for chunk in chunks:
+                yield validate_chunk(chunk, expected_amount)
+                await asyncio.sleep(0)  # Let other requests run between chunks
+
+    async def verify(
+        self,
+        qr_strings: Iterable[str],
+        expected_amount: Optional[float] = None,
+        summary: Optional[BatchSummary] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield one result per input, in input order. Repeated payloads carry
+        duplicate_of, the index of their first occurrence.
+        """
+        qr_strings = list(qr_strings)
+        if len(qr_strings) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} QR strings per batch")
+
+        summary = summary if summary is not None else BatchSummary()
+        summary.total = len(qr_strings)
+
+        first_index: Dict[str, int] = {}
+        for index, qr in enumerate(qr_strings):
+            first_index.setdefault(qr, index)
+        unique = list(first_index)
+
+        results: Dict[str, dict] = {}
+        emitted = 0
+        position = 0
+        async for chunk_results in self._validate_unique(unique, expected_amount):
+            for result in chunk_results:
+                results[unique[position]] = result
+                summary.add(result)
+                position += 1
+
+            # Emit every input whose payload has been validated, keeping input order
+            while emitted < len(qr_strings) and qr_strings[emitted] in results:
+                qr = qr_strings[emitted]
+                line = {"index": emitted, **results[qr]}
+                if first_index[qr] != emitted:
+                    line["duplicate_of"] = first_index[qr]
+                yield line
+                emitted += 1
+
+    async def verify_ndjson(
+        self,
+        qr_strings: Iterable[str],
+        expected_amount: Optional[float] = None
+    ) -> AsyncIterator[bytes]:
+        """NDJSON lines: one result per input, then {"summary": ...}"""
+        summary = BatchSummary()
+        async for line in self.verify(qr_strings, expected_amount, summary):
+            yield orjson.dumps(line) + b"\n"
+        yield orjson.dumps({"summary": summary.as_dict()}) + b"\n"
+
+
+def read_input(path: str) -> List[str]:
+    """QR strings from a JSON array file or NDJSON file ('-' for stdin)"""
+    if path == "-":
+        return parse_batch(sys.stdin.buffer.read())
+    with open(path, "rb") as f:
+        return parse_batch(f.read())
+
+
+async def _run_cli(args: argparse.Namespace) -> None:
+    qr_strings = read_input(args.input)
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        verifier = MMQRBatchVerifier(executor=executor, parallel_threshold=args.parallel_threshold)
+        out = sys.stdout.buffer
+        async for line in verifier.verify_ndjson(qr_strings, args.expected_amount):
+            out.write(line)
+        out.flush()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSON array or NDJSON file of MMQR strings ('-' for stdin)")
+    parser.add_argument("--expected-amount", type=float, default=None, help="defaults to the eSIM price")
+    parser.add_argument("--workers", type=int, default=1, help="validation processes")
+    parser.add_argument("--parallel-threshold", type=int, default=2000, help="distinct payloads before using workers")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run_cli(args))
+    except (OSError, ValueError, orjson.JSONDecodeError) as e:
+        parser.exit(1, f"error: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
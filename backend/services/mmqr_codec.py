@@ -0,0 +1,134 @@
+"""
+MMQR Codec for eSIM Myanmar Platform
+Table-driven CRC-16/CCITT-FALSE and an offset-based TLV parser for EMVCo
+style MMQR strings. Values are located by offset and only sliced out when
+read; nested templates (26, 62) are parsed the first time they are read.
+"""
+
+from typing import Dict, Mapping, Optional, Tuple
+
+
+class MMQRParseError(Exception):
+    """Custom exception for MMQR parsing errors"""
+    pass
+
+
+CRC_TAG = "63"
+CRC_POLYNOMIAL = 0x1021
+
+
+def _build_crc_table() -> Tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ CRC_POLYNOMIAL) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+
+CRC16_TABLE = _build_crc_table()
+
+
+def crc16_ccitt(data: bytes, crc: int = 0xFFFF) -> int:
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), one table lookup per byte"""
+    table = CRC16_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+
+def crc16_hex(text: str) -> str:
+    """CRC of an MMQR string (UTF-8 bytes) as the 4 uppercase hex digits of tag 63"""
+    return f"{crc16_ccitt(text.encode('utf-8')):04X}"
+
+
+# Two-digit length field -> int; anything else is malformed
+_LENGTHS = {f"{n:02d}": n for n in range(100)}
+
+
+def index_tlv(data: str, start: int = 0, end: Optional[int] = None) -> Dict[str, Tuple[int, int]]:
+    """
+    Map each tag in data[start:end] to its value offsets without copying values
+    (the last occurrence of a tag wins). Raises MMQRParseError on a malformed
+    length or a value running past the end.
+    """
+    end = len(data) if end is None else end
+    lengths = _LENGTHS
+    offsets = {}
+    index = start
+    while index < end:
+        if index + 4 > end:
+            raise MMQRParseError(f"Truncated TLV entry at offset {index}")
+        length = lengths.get(data[index + 2:index + 4])
+        if length is None:
+            raise MMQRParseError(f"Invalid TLV length at offset {index + 2}")
+        value_end = index + 4 + length
+        if value_end > end:
+            raise MMQRParseError(f"TLV value for tag {data[index:index + 2]} overruns the data")
+        offsets[data[index:index + 2]] = (index + 4, value_end)
+        index = value_end
+    return offsets
+
+
+def parse_tlv(data: str) -> Dict[str, str]:
+    """Tag -> value for every entry in data"""
+    return {tag: data[value_start:value_end] for tag, (value_start, value_end) in index_tlv(data).items()}
+
+
+class TLVTemplate(Mapping):
+    """Read-only tag -> value view over a span of an MMQR string"""
+
+    __slots__ = ("_data", "_start", "_end", "_offsets")
+
+    def __init__(self, data: str, start: int = 0, end: Optional[int] = None):
+        self._data = data
+        self._start = start
+        self._end = len(data) if end is None else end
+        self._offsets: Optional[Dict[str, Tuple[int, int]]] = None
+
+    @property
+    def offsets(self) -> Dict[str, Tuple[int, int]]:
+        """Tag offsets, parsed (and validated) on first use"""
+        if self._offsets is None:
+            self._offsets = index_tlv(self._data, self._start, self._end)
+        return self._offsets
+
+    def __getitem__(self, tag: str) -> str:
+        value_start, value_end = self.offsets[tag]
+        return self._data[value_start:value_end]
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def template(self, tag: str) -> "TLVTemplate":
+        """Nested template stored under tag (empty if the tag is absent)"""
+        if tag not in self.offsets:
+            return TLVTemplate("", 0, 0)
+        value_start, value_end = self.offsets[tag]
+        return TLVTemplate(self._data, value_start, value_end)
+
+    def __repr__(self) -> str:
+        return f"TLVTemplate({dict(self)!r})"
+
+
+class MMQRPayload(TLVTemplate):
+    """Top-level MMQR payload with CRC verification"""
+
+    __slots__ = ()
+
+    def __init__(self, data: str):
+        super().__init__(data)
+        self.offsets  # The top level is always validated
+
+    def crc_valid(self) -> Optional[bool]:
+        """Whether tag 63 matches the CRC of everything before its value (None without tag 63)"""
+        if CRC_TAG not in self.offsets:
+            return None
+        value_start, value_end = self.offsets[CRC_TAG]
+        if value_end != len(self._data) or value_end - value_start != 4:
+            return False
+        return crc16_hex(self._data[:value_start]) == self._data[value_start:value_end].upper()
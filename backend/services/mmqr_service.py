@@ -2,18 +2,16 @@
 MMQR Payment Service
 Parses and validates MMQR QR code strings for Myanmar mobile payments
 Supports MPT, ATOM U9, MYTEL payment verification
+(TLV and CRC primitives live in services.mmqr_codec)
 """
 
 import re
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List, Mapping
 from dataclasses import dataclass
 from enum import Enum
 
-
-class MMQRParseError(Exception):
-    """Custom exception for MMQR parsing errors"""
-    pass
+from services.mmqr_codec import MMQRParseError, MMQRPayload, crc16_hex, parse_tlv
 
 
 class PaymentStatus(str, Enum):
@@ -36,9 +34,10 @@ class MMQRData:
     currency: str
     amount: Optional[float]
     country_code: str
-    additional_data: Dict[str, str]
+    additional_data: Mapping[str, str]  # Template 62, parsed on first access
     crc: str
     raw_data: str
+    crc_valid: Optional[bool] = None  # None when the string carries no CRC
 
 
 class MMQRService:
@@ -79,21 +78,7 @@ class MMQRService:
         """
         Parse TLV (Tag-Length-Value) encoded MMQR string
         """
-        result = {}
-        index = 0
-        
-        while index < len(data):
-            if index + 4 > len(data):
-                break
-                
-            tag = data[index:index + 2]
-            length = int(data[index + 2:index + 4])
-            value = data[index + 4:index + 4 + length]
-            
-            result[tag] = value
-            index += 4 + length
-        
-        return result
+        return parse_tlv(data)
     
     def parse_mmqr(self, qr_string: str) -> MMQRData:
         """
@@ -106,34 +91,27 @@ class MMQRService:
             raise MMQRParseError("Invalid MMQR string: too short")
         
         try:
-            parsed = self.parse_tlv(qr_string)
-            
-            # Extract merchant account info (tag 26)
-            merchant_account_raw = parsed.get("26", "")
-            merchant_account_parsed = self.parse_tlv(merchant_account_raw) if merchant_account_raw else {}
-            
-            # Extract additional data (tag 62)
-            additional_raw = parsed.get("62", "")
-            additional_parsed = self.parse_tlv(additional_raw) if additional_raw else {}
+            payload = MMQRPayload(qr_string)
             
             # Parse amount if present
-            amount_str = parsed.get("54", "")
+            amount_str = payload.get("54", "")
             amount = float(amount_str) if amount_str else None
             
             self.parsed_data = MMQRData(
-                payload_format=parsed.get("00", ""),
-                point_of_initiation=parsed.get("01", ""),
-                merchant_account=merchant_account_raw,
-                merchant_id=merchant_account_parsed.get("01", ""),
-                merchant_name=parsed.get("59", ""),
-                merchant_city=parsed.get("60", ""),
-                postal_code=parsed.get("61", ""),
-                currency=parsed.get("53", ""),
+                payload_format=payload.get("00", ""),
+                point_of_initiation=payload.get("01", ""),
+                merchant_account=payload.get("26", ""),
+                merchant_id=payload.template("26").get("01", ""),
+                merchant_name=payload.get("59", ""),
+                merchant_city=payload.get("60", ""),
+                postal_code=payload.get("61", ""),
+                currency=payload.get("53", ""),
                 amount=amount,
-                country_code=parsed.get("58", ""),
-                additional_data=additional_parsed,
-                crc=parsed.get("63", ""),
-                raw_data=qr_string
+                country_code=payload.get("58", ""),
+                additional_data=payload.template("62"),
+                crc=payload.get("63", ""),
+                raw_data=qr_string,
+                crc_valid=payload.crc_valid()
             )
             
             return self.parsed_data
@@ -146,61 +124,87 @@ class MMQRService:
         Validate MMQR payment data
         Returns validation result with status and details
         """
-        if expected_amount is None:
-            expected_amount = self.ESIM_PRICE
-        
-        result = {
+        return self._validate(qr_string, expected_amount, datetime.utcnow().isoformat())
+    
+    def validate_payments(self, qr_strings: Iterable[str], expected_amount: float = None) -> List[Dict[str, Any]]:
+        """
+        Validate many MMQR strings against the same expected amount
+        Returns one validation result per string, in order
+        """
+        timestamp = datetime.utcnow().isoformat()
+        return [self._validate(qr_string, expected_amount, timestamp) for qr_string in qr_strings]
+    
+    def validate_parsed(self, parsed: MMQRData, expected_amount: float = None) -> Dict[str, Any]:
+        """
+        Validate already parsed MMQR data
+        """
+        result = self._new_result(datetime.utcnow().isoformat())
+        self._check(parsed, expected_amount, result)
+        return result
+    
+    def _new_result(self, timestamp: str) -> Dict[str, Any]:
+        return {
             "valid": False,
             "status": PaymentStatus.PENDING,
             "errors": [],
             "warnings": [],
             "data": None,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": timestamp
         }
-        
+    
+    def _validate(self, qr_string: str, expected_amount: Optional[float], timestamp: str) -> Dict[str, Any]:
+        result = self._new_result(timestamp)
         try:
             parsed = self.parse_mmqr(qr_string)
-            result["data"] = {
-                "merchant_name": parsed.merchant_name,
-                "merchant_city": parsed.merchant_city,
-                "amount": parsed.amount,
-                "currency": parsed.currency,
-                "country_code": parsed.country_code,
-                "merchant_id": parsed.merchant_id
-            }
-            
-            # Validate country code
-            if parsed.country_code != "MM":
-                result["errors"].append("Invalid country code: must be MM (Myanmar)")
-            
-            # Validate currency
-            if parsed.currency != self.MMK_CURRENCY:
-                result["errors"].append(f"Invalid currency: expected {self.MMK_CURRENCY} (MMK)")
-            
-            # Validate amount
-            if parsed.amount is not None:
-                if parsed.amount < expected_amount:
-                    result["errors"].append(f"Insufficient amount: {parsed.amount} MMK (required: {expected_amount} MMK)")
-                elif parsed.amount > expected_amount:
-                    result["warnings"].append(f"Overpayment detected: {parsed.amount} MMK (required: {expected_amount} MMK)")
-            
-            # Validate CRC
-            if not parsed.crc:
-                result["warnings"].append("CRC checksum missing")
-            
-            # Set final status
-            if not result["errors"]:
-                result["valid"] = True
-                result["status"] = PaymentStatus.VERIFIED
-            else:
-                result["status"] = PaymentStatus.FAILED
-                
         except MMQRParseError as e:
             result["errors"].append(str(e))
             result["status"] = PaymentStatus.FAILED
+            return result
         
+        self._check(parsed, expected_amount, result)
         return result
     
+    def _check(self, parsed: MMQRData, expected_amount: Optional[float], result: Dict[str, Any]) -> None:
+        if expected_amount is None:
+            expected_amount = self.ESIM_PRICE
+        
+        result["data"] = {
+            "merchant_name": parsed.merchant_name,
+            "merchant_city": parsed.merchant_city,
+            "amount": parsed.amount,
+            "currency": parsed.currency,
+            "country_code": parsed.country_code,
+            "merchant_id": parsed.merchant_id
+        }
+        
+        # Validate country code
+        if parsed.country_code != "MM":
+            result["errors"].append("Invalid country code: must be MM (Myanmar)")
+        
+        # Validate currency
+        if parsed.currency != self.MMK_CURRENCY:
+            result["errors"].append(f"Invalid currency: expected {self.MMK_CURRENCY} (MMK)")
+        
+        # Validate amount
+        if parsed.amount is not None:
+            if parsed.amount < expected_amount:
+                result["errors"].append(f"Insufficient amount: {parsed.amount} MMK (required: {expected_amount} MMK)")
+            elif parsed.amount > expected_amount:
+                result["warnings"].append(f"Overpayment detected: {parsed.amount} MMK (required: {expected_amount} MMK)")
+        
+        # Validate CRC
+        if parsed.crc_valid is None:
+            result["warnings"].append("CRC checksum missing")
+        elif not parsed.crc_valid:
+            result["errors"].append("CRC checksum mismatch")
+        
+        # Set final status
+        if not result["errors"]:
+            result["valid"] = True
+            result["status"] = PaymentStatus.VERIFIED
+        else:
+            result["status"] = PaymentStatus.FAILED
+    
     def generate_payment_qr(self, amount: float = None, order_id: str = None) -> str:
         """
         Generate MMQR string for eSIM payment
@@ -241,19 +245,7 @@ class MMQRService:
     
     def _calculate_crc(self, data: str) -> str:
         """Calculate CRC-16 CCITT checksum"""
-        crc = 0xFFFF
-        polynomial = 0x1021
-        
-        for char in data:
-            crc ^= ord(char) << 8
-            for _ in range(8):
-                if crc & 0x8000:
-                    crc = (crc << 1) ^ polynomial
-                else:
-                    crc <<= 1
-                crc &= 0xFFFF
-        
-        return f"{crc:04X}"
+        return crc16_hex(data)
 
 
 class PhoneNumberValidator:
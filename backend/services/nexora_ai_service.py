@@ -6,11 +6,13 @@ AI-powered validation for eSIM registration, payment, and screenshot verificatio
 import re
 import hashlib
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
 from dataclasses import dataclass, field
 from enum import Enum
 import base64
 
+from services.device_catalog import DeviceCatalog
+
 
 class VerificationStatus(str, Enum):
     PENDING = "pending"
@@ -29,7 +31,7 @@ class VerificationType(str, Enum):
     DUPLICATE_CHECK = "duplicate_check"
 
 
-@dataclass
+@dataclass(slots=True)
 class VerificationResult:
     """Result of AI verification"""
     verification_type: VerificationType
@@ -42,7 +44,7 @@ class VerificationResult:
     metadata: Dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class OrderVerification:
     """Complete order verification state"""
     order_id: str
@@ -74,37 +76,6 @@ class NexoraAIService:
     VERSION = "1.0.0"
     ENGINE_NAME = "Nexora AI Agentic Era"
     
-    # Device compatibility matrix
-    DEVICE_COMPATIBILITY = {
-        "ios": {
-            "min_version": "12.1",
-            "esim_models": [
-                "iPhone XS", "iPhone XS Max", "iPhone XR",
-                "iPhone 11", "iPhone 11 Pro", "iPhone 11 Pro Max",
-                "iPhone SE (2nd)", "iPhone SE (3rd)",
-                "iPhone 12", "iPhone 12 mini", "iPhone 12 Pro", "iPhone 12 Pro Max",
-                "iPhone 13", "iPhone 13 mini", "iPhone 13 Pro", "iPhone 13 Pro Max",
-                "iPhone 14", "iPhone 14 Plus", "iPhone 14 Pro", "iPhone 14 Pro Max",
-                "iPhone 15", "iPhone 15 Plus", "iPhone 15 Pro", "iPhone 15 Pro Max",
-                "iPhone 16", "iPhone 16 Plus", "iPhone 16 Pro", "iPhone 16 Pro Max",
-                "iPad Pro (3rd+)", "iPad Air (3rd+)", "iPad (7th+)", "iPad mini (5th+)",
-                "Apple Watch Series 3+", "Apple Watch SE", "Apple Watch Ultra"
-            ]
-        },
-        "android": {
-            "min_version": "9.0",
-            "esim_models": [
-                "Samsung Galaxy S20+", "Samsung Galaxy S21+", "Samsung Galaxy S22+", "Samsung Galaxy S23+", "Samsung Galaxy S24+",
-                "Samsung Galaxy Z Fold", "Samsung Galaxy Z Flip",
-                "Google Pixel 3+", "Google Pixel 4+", "Google Pixel 5+", "Google Pixel 6+", "Google Pixel 7+", "Google Pixel 8+",
-                "Huawei P40+", "Huawei Mate 40+",
-                "Xiaomi 12+", "Xiaomi 13+", "Xiaomi 14+",
-                "OPPO Find X3+", "OPPO Find X5+",
-                "OnePlus 9+", "OnePlus 10+", "OnePlus 11+", "OnePlus 12+"
-            ]
-        }
-    }
-    
     # Provider-specific rules
     PROVIDER_RULES = {
         "MPT": {
@@ -130,8 +101,11 @@ class NexoraAIService:
         }
     }
     
-    def __init__(self):
-        self.verification_cache: Dict[str, OrderVerification] = {}
+    def __init__(self, device_catalog: Optional[DeviceCatalog] = None, order_store=None):
+        # Device compatibility catalog (data/device_catalog.json unless given)
+        self.device_catalog = device_catalog or DeviceCatalog.load()
+        # VerificationOrderStore shared by all workers; attached at startup
+        self.order_store = order_store
         self.audit_log: List[Dict[str, Any]] = []
         self._log_event("system", "Nexora AI Service initialized", {"version": self.VERSION})
     
@@ -158,13 +132,11 @@ class NexoraAIService:
             "engine": self.ENGINE_NAME,
             "version": self.VERSION,
             "status": "operational",
-            "cached_orders": len(self.verification_cache),
+            "order_store": self.order_store.stats() if self.order_store else None,
             "audit_entries": len(self.audit_log),
             "supported_providers": list(self.PROVIDER_RULES.keys()),
-            "supported_devices": {
-                "ios": len(self.DEVICE_COMPATIBILITY["ios"]["esim_models"]),
-                "android": len(self.DEVICE_COMPATIBILITY["android"]["esim_models"])
-            }
+            "device_catalog_version": self.device_catalog.version,
+            "supported_devices": self.device_catalog.counts()
         }
     
     def generate_order_id(self, provider: str, user_id: str) -> str:
@@ -227,35 +199,29 @@ class NexoraAIService:
         )
         
         device_type_lower = device_type.lower()
+        min_os_version = self.device_catalog.min_version(device_type_lower)
         
-        if device_type_lower not in self.DEVICE_COMPATIBILITY:
+        if min_os_version is None:
             result.status = VerificationStatus.FAILED
             result.errors.append(f"Unsupported device type: {device_type}")
             return result
         
-        compatibility = self.DEVICE_COMPATIBILITY[device_type_lower]
-        
         # Check OS version
         try:
             current_version = float(os_version.split(".")[0])
-            min_version = float(compatibility["min_version"].split(".")[0])
+            min_version = float(min_os_version.split(".")[0])
             
             if current_version < min_version:
                 result.status = VerificationStatus.FAILED
-                result.errors.append(f"OS version {os_version} is below minimum {compatibility['min_version']}")
+                result.errors.append(f"OS version {os_version} is below minimum {min_os_version}")
                 return result
         except ValueError:
             result.warnings.append("Could not verify OS version")
         
-        # Check device model (fuzzy match)
-        model_supported = False
-        matched_model = None
-        
-        for supported_model in compatibility["esim_models"]:
-            if self._fuzzy_match(device_model, supported_model):
-                model_supported = True
-                matched_model = supported_model
-                break
+        # Check device model against the catalog index
+        entry = self.device_catalog.lookup(device_type_lower, device_model)
+        model_supported = entry is not None
+        matched_model = entry.label if entry else None
         
         if not model_supported:
             result.status = VerificationStatus.REQUIRES_REVIEW
@@ -403,28 +369,6 @@ class NexoraAIService:
         
         return {"valid": False, "confidence": 0.0, "warnings": ["Unknown verification type"]}
     
-    def _fuzzy_match(self, input_str: str, target: str) -> bool:
-        """Simple fuzzy matching for device models"""
-        input_lower = input_str.lower().replace(" ", "").replace("-", "")
-        target_lower = target.lower().replace(" ", "").replace("-", "")
-        
-        # Exact match
-        if input_lower == target_lower:
-            return True
-        
-        # Contains match
-        if input_lower in target_lower or target_lower in input_lower:
-            return True
-        
-        # Partial match (at least 70% overlap)
-        shorter = min(input_lower, target_lower, key=len)
-        longer = max(input_lower, target_lower, key=len)
-        
-        if shorter in longer:
-            return True
-        
-        return False
-    
     def run_full_verification(
         self,
         user_id: str,
@@ -494,14 +438,28 @@ class NexoraAIService:
         
         order.updated_at = datetime.utcnow().isoformat()
         
-        # Cache the verification
-        self.verification_cache[order_id] = order
-        
         return order
     
-    def get_verification_status(self, order_id: str) -> Optional[OrderVerification]:
-        """Get cached verification status"""
-        return self.verification_cache.get(order_id)
+    def _require_store(self):
+        if self.order_store is None:
+            raise RuntimeError("Verification order store is not configured")
+        return self.order_store
+    
+    async def save_order(self, order: OrderVerification) -> None:
+        """Persist a new order verification"""
+        await self._require_store().create(order)
+    
+    async def get_verification_status(self, order_id: str) -> Optional[OrderVerification]:
+        """Get the latest verification state of an order"""
+        return await self._require_store().get(order_id)
+    
+    async def update_order(
+        self,
+        order_id: str,
+        mutate: Callable[[OrderVerification], None]
+    ) -> Optional[OrderVerification]:
+        """Apply mutate to the latest order state and persist it (None if the order is unknown)"""
+        return await self._require_store().update(order_id, mutate)
     
     def get_provider_rules(self, provider: str) -> Dict[str, Any]:
         """Get provider-specific rules"""
@@ -0,0 +1,110 @@
+"""
+Password Hashing Pool for eSIM Myanmar Platform
+Runs bcrypt hashing and verification on a bounded worker pool so that
+login/register/reset bursts never block the event loop
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+import asyncio
+import logging
+import time
+
+from passlib.context import CryptContext
+
+from services.metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_PENDING, PASSWORD_HASH_REJECTED
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusyError(Exception):
+    """Raised when the hashing queue is full and the request should be retried later"""
+    pass
+
+
+class PasswordHasher:
+    """
+    Bounded bcrypt worker pool
+    bcrypt releases the GIL while hashing, so a thread pool gives real parallelism.
+    Requests beyond max_workers + max_queue are rejected with HasherBusyError.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int = 4, max_queue: int = 64):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+
+        # Metrics
+        self._submitted = 0
+        self._rejected = 0
+        self._failed = 0
+        self._max_depth = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    async def _run(self, operation: str, func, *args):
+        if self._pending >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            PASSWORD_HASH_REJECTED.inc()
+            logger.warning("Password hashing queue full", extra={"pending": self._pending})
+            raise HasherBusyError("Authentication service is busy. Please try again shortly.")
+
+        self._pending += 1
+        PASSWORD_HASH_PENDING.inc()
+        self._submitted += 1
+        self._max_depth = max(self._max_depth, self._pending)
+        queued_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            return func(*args), started_at, time.perf_counter()
+
+        try:
+            loop = asyncio.get_running_loop()
+            result, started_at, finished_at = await loop.run_in_executor(self._executor, timed)
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._pending -= 1
+            PASSWORD_HASH_PENDING.dec()
+
+        # Accounting happens back on the event loop, so no locking is needed
+        self._wait_seconds += started_at - queued_at
+        self._run_seconds += finished_at - started_at
+        PASSWORD_HASH_DURATION.labels(operation, "wait").observe(started_at - queued_at)
+        PASSWORD_HASH_DURATION.labels(operation, "run").observe(finished_at - started_at)
+        return result
+
+    async def hash(self, password: str) -> str:
+        """Hash password on the worker pool"""
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """Verify password on the worker pool"""
+        return await self._run("verify", self.context.verify, password, hashed)
+
+    def needs_update(self, hashed: str) -> bool:
+        """Check whether hash uses an outdated scheme or cost factor (cheap, no hashing)"""
+        return self.context.needs_update(hashed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool metrics"""
+        completed = self._submitted - self._pending - self._failed
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "max_depth": self._max_depth,
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+            "failed": self._failed,
+            "avg_wait_ms": (self._wait_seconds / completed * 1000) if completed else 0.0,
+            "avg_run_ms": (self._run_seconds / completed * 1000) if completed else 0.0,
+        }
+
+    def shutdown(self):
+        """Stop worker threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
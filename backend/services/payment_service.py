@@ -1,23 +1,49 @@
 """
 Payment Service for eSIM Myanmar Platform
-Handles payment processing with multiple gateways
+Handles payment processing with multiple gateways. Gateway callbacks only
+record the payment and queue its fulfillment (an outbox entry embedded in
+the transaction document); a background worker applies it exactly once.
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+import asyncio
+import os
+import socket
 import uuid
 import logging
 import hashlib
 import hmac
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from services.promo_service import PromoService
+from utils.pagination import DEFAULT_PAGE_SIZE, build_projection, paginate
 
 logger = logging.getLogger(__name__)
 
+# Fields selectable with fields= on transaction listings
+TRANSACTION_FIELDS = {
+    "transaction_id", "user_id", "plan_id", "profile_id", "amount", "currency",
+    "discount_amount", "final_amount", "promo_code", "payment_method", "status",
+    "gateway_transaction_id", "gateway_response", "payment_url", "qr_code",
+    "created_at", "completed_at", "updated_at", "fulfillment"
+}
+
+# Terminal statuses that give a redeemed promo use back
+PROMO_RELEASE_STATUSES = {"failed", "cancelled", "expired"}
+
+# Large gateway payloads are only returned when explicitly requested
+TRANSACTION_HEAVY_FIELDS = ["gateway_response"]
+
 
 class PaymentGateway:
     """Base payment gateway interface"""
     
+    # True only for gateways whose verify_payment asks the gateway for the real status;
+    # reconciliation never applies answers from placeholder implementations
+    supports_verification = False
+    
     async def create_payment(self, amount: float, currency: str, order_id: str, **kwargs) -> Dict[str, Any]:
         raise NotImplementedError
     
@@ -105,11 +131,32 @@ class AYAPayGateway(PaymentGateway):
 class PaymentService:
     """Payment processing service"""
     
-    def __init__(self, db: AsyncIOMotorDatabase, gateways: Dict[str, PaymentGateway] = None):
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        gateways: Dict[str, PaymentGateway] = None,
+        plan_catalog=None,
+        promo_service: Optional[PromoService] = None,
+        fulfillment_lease_seconds: float = 30.0,
+        fulfillment_max_attempts: int = 8,
+        fulfillment_poll_interval_seconds: float = 5.0
+    ):
         self.db = db
         self.transactions = db.transactions
         self.plans = db.plans
         self.gateways = gateways or {}
+        self.plan_catalog = plan_catalog  # In-memory PlanCatalog; falls back to the database
+        self.promo_service = promo_service or PromoService(db)
+        
+        # Fulfillment worker
+        self.fulfillment_lease_seconds = fulfillment_lease_seconds
+        self.fulfillment_max_attempts = fulfillment_max_attempts
+        self.fulfillment_poll_interval_seconds = fulfillment_poll_interval_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._fulfillment_ready = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self.fulfilled = 0
+        self.fulfillment_failures = 0
     
     def add_gateway(self, name: str, gateway: PaymentGateway):
         """Add payment gateway"""
@@ -117,10 +164,9 @@ class PaymentService:
     
     async def get_plan(self, plan_id: str) -> Optional[dict]:
         """Get plan by ID"""
-        plan = await self.plans.find_one({"plan_id": plan_id})
-        if plan:
-            plan.pop("_id", None)
-        return plan
+        if self.plan_catalog is not None:
+            return self.plan_catalog.get(plan_id)
+        return await self.plans.find_one({"plan_id": plan_id}, {"_id": 0})
     
     async def create_payment(
         self,
@@ -142,11 +188,15 @@ class PaymentService:
         amount = plan["price"]
         discount_amount = 0.0
         
-        # Apply promo code if provided
+        # Apply promo code if provided (consumes one use atomically; given back
+        # if the payment cannot be created or never completes)
+        promo = None
         if promo_code:
-            discount = await self._validate_promo_code(promo_code, plan_id)
-            if discount:
-                discount_amount = amount * (discount / 100)
+            try:
+                promo = await self.promo_service.redeem(promo_code, plan_id)
+                discount_amount = amount * (promo.get("discount_percent", 0) / 100)
+            except ValueError as e:
+                logger.info(f"Promo code {promo_code} not applied: {e}")
         
         final_amount = amount - discount_amount
         
@@ -162,6 +212,7 @@ class PaymentService:
             "discount_amount": discount_amount,
             "final_amount": final_amount,
             "promo_code": promo_code,
+            "promo_state": "held" if promo else None,
             "payment_method": payment_method,
             "status": "pending",
             "gateway_transaction_id": None,
@@ -170,19 +221,24 @@ class PaymentService:
             "completed_at": None
         }
         
-        # Process with payment gateway
-        gateway = self.gateways.get(payment_method)
-        if gateway:
-            gateway_response = await gateway.create_payment(
-                amount=final_amount,
-                currency=currency,
-                order_id=transaction_id
-            )
-            transaction["gateway_transaction_id"] = gateway_response.get("gateway_transaction_id")
-            transaction["payment_url"] = gateway_response.get("payment_url")
-            transaction["qr_code"] = gateway_response.get("qr_code")
-        
-        await self.transactions.insert_one(transaction)
+        try:
+            # Process with payment gateway
+            gateway = self.gateways.get(payment_method)
+            if gateway:
+                gateway_response = await gateway.create_payment(
+                    amount=final_amount,
+                    currency=currency,
+                    order_id=transaction_id
+                )
+                transaction["gateway_transaction_id"] = gateway_response.get("gateway_transaction_id")
+                transaction["payment_url"] = gateway_response.get("payment_url")
+                transaction["qr_code"] = gateway_response.get("qr_code")
+            
+            await self.transactions.insert_one(transaction)
+        except Exception:
+            if promo:
+                await self.promo_service.release(promo["code"])
+            raise
         
         logger.info(f"Created payment transaction: {transaction_id} for user: {user_id}")
         
@@ -190,32 +246,13 @@ class PaymentService:
         transaction.pop("_id", None)
         return transaction
     
-    async def _validate_promo_code(self, code: str, plan_id: str) -> Optional[float]:
-        """Validate promo code and return discount percentage"""
-        promo = await self.db.promo_codes.find_one({
-            "code": code.upper(),
-            "is_active": True,
-            "valid_until": {"$gte": datetime.utcnow()}
-        })
-        
-        if promo:
-            # Check if applicable to plan
-            if promo.get("applicable_plans") and plan_id not in promo["applicable_plans"]:
-                return None
-            return promo.get("discount_percent", 0)
-        
-        return None
-    
     async def get_transaction(self, transaction_id: str, user_id: Optional[str] = None) -> Optional[dict]:
         """Get transaction by ID"""
         query = {"transaction_id": transaction_id}
         if user_id:
             query["user_id"] = user_id
         
-        transaction = await self.transactions.find_one(query)
-        if transaction:
-            transaction.pop("_id", None)
-        return transaction
+        return await self.transactions.find_one(query, {"_id": 0})
     
     async def process_callback(
         self,
@@ -224,72 +261,242 @@ class PaymentService:
         status: str,
         gateway_response: dict
     ) -> dict:
-        """Process payment gateway callback"""
-        
-        transaction = await self.get_transaction(transaction_id)
-        if not transaction:
-            raise ValueError("Transaction not found")
-        
-        # Update transaction
+        """Record a payment gateway callback; fulfillment happens in the background"""
+        now = datetime.utcnow()
         update_data = {
             "status": status,
             "gateway_transaction_id": gateway_transaction_id,
             "gateway_response": gateway_response,
-            "updated_at": datetime.utcnow()
+            "updated_at": now
         }
         
         if status == "completed":
-            update_data["completed_at"] = datetime.utcnow()
-            
-            # Activate or top-up eSIM profile
-            await self._fulfill_order(transaction)
-        
-        await self.transactions.update_one(
-            {"transaction_id": transaction_id},
-            {"$set": update_data}
+            update_data["completed_at"] = now
+            # Outbox entry, written atomically with the status change
+            update_data["fulfillment"] = {
+                "state": "pending",
+                "idempotency_key": gateway_transaction_id or transaction_id,
+                "attempts": 0,
+                "next_attempt_at": now,
+                "owner": None,
+                "last_error": None,
+                "fulfilled_at": None
+            }
+        
+        # A completed transaction is final: duplicate or late callbacks must not touch it
+        transaction = await self.transactions.find_one_and_update(
+            {"transaction_id": transaction_id, "status": {"$ne": "completed"}},
+            {"$set": update_data},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
         )
         
+        if transaction is None:
+            transaction = await self.get_transaction(transaction_id)
+            if not transaction:
+                raise ValueError("Transaction not found")
+            logger.info(f"Ignored callback for completed transaction: {transaction_id} - {status}")
+            return transaction
+        
+        if status == "completed":
+            self._fulfillment_ready.set()
+        
+        if transaction.get("promo_state"):
+            await self._settle_promo(transaction)
+        
         logger.info(f"Payment callback processed: {transaction_id} - {status}")
         
-        return await self.get_transaction(transaction_id)
+        return transaction
+    
+    async def _settle_promo(self, transaction: dict):
+        """Give the promo use back when a payment ends unpaid; take it again if it completes later"""
+        if transaction["status"] in PROMO_RELEASE_STATUSES:
+            transition = ("held", "released")
+        elif transaction["status"] == "completed":
+            transition = ("released", "held")
+        else:
+            return
+        
+        # Flip promo_state first so concurrent callbacks settle the promo only once
+        result = await self.transactions.update_one(
+            {"transaction_id": transaction["transaction_id"], "promo_state": transition[0]},
+            {"$set": {"promo_state": transition[1]}}
+        )
+        if result.modified_count == 0:
+            return
+        
+        if transition[1] == "released":
+            await self.promo_service.release(transaction["promo_code"])
+        else:
+            await self.promo_service.reclaim(transaction["promo_code"])
+        transaction["promo_state"] = transition[1]
+    
+    async def release_stale_promo_holds(self, created_before: datetime, limit: int = 500) -> int:
+        """
+        Give back promo uses held by payments still pending since before
+        created_before (abandoned checkouts get no callback). Completing such a
+        payment later takes the use again through _settle_promo.
+        """
+        stale = await self.transactions.find(
+            {"status": "pending", "promo_state": "held", "created_at": {"$lte": created_before}},
+            {"_id": 0, "transaction_id": 1, "promo_code": 1}
+        ).limit(limit).to_list(length=None)
+        
+        released = 0
+        for transaction in stale:
+            result = await self.transactions.update_one(
+                {"transaction_id": transaction["transaction_id"], "status": "pending", "promo_state": "held"},
+                {"$set": {"promo_state": "released"}}
+            )
+            if result.modified_count:
+                await self.promo_service.release(transaction["promo_code"])
+                released += 1
+        
+        if released:
+            logger.info(f"Released {released} promo uses held by abandoned payments")
+        return released
     
     async def _fulfill_order(self, transaction: dict):
-        """Fulfill order after successful payment"""
-        user_id = transaction["user_id"]
+        """Fulfill order after successful payment (safe to repeat for the same transaction)"""
         plan_id = transaction["plan_id"]
         profile_id = transaction.get("profile_id")
+        idempotency_key = transaction["fulfillment"]["idempotency_key"]
         
         plan = await self.get_plan(plan_id)
         if not plan:
+            logger.warning(f"Plan {plan_id} not found, nothing to fulfill for {transaction['transaction_id']}")
             return
         
         if profile_id:
-            # Top-up existing profile
-            await self.db.esim_profiles.update_one(
-                {"profile_id": profile_id},
+            # Top-up existing profile; the key list on the profile makes the credit exactly-once
+            result = await self.db.esim_profiles.update_one(
+                {"profile_id": profile_id, "fulfilled_payments": {"$ne": idempotency_key}},
                 {
                     "$inc": {"data_limit_gb": plan["data_gb"]},
+                    "$push": {"fulfilled_payments": idempotency_key},
                     "$set": {"updated_at": datetime.utcnow()}
                 }
             )
+            if result.matched_count == 0:
+                if not await self.db.esim_profiles.find_one({"profile_id": profile_id}, {"_id": 1}):
+                    raise ValueError("Profile not found")
+                logger.info(f"Top-up {idempotency_key} already applied to profile {profile_id}")
         else:
             # Create new profile (handled by eSIM service)
             pass
         
         logger.info(f"Order fulfilled: {transaction['transaction_id']}")
     
-    async def get_user_transactions(self, user_id: str, limit: int = 50) -> list:
-        """Get user's transaction history"""
-        cursor = self.transactions.find(
-            {"user_id": user_id}
-        ).sort("created_at", -1).limit(limit)
+    # ------------------ Fulfillment worker ------------------
+    async def claim_fulfillment(self) -> Optional[dict]:
+        """Lease the next due fulfillment (pending, or processing with a lapsed lease)"""
+        now = datetime.utcnow()
+        return await self.transactions.find_one_and_update(
+            {
+                "fulfillment.state": {"$in": ["pending", "processing"]},
+                "fulfillment.next_attempt_at": {"$lte": now}
+            },
+            {
+                "$set": {
+                    "fulfillment.state": "processing",
+                    "fulfillment.owner": self.worker_id,
+                    # Doubles as the lease: another worker may retry once it passes
+                    "fulfillment.next_attempt_at": now + timedelta(seconds=self.fulfillment_lease_seconds)
+                },
+                "$inc": {"fulfillment.attempts": 1}
+            },
+            sort=[("fulfillment.next_attempt_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def run_fulfillment(self, transaction: dict) -> bool:
+        """Apply a leased fulfillment and record the outcome"""
+        transaction_id = transaction["transaction_id"]
+        attempts = transaction["fulfillment"]["attempts"]
+        lease = {"transaction_id": transaction_id, "fulfillment.state": "processing", "fulfillment.owner": self.worker_id}
         
-        transactions = await cursor.to_list(length=limit)
+        try:
+            await self._fulfill_order(transaction)
+        except Exception as e:
+            give_up = attempts >= self.fulfillment_max_attempts
+            backoff = min(2 ** attempts, 300)
+            await self.transactions.update_one(
+                lease,
+                {"$set": {
+                    "fulfillment.state": "failed" if give_up else "pending",
+                    "fulfillment.next_attempt_at": datetime.utcnow() + timedelta(seconds=backoff),
+                    "fulfillment.last_error": str(e)[:200]
+                }}
+            )
+            self.fulfillment_failures += 1
+            logger.error(f"Fulfillment of {transaction_id} failed (attempt {attempts}): {e}")
+            return False
         
-        for t in transactions:
-            t.pop("_id", None)
+        await self.transactions.update_one(
+            lease,
+            {"$set": {"fulfillment.state": "done", "fulfillment.fulfilled_at": datetime.utcnow()}}
+        )
+        self.fulfilled += 1
+        return True
+    
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of fulfillment metrics"""
+        return {"fulfilled": self.fulfilled, "fulfillment_failures": self.fulfillment_failures}
+    
+    async def start(self):
+        """Start the fulfillment worker (also picks up work left by crashed workers)"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run_fulfillment())
+    
+    async def stop(self):
+        """Stop the fulfillment worker; a leased entry is retried when its lease lapses"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    async def _run_fulfillment(self):
+        while True:
+            try:
+                transaction = await self.claim_fulfillment()
+                if transaction is not None:
+                    await self.run_fulfillment(transaction)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Fulfillment worker error: {e}")
+            
+            self._fulfillment_ready.clear()
+            try:
+                await asyncio.wait_for(self._fulfillment_ready.wait(), self.fulfillment_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def get_user_transactions(
+        self,
+        user_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> tuple:
+        """Get a page of a user's transaction history. Returns (transactions, next_cursor)."""
+        projection = build_projection(
+            fields, TRANSACTION_FIELDS, "transaction_id", exclude=TRANSACTION_HEAVY_FIELDS
+        )
         
-        return transactions
+        return await paginate(
+            self.transactions,
+            {"user_id": user_id},
+            "transaction_id",
+            limit=limit,
+            cursor=cursor,
+            projection=projection
+        )
     
     async def request_refund(
         self,
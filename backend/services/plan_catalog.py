@@ -0,0 +1,194 @@
+"""
+Plan Catalog for eSIM Myanmar Platform
+Serves plan lookups from memory, indexed by plan_id and plan_type, with
+version-based invalidation shared across workers through MongoDB
+"""
+
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple
+import asyncio
+import copy
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_ID = "plan_catalog"
+
+
+# Default plans
+DEFAULT_PLANS = [
+    {
+        "plan_id": "plan_basic_5g",
+        "name": "Basic 5G",
+        "data_gb": 10.0,
+        "validity_days": 30,
+        "price": 5000,
+        "currency": "MMK",
+        "features": ["5G Network", "VoLTE", "Basic Roaming"],
+        "plan_type": "prepaid",
+        "is_popular": False,
+        "is_active": True
+    },
+    {
+        "plan_id": "plan_premium_5g",
+        "name": "Premium 5G",
+        "data_gb": 50.0,
+        "validity_days": 30,
+        "price": 20000,
+        "currency": "MMK",
+        "features": ["5G Network", "VoLTE", "Advanced Roaming", "Entertainment Bundle"],
+        "plan_type": "prepaid",
+        "is_popular": True,
+        "is_active": True
+    },
+    {
+        "plan_id": "plan_enterprise",
+        "name": "Enterprise Unlimited",
+        "data_gb": 999.0,
+        "validity_days": 365,
+        "price": 500000,
+        "currency": "MMK",
+        "features": ["5G Network", "VoLTE", "Global Roaming", "Priority Support", "Dedicated Account Manager"],
+        "plan_type": "postpaid",
+        "is_popular": False,
+        "is_active": True
+    },
+    {
+        "plan_id": "plan_tourist_7d",
+        "name": "Tourist 7-Day",
+        "data_gb": 5.0,
+        "validity_days": 7,
+        "price": 3000,
+        "currency": "MMK",
+        "features": ["4G/5G Network", "VoLTE"],
+        "plan_type": "prepaid",
+        "is_popular": False,
+        "is_active": True
+    },
+    {
+        "plan_id": "plan_data_booster",
+        "name": "Data Booster 20GB",
+        "data_gb": 20.0,
+        "validity_days": 30,
+        "price": 8000,
+        "currency": "MMK",
+        "features": ["5G Network", "VoLTE", "Roaming"],
+        "plan_type": "prepaid",
+        "is_popular": False,
+        "is_active": True
+    }
+]
+
+
+class PlanCatalog:
+    """
+    In-memory plan catalog
+    Returned plan dicts are shared between requests and must be treated as read-only.
+    """
+    
+    def __init__(self, db: AsyncIOMotorDatabase, refresh_interval_seconds: float = 30.0):
+        self.plans = db.plans
+        self.meta = db.app_meta
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.version = -1
+        self._by_id: Dict[str, dict] = {}
+        self._by_status: Dict[bool, List[dict]] = {}
+        self._by_type: Dict[Tuple[bool, str], List[dict]] = {}
+        self._lock = asyncio.Lock()
+        self._refresher: Optional[asyncio.Task] = None
+        
+        # Metrics
+        self.loads = 0
+    
+    async def seed_defaults(self) -> None:
+        """Insert the default plans into an empty catalog"""
+        if await self.plans.find_one({}, {"_id": 1}):
+            return
+        
+        now = datetime.utcnow()
+        await self.plans.insert_many([{**copy.deepcopy(plan), "created_at": now} for plan in DEFAULT_PLANS])
+        logger.info(f"Seeded {len(DEFAULT_PLANS)} default plans")
+    
+    def _index(self, plans: List[dict]) -> None:
+        by_id, by_status, by_type = {}, {}, {}
+        for plan in plans:
+            by_id[plan["plan_id"]] = plan
+            is_active = plan.get("is_active", True)
+            by_status.setdefault(is_active, []).append(plan)
+            by_type.setdefault((is_active, plan.get("plan_type")), []).append(plan)
+        
+        # Swap in complete indexes so readers never see a partial catalog
+        self._by_id, self._by_status, self._by_type = by_id, by_status, by_type
+    
+    async def _read_version(self) -> int:
+        doc = await self.meta.find_one({"_id": CATALOG_VERSION_ID}, {"version": 1})
+        return doc.get("version", 0) if doc else 0
+    
+    async def load(self) -> None:
+        """(Re)load all plans from the database"""
+        async with self._lock:
+            # Read the version first: a write racing with the load bumps it again
+            version = await self._read_version()
+            plans = await self.plans.find({}, {"_id": 0}).to_list(length=None)
+            self._index(plans)
+            self.version = version
+            self.loads += 1
+        logger.info(f"Loaded plan catalog: {len(plans)} plans (version {version})")
+    
+    async def refresh_if_stale(self) -> bool:
+        """Reload if another worker has changed the catalog. Returns True if reloaded."""
+        if await self._read_version() == self.version:
+            return False
+        await self.load()
+        return True
+    
+    async def invalidate(self) -> None:
+        """Bump the shared catalog version after a plan write and reload locally"""
+        await self.meta.update_one(
+            {"_id": CATALOG_VERSION_ID},
+            {"$inc": {"version": 1}},
+            upsert=True
+        )
+        await self.load()
+    
+    def get(self, plan_id: str) -> Optional[dict]:
+        """Get plan by ID (active or not)"""
+        return self._by_id.get(plan_id)
+    
+    def list_plans(self, plan_type: Optional[str] = None, is_active: bool = True) -> List[dict]:
+        """List plans, optionally filtered by plan_type"""
+        if plan_type:
+            return self._by_type.get((is_active, plan_type), [])
+        return self._by_status.get(is_active, [])
+    
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of catalog metrics"""
+        return {"plans": len(self._by_id), "version": self.version, "loads": self.loads}
+    
+    # ------------------ Cross-worker refresh ------------------
+    async def start(self) -> None:
+        """Start polling the shared version for changes made by other workers"""
+        if self._refresher is None and self.refresh_interval_seconds > 0:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self) -> None:
+        """Stop the refresh task"""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+    
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval_seconds)
+            try:
+                await self.refresh_if_stale()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Plan catalog refresh failed: {e}")
@@ -0,0 +1,142 @@
+"""
+Promo Code Service for eSIM Myanmar Platform
+Validates promo codes from a short-TTL metadata cache and redeems them with a
+single atomic conditional increment, so limited promos cannot be over-redeemed
+"""
+
+from datetime import datetime
+from typing import Optional, Dict, Tuple
+import logging
+import time
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Metadata served from cache; used_count is only ever read by the atomic update
+PROMO_PROJECTION = {
+    "_id": 0,
+    "code": 1,
+    "description": 1,
+    "discount_percent": 1,
+    "applicable_plans": 1,
+    "is_active": 1,
+    "valid_from": 1,
+    "valid_until": 1,
+    "usage_limit": 1,
+}
+
+
+class PromoService:
+    """Promo code validation and redemption"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, cache_ttl_seconds: float = 30.0, clock=time.monotonic):
+        self.promo_codes = db.promo_codes
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._clock = clock
+        self._cache: Dict[str, Tuple[float, Optional[dict]]] = {}
+
+        # Metrics
+        self.redeemed = 0
+        self.exhausted = 0
+        self.released = 0
+        self.reclaimed = 0
+
+    async def get_promo(self, code: str) -> Optional[dict]:
+        """Get promo metadata by code (cached, including misses)"""
+        code = code.upper()
+        entry = self._cache.get(code)
+        if entry is not None and entry[0] > self._clock():
+            return entry[1]
+
+        promo = await self.promo_codes.find_one({"code": code}, PROMO_PROJECTION)
+        self._cache[code] = (self._clock() + self.cache_ttl_seconds, promo)
+        return promo
+
+    def invalidate(self, code: Optional[str] = None) -> None:
+        """Drop cached metadata for a code (or all codes)"""
+        if code is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(code.upper(), None)
+
+    async def check(self, code: str, plan_id: str) -> dict:
+        """Validate a promo code for a plan; raises ValueError if it cannot be used"""
+        promo = await self.get_promo(code)
+        now = datetime.utcnow()
+
+        if (
+            not promo
+            or not promo.get("is_active")
+            or (promo.get("valid_from") and promo["valid_from"] > now)
+            or not promo.get("valid_until")
+            or promo["valid_until"] < now
+        ):
+            raise ValueError("Invalid or expired promo code")
+
+        if promo.get("applicable_plans") and plan_id not in promo["applicable_plans"]:
+            raise ValueError("Promo code not applicable to this plan")
+
+        return promo
+
+    async def redeem(self, code: str, plan_id: str) -> dict:
+        """Validate and consume one use of a promo code; raises ValueError if unavailable"""
+        promo = await self.check(code, plan_id)
+        now = datetime.utcnow()
+
+        # The guard is re-evaluated by MongoDB under the document lock, so
+        # concurrent redemptions can never push used_count past usage_limit.
+        # A usage_limit of null/0 means unlimited.
+        redeemed = await self.promo_codes.find_one_and_update(
+            {
+                "code": promo["code"],
+                "is_active": True,
+                "valid_until": {"$gte": now},
+                "$or": [
+                    {"usage_limit": {"$in": [None, 0]}},
+                    {"$expr": {"$lt": [{"$ifNull": ["$used_count", 0]}, "$usage_limit"]}},
+                ],
+            },
+            {"$inc": {"used_count": 1}, "$set": {"last_redeemed_at": now}},
+            projection=PROMO_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+
+        if redeemed is None:
+            self.exhausted += 1
+            # Deactivated or expired since it was cached
+            self.invalidate(code)
+            raise ValueError("Promo code is no longer available")
+
+        self.redeemed += 1
+        return redeemed
+
+    async def release(self, code: str) -> None:
+        """Give back a use consumed by redeem() for a payment that never completed"""
+        await self.promo_codes.update_one(
+            {"code": code.upper(), "used_count": {"$gt": 0}},
+            {"$inc": {"used_count": -1}}
+        )
+        self.released += 1
+
+    async def reclaim(self, code: str) -> None:
+        """
+        Consume a released use again for a payment that completed late. The
+        customer already paid the discounted price, so this ignores usage_limit.
+        """
+        await self.promo_codes.update_one(
+            {"code": code.upper()},
+            {"$inc": {"used_count": 1}, "$set": {"last_redeemed_at": datetime.utcnow()}}
+        )
+        self.reclaimed += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of promo metrics"""
+        return {
+            "cached": len(self._cache),
+            "redeemed": self.redeemed,
+            "exhausted": self.exhausted,
+            "released": self.released,
+            "reclaimed": self.reclaimed,
+        }
@@ -0,0 +1,282 @@
+"""
+Provisioning Service for eSIM Myanmar Platform
+Bulk profile provisioning for enterprise orders, run as leased background
+jobs that checkpoint after every chunk so any worker can resume them
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Tuple
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from services.id_allocator import generate_activation_code
+
+logger = logging.getLogger(__name__)
+
+MAX_BULK_QUANTITY = 10_000
+MAX_RECORDED_FAILURES = 1_000
+
+# Profile IDs are derived from (job_id, index) so a resumed chunk cannot duplicate profiles
+PROFILE_ID_NAMESPACE = uuid.UUID("5b7c2f0e-8a43-4c1d-9d7e-3f1a6b2c9e10")
+
+JOB_PROJECTION = {
+    "_id": 0,
+    "job_id": 1,
+    "status": 1,
+    "plan_id": 1,
+    "device_type": 1,
+    "quantity": 1,
+    "next_index": 1,
+    "created": 1,
+    "failed": 1,
+    "failures": 1,
+    "error": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "completed_at": 1,
+}
+
+
+def bulk_profile_id(job_id: str, index: int) -> str:
+    return str(uuid.uuid5(PROFILE_ID_NAMESPACE, f"{job_id}:{index}"))
+
+
+class ProvisioningService:
+    """Bulk eSIM provisioning jobs"""
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        esim_service,
+        qr_executor=None,
+        chunk_size: int = 500,
+        lease_seconds: float = 60.0,
+        poll_interval_seconds: float = 5.0,
+        max_attempts: int = 5
+    ):
+        self.jobs = db.provisioning_jobs
+        self.profiles = db.esim_profiles
+        self.esim_service = esim_service
+        self.qr_executor = qr_executor  # e.g. a ProcessPoolExecutor for QR rendering
+        self.chunk_size = chunk_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.jobs_completed = 0
+        self.profiles_created = 0
+        self.items_failed = 0
+
+    async def submit(
+        self,
+        user_id: str,
+        quantity: int,
+        plan_id: Optional[str] = None,
+        device_type: Optional[str] = None
+    ) -> dict:
+        """Queue a bulk provisioning job"""
+        if not 1 <= quantity <= MAX_BULK_QUANTITY:
+            raise ValueError(f"Quantity must be between 1 and {MAX_BULK_QUANTITY}")
+
+        catalog = self.esim_service.plan_catalog
+        if plan_id and catalog is not None and catalog.get(plan_id) is None:
+            raise ValueError("Plan not found")
+
+        now = datetime.utcnow()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "status": "queued",
+            "plan_id": plan_id,
+            "device_type": device_type,
+            "quantity": quantity,
+            "next_index": 0,
+            "created": 0,
+            "failed": 0,
+            "failures": [],
+            "attempts": 0,
+            "owner": None,
+            "lease_until": now,
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": None,
+        }
+        await self.jobs.insert_one(job)
+        self._wakeup.set()
+        logger.info(f"Queued provisioning job {job['job_id']}: {quantity} profiles for user {user_id}")
+        return {key: job[key] for key in JOB_PROJECTION if key in job}
+
+    async def get_job(self, job_id: str, user_id: Optional[str] = None) -> Optional[dict]:
+        """Get job progress"""
+        query = {"job_id": job_id}
+        if user_id:
+            query["user_id"] = user_id
+        return await self.jobs.find_one(query, JOB_PROJECTION)
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of provisioning metrics"""
+        return {
+            "jobs_completed": self.jobs_completed,
+            "profiles_created": self.profiles_created,
+            "items_failed": self.items_failed,
+        }
+
+    # ------------------ Job execution ------------------
+    async def claim(self) -> Optional[dict]:
+        """Lease the oldest queued job, or a running job whose owner stopped renewing its lease"""
+        now = datetime.utcnow()
+        job = await self.jobs.find_one_and_update(
+            {"status": {"$in": ["queued", "running"]}, "lease_until": {"$lte": now}},
+            {
+                "$set": {
+                    "status": "running",
+                    "owner": self.worker_id,
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job and job["attempts"] > self.max_attempts:
+            await self._finish(job, "failed", error="Too many attempts")
+            return None
+        return job
+
+    async def run_job(self, job: dict) -> None:
+        """Provision the remaining items of a leased job, checkpointing after each chunk"""
+        job_id = job["job_id"]
+        start = job["next_index"]
+        while start < job["quantity"]:
+            end = min(start + self.chunk_size, job["quantity"])
+            created, failures = await self._provision_chunk(job, start, end)
+
+            now = datetime.utcnow()
+            result = await self.jobs.update_one(
+                {"job_id": job_id, "owner": self.worker_id},
+                {
+                    "$set": {
+                        "next_index": end,
+                        "lease_until": now + timedelta(seconds=self.lease_seconds),
+                        "updated_at": now,
+                    },
+                    "$inc": {"created": created, "failed": len(failures)},
+                    "$push": {"failures": {"$each": failures, "$slice": MAX_RECORDED_FAILURES}},
+                }
+            )
+            self.profiles_created += created
+            self.items_failed += len(failures)
+            if result.matched_count == 0:
+                logger.warning(f"Lost lease on provisioning job {job_id}, stopping")
+                return
+            start = end
+
+        final = await self.jobs.find_one({"job_id": job_id}, {"failed": 1})
+        await self._finish(job, "completed_with_errors" if final and final.get("failed") else "completed")
+        self.jobs_completed += 1
+        logger.info(f"Provisioning job {job_id} finished")
+
+    async def _finish(self, job: dict, status: str, error: Optional[str] = None) -> None:
+        now = datetime.utcnow()
+        await self.jobs.update_one(
+            {"job_id": job["job_id"], "owner": self.worker_id},
+            {"$set": {"status": status, "error": error, "owner": None, "completed_at": now, "updated_at": now}}
+        )
+
+    async def _provision_chunk(self, job: dict, start: int, end: int) -> Tuple[int, List[dict]]:
+        """Insert profiles [start, end) of a job. Returns (created, failures)."""
+        esim = self.esim_service
+        profile_ids = {index: bulk_profile_id(job["job_id"], index) for index in range(start, end)}
+
+        # A chunk replayed after a crash may be partly inserted already; skip those
+        # items before allocating ICCIDs and storing QR images for them
+        existing = {
+            doc["profile_id"]
+            async for doc in self.profiles.find(
+                {"profile_id": {"$in": list(profile_ids.values())}}, {"_id": 0, "profile_id": 1}
+            )
+        }
+        indexes = [index for index, profile_id in profile_ids.items() if profile_id not in existing]
+        if not indexes:
+            return end - start, []
+
+        codes = [generate_activation_code() for _ in indexes]
+        iccids = await esim.iccid_allocator.allocate_many(len(indexes))
+        qr_keys = await esim.qr_store.store_many(codes, executor=self.qr_executor)
+
+        docs = [
+            esim.build_profile(
+                user_id=job["user_id"],
+                profile_id=profile_ids[index],
+                iccid=iccid,
+                activation_code=code,
+                qr_code_key=key,
+                plan_id=job.get("plan_id"),
+                device_type=job.get("device_type"),
+                job_id=job["job_id"],
+            )
+            for index, iccid, code, key in zip(indexes, iccids, codes, qr_keys)
+        ]
+
+        failures = []
+        try:
+            await self.profiles.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                # Rejected documents never reference their QR image
+                await esim.qr_store.delete(docs[err["index"]]["qr_code_key"])
+                if err.get("code") == 11000 and "profile_id" in (err.get("keyPattern") or {}):
+                    continue  # Inserted concurrently by another worker
+                failures.append({"index": indexes[err["index"]], "error": err.get("errmsg", "Insert failed")[:200]})
+        return end - start - len(failures), failures
+
+    # ------------------ Background worker ------------------
+    async def start(self) -> None:
+        """Start processing jobs (including jobs abandoned by crashed workers)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop processing; an interrupted job is resumed by the next lease holder"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Release our leases so another worker can resume right away
+            await self.jobs.update_many(
+                {"owner": self.worker_id, "status": "running"},
+                {"$set": {"lease_until": datetime.utcnow()}}
+            )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                job = await self.claim()
+                if job is not None:
+                    await self.run_job(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Provisioning worker error: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,131 @@
+"""
+QR Code Store for eSIM Myanmar Platform
+Renders activation QR codes off the event loop and stores each PNG once in
+GridFS, keyed by a hash of the activation code
+"""
+
+from typing import List, Optional
+import asyncio
+import hashlib
+import io
+import logging
+
+import qrcode
+from gridfs.errors import FileExists, NoFile
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket
+
+logger = logging.getLogger(__name__)
+
+
+def qr_key(data: str) -> str:
+    """Content address for a QR payload"""
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def qr_url(profile_id: str) -> str:
+    """API path serving a profile's QR image"""
+    return f"/api/esim/profiles/{profile_id}/qr.png"
+
+
+def render_qr_png(data: str) -> bytes:
+    """Render QR code PNG bytes (CPU-bound; run in an executor)"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=10,
+        border=4
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="#1e2f3c", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_qr_batch(data: List[str]) -> List[bytes]:
+    """Render several QR codes in one executor call (amortizes process-pool IPC)"""
+    return [render_qr_png(item) for item in data]
+
+
+class QRCodeStore:
+    """Content-addressed QR PNG store backed by GridFS"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, executor=None, bucket_name: str = "qr_codes"):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f"{bucket_name}.files"]
+        self.executor = executor  # None uses the loop's default thread pool
+
+    async def render(self, data: str) -> bytes:
+        """Render PNG bytes without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, render_qr_png, data)
+
+    async def store(self, data: str) -> str:
+        """Render and store the QR image for data if not already stored. Returns its key."""
+        key = qr_key(data)
+        if await self.files.find_one({"_id": key}, {"_id": 1}):
+            return key
+
+        png = await self.render(data)
+        try:
+            await self.bucket.upload_from_stream_with_id(
+                key, f"{key}.png", png, metadata={"content_type": "image/png"}
+            )
+        except FileExists:
+            # Another request stored the same content first
+            pass
+        return key
+
+    async def store_many(self, data: List[str], executor=None, batch_size: int = 50) -> List[str]:
+        """
+        Render and store QR images for many payloads. Returns their keys in order.
+        Rendering is split into batches across executor (e.g. a process pool).
+        """
+        keys = [qr_key(item) for item in data]
+        existing = {
+            doc["_id"] async for doc in self.files.find({"_id": {"$in": keys}}, {"_id": 1})
+        }
+        missing = list({key: item for key, item in zip(keys, data) if key not in existing}.items())
+        if not missing:
+            return keys
+
+        loop = asyncio.get_running_loop()
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        rendered = await asyncio.gather(*(
+            loop.run_in_executor(executor or self.executor, render_qr_batch, [item for _, item in batch])
+            for batch in batches
+        ))
+
+        async def upload(key: str, png: bytes) -> None:
+            try:
+                await self.bucket.upload_from_stream_with_id(
+                    key, f"{key}.png", png, metadata={"content_type": "image/png"}
+                )
+            except FileExists:
+                pass
+
+        await asyncio.gather(*(
+            upload(key, png)
+            for batch, pngs in zip(batches, rendered)
+            for (key, _), png in zip(batch, pngs)
+        ))
+        return keys
+
+    async def load(self, key: str) -> Optional[bytes]:
+        """Return PNG bytes for key, or None if missing"""
+        try:
+            stream = await self.bucket.open_download_stream(key)
+        except NoFile:
+            return None
+        return await stream.read()
+
+    async def delete(self, key: Optional[str]) -> None:
+        """Remove a stored image (e.g. after its activation code was replaced)"""
+        if not key:
+            return
+        try:
+            await self.bucket.delete(key)
+        except NoFile:
+            pass
@@ -0,0 +1,255 @@
+"""
+Reconciliation Service for eSIM Myanmar Platform
+Finds payments left pending by a missed webhook, asks their gateway for the
+final status and applies it through PaymentService.process_callback, the
+same idempotent path the webhook uses. Every run writes a report.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Callable, Any
+import asyncio
+import logging
+import uuid
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from services.lease import MongoLease
+
+logger = logging.getLogger(__name__)
+
+RECONCILIATION_LEASE_ID = "lease:reconciliation"
+MAX_REPORTED_ERRORS = 100
+
+# Gateway status vocabulary -> transaction status
+GATEWAY_STATUSES = {
+    "completed": "completed",
+    "success": "completed",
+    "succeeded": "completed",
+    "paid": "completed",
+    "failed": "failed",
+    "declined": "failed",
+    "cancelled": "cancelled",
+    "canceled": "cancelled",
+    "expired": "expired",
+}
+
+PENDING_FIELDS = {
+    "_id": 0,
+    "transaction_id": 1,
+    "payment_method": 1,
+    "gateway_transaction_id": 1,
+    "created_at": 1,
+}
+
+
+class GatewayLimiter:
+    """Caps concurrent calls to one gateway and spaces them to a request rate"""
+
+    def __init__(self, concurrency: int = 4, rate_per_second: float = 5.0):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self._interval:
+            now = asyncio.get_running_loop().time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._semaphore.release()
+
+
+class ReconciliationService:
+    """Periodic gateway reconciliation of stale pending payments"""
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        payment_service,
+        stale_after_seconds: float = 900,
+        abandon_after_hours: float = 24,
+        promo_hold_minutes: float = 30,
+        page_size: int = 200,
+        gateway_concurrency: Optional[Dict[str, int]] = None,
+        gateway_rate_per_second: Optional[Dict[str, float]] = None,
+        default_concurrency: int = 4,
+        default_rate_per_second: float = 5.0,
+        interval_seconds: float = 0,
+        clock: Callable[[], datetime] = datetime.utcnow
+    ):
+        self.transactions = db.transactions
+        self.reports = db.reconciliation_reports
+        self.payment_service = payment_service
+        self.stale_after = timedelta(seconds=stale_after_seconds)
+        self.abandon_after = timedelta(hours=abandon_after_hours)
+        # Promo uses of payments pending this long go back to the pool
+        self.promo_hold = timedelta(minutes=promo_hold_minutes)
+        self.page_size = page_size
+        self.interval_seconds = interval_seconds
+        self._clock = clock
+        self.gateway_concurrency = gateway_concurrency or {}
+        self.gateway_rate_per_second = gateway_rate_per_second or {}
+        self.default_concurrency = default_concurrency
+        self.default_rate_per_second = default_rate_per_second
+        self._limiters: Dict[str, GatewayLimiter] = {}
+        self.lease = MongoLease(db.app_meta, RECONCILIATION_LEASE_ID, lease_seconds=max(interval_seconds, 60) * 3, clock=clock)
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.runs = 0
+        self.resolved = 0
+
+    def _limiter(self, gateway_name: str) -> GatewayLimiter:
+        limiter = self._limiters.get(gateway_name)
+        if limiter is None:
+            limiter = self._limiters[gateway_name] = GatewayLimiter(
+                self.gateway_concurrency.get(gateway_name, self.default_concurrency),
+                self.gateway_rate_per_second.get(gateway_name, self.default_rate_per_second),
+            )
+        return limiter
+
+    async def _pending_pages(self, cutoff: datetime):
+        """Keyset-paginate stale pending transactions in (status, created_at) index order"""
+        query: Dict[str, Any] = {"status": "pending", "created_at": {"$lte": cutoff}}
+        while True:
+            page = await self.transactions.find(query, PENDING_FIELDS).sort(
+                [("created_at", 1), ("transaction_id", 1)]
+            ).limit(self.page_size).to_list(length=None)
+            if not page:
+                return
+            yield page
+            if len(page) < self.page_size:
+                return
+            last = page[-1]
+            query = {
+                "status": "pending",
+                "created_at": {"$lte": cutoff},
+                "$or": [
+                    {"created_at": {"$gt": last["created_at"]}},
+                    {"created_at": last["created_at"], "transaction_id": {"$gt": last["transaction_id"]}},
+                ],
+            }
+
+    async def _reconcile_one(self, transaction: dict, now: datetime) -> str:
+        """Query the gateway and apply its answer. Returns the outcome for the report."""
+        gateway_name = transaction.get("payment_method")
+        gateway = self.payment_service.gateways.get(gateway_name)
+        gateway_transaction_id = transaction.get("gateway_transaction_id")
+        abandoned = now - transaction["created_at"] >= self.abandon_after
+
+        if gateway is None or not gateway.supports_verification or not gateway_transaction_id:
+            # No status to ask for; only age can settle it. An expired payment
+            # can still be completed by a late successful callback.
+            if not abandoned:
+                return "skipped"
+            response = {"status": "unknown", "reason": "abandoned"}
+            status = "expired"
+        else:
+            async with self._limiter(gateway_name):
+                response = await gateway.verify_payment(gateway_transaction_id)
+
+            status = GATEWAY_STATUSES.get(str(response.get("status", "")).lower())
+            if status is None:
+                if not abandoned:
+                    return "still_pending"
+                # Never paid; a late successful callback can still complete it
+                status = "expired"
+
+        await self.payment_service.process_callback(
+            transaction_id=transaction["transaction_id"],
+            gateway_transaction_id=gateway_transaction_id,
+            status=status,
+            gateway_response={**response, "source": "reconciliation"}
+        )
+        return status
+
+    async def run(self) -> dict:
+        """Reconcile every stale pending transaction once and store the report"""
+        started_at = self._clock()
+        cutoff = started_at - self.stale_after
+        outcomes: Dict[str, int] = {}
+        per_gateway: Dict[str, Dict[str, int]] = {}
+        errors: List[dict] = []
+
+        async def reconcile(transaction: dict) -> None:
+            gateway_counts = per_gateway.setdefault(transaction.get("payment_method") or "unknown", {})
+            try:
+                outcome = await self._reconcile_one(transaction, started_at)
+            except Exception as e:
+                outcome = "error"
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"transaction_id": transaction["transaction_id"], "error": str(e)[:200]})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            gateway_counts[outcome] = gateway_counts.get(outcome, 0) + 1
+
+        promo_holds_released = await self.payment_service.release_stale_promo_holds(started_at - self.promo_hold)
+
+        checked = 0
+        async for page in self._pending_pages(cutoff):
+            # Gateways are queried concurrently; each GatewayLimiter enforces its own caps
+            await asyncio.gather(*(reconcile(transaction) for transaction in page))
+            checked += len(page)
+
+        report = {
+            "report_id": str(uuid.uuid4()),
+            "started_at": started_at,
+            "finished_at": self._clock(),
+            "cutoff": cutoff,
+            "checked": checked,
+            "promo_holds_released": promo_holds_released,
+            "outcomes": outcomes,
+            "gateways": per_gateway,
+            "errors": errors,
+        }
+        await self.reports.insert_one(report)
+        report.pop("_id", None)
+
+        self.runs += 1
+        self.resolved += sum(count for outcome, count in outcomes.items() if outcome in GATEWAY_STATUSES.values())
+        logger.info(f"Reconciliation {report['report_id']}: checked {checked}, outcomes {outcomes}")
+        return report
+
+    async def recent_reports(self, limit: int = 20) -> List[dict]:
+        """Most recent reports, newest first"""
+        return await self.reports.find({}, {"_id": 0}).sort("started_at", -1).limit(limit).to_list(length=None)
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of reconciliation metrics"""
+        return {"runs": self.runs, "resolved": self.resolved}
+
+    # ------------------ Background runs ------------------
+    async def start(self) -> None:
+        """Run periodically on whichever worker holds the lease (disabled when interval_seconds is 0)"""
+        if self._task is None and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop periodic runs"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            if self.lease.held:
+                try:
+                    await self.lease.release()
+                except Exception as e:
+                    logger.warning(f"Failed to release reconciliation lease: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.lease.acquire():
+                    await self.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reconciliation run failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
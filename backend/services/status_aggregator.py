@@ -0,0 +1,96 @@
+"""
+Status Aggregator for eSIM Myanmar Platform
+Keeps the /api/status counters in memory, refreshed in the background.
+Totals use collection metadata (estimated_document_count); the active
+profile count is an index-covered count. The snapshot is shared through
+MongoDB so only one worker recomputes it per interval.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any
+import asyncio
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+STATUS_SNAPSHOT_ID = "system_status"
+
+
+class StatusAggregator:
+    """Cached, approximate platform counters"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, refresh_interval_seconds: float = 60.0, clock=datetime.utcnow):
+        self.db = db
+        self.meta = db.app_meta
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self._clock = clock
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.computed = 0
+        self.adopted = 0
+
+    async def _compute(self) -> Dict[str, int]:
+        users, profiles, active = await asyncio.gather(
+            self.db.users.estimated_document_count(),
+            self.db.esim_profiles.estimated_document_count(),
+            self.db.esim_profiles.count_documents({"status": "active"}),
+        )
+        return {"total_users": users, "total_profiles": profiles, "active_profiles": active}
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Adopt a fresh snapshot written by another worker, or compute and publish one"""
+        now = self._clock()
+        shared = await self.meta.find_one({"_id": STATUS_SNAPSHOT_ID}, {"_id": 0})
+        if shared and shared.get("as_of") and shared["as_of"] > now - timedelta(seconds=self.refresh_interval_seconds):
+            self._snapshot = shared
+            self.adopted += 1
+            return shared
+
+        snapshot = {"metrics": await self._compute(), "as_of": now}
+        await self.meta.replace_one({"_id": STATUS_SNAPSHOT_ID}, snapshot, upsert=True)
+        self._snapshot = snapshot
+        self.computed += 1
+        return snapshot
+
+    async def snapshot(self) -> Dict[str, Any]:
+        """Cached counters with their age; computed on first use if the refresher has not run yet"""
+        snapshot = self._snapshot or await self.refresh()
+        return {
+            "metrics": snapshot["metrics"],
+            "as_of": snapshot["as_of"],
+            "stale_seconds": round((self._clock() - snapshot["as_of"]).total_seconds(), 1),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of aggregator metrics"""
+        return {"computed": self.computed, "adopted": self.adopted}
+
+    # ------------------ Background refresh ------------------
+    async def start(self) -> None:
+        """Start refreshing the counters periodically"""
+        if self._refresher is None and self.refresh_interval_seconds > 0:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stop the refresh task"""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Status counter refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval_seconds)
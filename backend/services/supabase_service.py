@@ -8,7 +8,10 @@ import os
 import logging
 from typing import Optional, Dict, Any, List
 from datetime import datetime
-import httpx
+
+from services.bulk_writer import BulkWriter
+from services.http_client import OutboundHTTP, get_http_client
+from utils.serialization import dumps
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +23,16 @@ class SupabaseService:
         self,
         url: Optional[str] = None,
         anon_key: Optional[str] = None,
-        service_role_key: Optional[str] = None
+        service_role_key: Optional[str] = None,
+        http: Optional[OutboundHTTP] = None,
+        writer: Optional[BulkWriter] = None
     ):
         self.url = url or os.getenv("SUPABASE_URL", "https://ksctoosqlpemoptcaxdr.supabase.co")
         self.anon_key = anon_key or os.getenv("SUPABASE_ANON_KEY")
         self.service_role_key = service_role_key or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
         self.rest_url = f"{self.url}/rest/v1"
+        self.http = http  # Defaults to the shared outbound client
+        self.writer = writer  # Buffers append-only rows into bulk inserts when set
         
         if not self.anon_key:
             logger.warning("SUPABASE_ANON_KEY not set")
@@ -53,28 +60,65 @@ class SupabaseService:
         headers = self._get_headers(use_service_role)
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    json=data,
-                    params=params,
-                    timeout=30.0
-                )
-                
-                if response.status_code >= 400:
-                    logger.error(f"Supabase error: {response.status_code} - {response.text}")
-                    return None
-                
-                if response.text:
-                    return response.json()
+            response = await (self.http or get_http_client()).request(
+                method,
+                url,
+                upstream="supabase",
+                headers=headers,
+                json=data,
+                params=params,
+                timeout=30.0
+            )
+            
+            if response.status_code >= 400:
+                logger.error(f"Supabase error: {response.status_code} - {response.text}")
                 return None
-                
+            
+            if response.text:
+                return response.json()
+            return None
+            
         except Exception as e:
             logger.error(f"Supabase request failed: {e}")
             return None
     
+    # Bulk operations
+    async def bulk_insert(self, table: str, rows: List[Dict[str, Any]]) -> bool:
+        """Insert rows with a single PostgREST request. Returns True on success."""
+        if not rows:
+            return True
+        
+        headers = self._get_headers(use_service_role=True)
+        headers["Prefer"] = "return=minimal"
+        # PostgREST requires uniform keys across rows unless the columns are listed
+        columns = sorted({key for row in rows for key in row})
+        
+        try:
+            response = await (self.http or get_http_client()).request(
+                "POST",
+                f"{self.rest_url}/{table}",
+                upstream="supabase",
+                headers=headers,
+                params={"columns": ",".join(columns)},
+                content=dumps(rows),
+                timeout=30.0
+            )
+        except Exception as e:
+            logger.error(f"Supabase bulk insert into {table} failed: {e}")
+            return False
+        
+        if response.status_code >= 400:
+            logger.error(f"Supabase bulk insert error: {response.status_code} - {response.text}")
+            return False
+        return True
+    
+    async def append(self, table: str, row: Dict[str, Any]) -> None:
+        """Queue an append-only row on the bulk writer (inserted immediately without one)"""
+        if self.writer is not None:
+            await self.writer.write(table, row)
+        else:
+            await self.bulk_insert(table, [row])
+    
     # User operations
     async def create_user(self, user_data: Dict[str, Any]) -> Optional[Dict]:
         """Create user in Supabase"""
@@ -126,6 +170,10 @@ class SupabaseService:
         """Create transaction record"""
         return await self._request("POST", "transactions", data=transaction_data, use_service_role=True)
     
+    async def create_transactions(self, transactions: List[Dict[str, Any]]) -> bool:
+        """Create transaction records in one request"""
+        return await self.bulk_insert("transactions", transactions)
+    
     async def get_user_transactions(self, user_id: str, limit: int = 50) -> List[Dict]:
         """Get user transactions"""
         result = await self._request(
@@ -174,6 +222,10 @@ class SupabaseService:
         """Create support ticket"""
         return await self._request("POST", "support_tickets", data=ticket_data, use_service_role=True)
     
+    async def create_support_tickets(self, tickets: List[Dict[str, Any]]) -> bool:
+        """Create support tickets in one request"""
+        return await self.bulk_insert("support_tickets", tickets)
+    
     async def get_user_tickets(self, user_id: str) -> List[Dict]:
         """Get user support tickets"""
         result = await self._request(
@@ -217,26 +269,26 @@ class SupabaseService:
         
         return promo
     
-    async def increment_promo_usage(self, promo_id: str) -> Optional[Dict]:
-        """Increment promo code usage count"""
-        # Get current count
+    async def redeem_promo_code(self, code: str) -> Optional[Dict]:
+        """
+        Atomically consume one use of a promo code via the redeem_promo_code RPC
+        Returns the updated promo, or None if it is invalid, expired or used up
+        """
         result = await self._request(
-            "GET", "promo_codes",
-            params={"id": f"eq.{promo_id}", "limit": "1"},
+            "POST", "rpc/redeem_promo_code",
+            data={"p_code": code},
             use_service_role=True
         )
-        
-        if not result:
-            return None
-        
-        current_count = result[0].get("used_count", 0)
-        
-        return await self._request(
-            "PATCH", "promo_codes",
-            data={"used_count": current_count + 1},
-            params={"id": f"eq.{promo_id}"},
+        return result[0] if result else None
+    
+    async def increment_promo_usage(self, promo_id: str) -> Optional[Dict]:
+        """Increment promo code usage count (atomic, respects usage_limit)"""
+        result = await self._request(
+            "POST", "rpc/increment_promo_usage",
+            data={"p_promo_id": promo_id},
             use_service_role=True
         )
+        return result[0] if result else None
     
     # Audit logging
     async def log_audit(
@@ -250,21 +302,23 @@ class SupabaseService:
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None
     ) -> Optional[Dict]:
-        """Create audit log entry"""
-        return await self._request(
-            "POST", "audit_logs",
-            data={
-                "user_id": user_id,
-                "action": action,
-                "resource_type": resource_type,
-                "resource_id": resource_id,
-                "old_values": old_values,
-                "new_values": new_values,
-                "ip_address": ip_address,
-                "user_agent": user_agent
-            },
-            use_service_role=True
-        )
+        """Create audit log entry (buffered into bulk inserts when a writer is set)"""
+        entry = {
+            "user_id": user_id,
+            "action": action,
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+            "old_values": old_values,
+            "new_values": new_values,
+            "ip_address": ip_address,
+            "user_agent": user_agent
+        }
+        
+        if self.writer is not None:
+            await self.writer.write("audit_logs", entry)
+            return entry
+        
+        return await self._request("POST", "audit_logs", data=entry, use_service_role=True)
     
     # eSIM Transfer operations
     async def create_transfer(self, transfer_data: Dict[str, Any]) -> Optional[Dict]:
@@ -7,11 +7,12 @@ import hmac
 import hashlib
 import base64
 import uuid
-import httpx
 from datetime import datetime
 from typing import Optional, Dict, Any
 from pydantic import BaseModel
 
+from services.http_client import get_http_client
+
 
 class TransacteaseConfig:
     """Transactease Payment Gateway Configuration"""
@@ -219,13 +220,16 @@ class TransacteaseService:
             "Content-Type": "application/json"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/api/transaction/status",
-                json=request_body,
-                headers=headers
-            )
-            return response.json()
+        # A status inquiry has no side effects, so it is safe to retry
+        response = await get_http_client().request(
+            "POST",
+            f"{self.base_url}/api/transaction/status",
+            upstream="transactease",
+            retry=True,
+            json=request_body,
+            headers=headers
+        )
+        return response.json()
 
 
 # Response codes mapping
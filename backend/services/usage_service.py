@@ -0,0 +1,441 @@
+"""
+Usage Metering Service for eSIM Myanmar Platform
+Ingests CDR-style usage records (HTTP batches or dropped CSV/NDJSON files),
+aggregates them in memory per ICCID and flushes them as bulk $inc updates to
+profiles and to hourly/daily rollups
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import csv
+import glob
+import hashlib
+import itertools
+import json
+import logging
+import os
+import socket
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_GB = 1024 ** 3
+MAX_RECORD_BYTES = 10 ** 13  # Larger single records are rejected as corrupt
+MAX_REPORTED_ERRORS = 100
+
+GRANULARITIES = ("hour", "day")
+
+
+def parse_timestamp(value: Any) -> datetime:
+    """ISO-8601 string or epoch seconds to a naive UTC datetime"""
+    if isinstance(value, datetime):
+        ts = value
+    elif isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        ts = datetime.fromtimestamp(float(value), tz=timezone.utc)
+    elif isinstance(value, str):
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    else:
+        raise ValueError("Missing timestamp")
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def parse_record(record: Dict[str, Any]) -> Tuple[str, int, datetime]:
+    """Validate a usage record. Returns (iccid, bytes, timestamp); raises ValueError."""
+    iccid = str(record.get("iccid") or "").strip()
+    if not iccid.isdigit() or not 18 <= len(iccid) <= 22:
+        raise ValueError("Invalid iccid")
+
+    if record.get("bytes") not in (None, ""):
+        total = int(record["bytes"])
+    else:
+        total = int(record.get("bytes_up") or 0) + int(record.get("bytes_down") or 0)
+    if not 0 <= total <= MAX_RECORD_BYTES:
+        raise ValueError("Invalid byte count")
+
+    return iccid, total, parse_timestamp(record.get("timestamp"))
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class _Pending:
+    """Usage aggregated for one ICCID since the last flush"""
+
+    __slots__ = ("bytes", "records", "last_usage_at", "buckets")
+
+    def __init__(self):
+        self.bytes = 0
+        self.records = 0
+        self.last_usage_at: Optional[datetime] = None
+        self.buckets: Dict[Tuple[str, datetime], List[int]] = {}
+
+    def add(self, total: int, ts: datetime, records: int = 1) -> None:
+        self.bytes += total
+        self.records += records
+        if self.last_usage_at is None or ts > self.last_usage_at:
+            self.last_usage_at = ts
+        for granularity in GRANULARITIES:
+            bucket = self.buckets.setdefault((granularity, bucket_start(ts, granularity)), [0, 0])
+            bucket[0] += total
+            bucket[1] += records
+
+    def merge(self, other: "_Pending") -> None:
+        self.bytes += other.bytes
+        self.records += other.records
+        if other.last_usage_at and (self.last_usage_at is None or other.last_usage_at > self.last_usage_at):
+            self.last_usage_at = other.last_usage_at
+        for key, (total, records) in other.buckets.items():
+            bucket = self.buckets.setdefault(key, [0, 0])
+            bucket[0] += total
+            bucket[1] += records
+
+
+class UsageIngestor:
+    """In-memory usage aggregation with periodic bulk flushes"""
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        flush_interval_seconds: float = 5.0,
+        max_pending_profiles: int = 50_000,
+        batch_claim_seconds: float = 120.0
+    ):
+        self.profiles = db.esim_profiles
+        self.rollups = db.usage_rollups
+        self.batches = db.usage_batches
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending_profiles = max_pending_profiles
+        # A batch still "pending" after this long belonged to a worker that died before flushing
+        self.batch_claim_seconds = max(batch_claim_seconds, flush_interval_seconds * 10)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._pending: Dict[str, _Pending] = {}
+        self._pending_batches: List[str] = []
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.accepted = 0
+        self.rejected = 0
+        self.duplicate_batches = 0
+        self.flushes = 0
+        self.unmatched = 0
+
+    async def ingest(self, records: Iterable[Dict[str, Any]], batch_id: Optional[str] = None) -> dict:
+        """
+        Validate and aggregate a batch of usage records
+        A batch_id makes retries of the same batch idempotent
+        """
+        if batch_id:
+            if batch_id in self._pending_batches or not await self._claim_batch(batch_id):
+                self.duplicate_batches += 1
+                return {"accepted": 0, "rejected": 0, "duplicate": True, "errors": []}
+            self._pending_batches.append(batch_id)
+
+        accepted, errors = 0, []
+        for index, record in enumerate(records):
+            try:
+                iccid, total, ts = parse_record(record)
+            except (ValueError, TypeError, AttributeError) as e:
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"index": index, "error": str(e)})
+                self.rejected += 1
+                continue
+            pending = self._pending.get(iccid)
+            if pending is None:
+                pending = self._pending[iccid] = _Pending()
+            pending.add(total, ts)
+            accepted += 1
+
+        self.accepted += accepted
+        if len(self._pending) >= self.max_pending_profiles:
+            await self.flush()
+        return {"accepted": accepted, "rejected": len(errors), "duplicate": False, "errors": errors}
+
+    async def _claim_batch(self, batch_id: str) -> bool:
+        """Claim a batch ID; False if it was already flushed or is held by a live worker"""
+        now = datetime.utcnow()
+        try:
+            await self.batches.insert_one(
+                {"_id": batch_id, "state": "pending", "worker": self.worker_id, "received_at": now}
+            )
+            return True
+        except DuplicateKeyError:
+            # Take over a batch whose worker never flushed it
+            result = await self.batches.update_one(
+                {
+                    "_id": batch_id,
+                    "state": "pending",
+                    "received_at": {"$lt": now - timedelta(seconds=self.batch_claim_seconds)},
+                },
+                {"$set": {"worker": self.worker_id, "received_at": now}}
+            )
+            return result.modified_count == 1
+
+    async def flush(self) -> int:
+        """Write aggregated usage to profiles and rollups. Returns the number of ICCIDs flushed."""
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            batch_ids, self._pending_batches = self._pending_batches, []
+            if not pending:
+                await self._mark_flushed(batch_ids)
+                return 0
+
+            profile_ops, rollup_ops, rollup_keys = [], [], []
+            for iccid, usage in pending.items():
+                profile_ops.append(UpdateOne(
+                    {"iccid": iccid},
+                    {
+                        "$inc": {"data_used_bytes": usage.bytes, "data_used_gb": usage.bytes / BYTES_PER_GB},
+                        "$max": {"last_usage_at": usage.last_usage_at},
+                    }
+                ))
+                for (granularity, bucket), (total, records) in usage.buckets.items():
+                    rollup_keys.append((iccid, granularity, bucket))
+                    rollup_ops.append(UpdateOne(
+                        {"_id": f"{iccid}:{granularity}:{bucket:%Y%m%d%H}"},
+                        {
+                            "$inc": {"bytes": total, "records": records},
+                            "$setOnInsert": {"iccid": iccid, "granularity": granularity, "bucket": bucket},
+                        },
+                        upsert=True
+                    ))
+
+            # Only operations that did not apply are kept for the next flush, so a
+            # partially failed bulk write is not counted twice
+            failed_rollups = await self._bulk_write(self.rollups, rollup_ops)
+            failed_profiles = await self._bulk_write(self.profiles, profile_ops)
+
+            if failed_rollups or failed_profiles:
+                iccids = list(pending)
+                for index in failed_profiles:
+                    usage = pending[iccids[index]]
+                    retry = self._pending.setdefault(iccids[index], _Pending())
+                    retry.bytes += usage.bytes
+                    retry.records += usage.records
+                    retry.last_usage_at = max(filter(None, (retry.last_usage_at, usage.last_usage_at)))
+                for index in failed_rollups:
+                    iccid, granularity, bucket = rollup_keys[index]
+                    total, records = pending[iccid].buckets[(granularity, bucket)]
+                    retry = self._pending.setdefault(iccid, _Pending())
+                    counts = retry.buckets.setdefault((granularity, bucket), [0, 0])
+                    counts[0] += total
+                    counts[1] += records
+                self._pending_batches.extend(batch_ids)
+                logger.error(
+                    f"Usage flush incomplete: {len(failed_profiles)} profile and "
+                    f"{len(failed_rollups)} rollup updates kept for retry"
+                )
+                raise RuntimeError("Usage flush incomplete")
+
+            await self._mark_flushed(batch_ids)
+            self.flushes += 1
+            return len(pending)
+
+    async def _bulk_write(self, collection, ops: List[UpdateOne]) -> List[int]:
+        """Run an unordered bulk write. Returns the indexes of operations that did not apply."""
+        if not ops:
+            return []
+        try:
+            result = await collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            return [err["index"] for err in e.details.get("writeErrors", [])]
+        except Exception as e:
+            logger.error(f"Bulk write to {collection.name} failed: {e}")
+            return list(range(len(ops)))
+
+        if collection is self.profiles:
+            unmatched = len(ops) - result.matched_count
+            if unmatched:
+                self.unmatched += unmatched
+                logger.warning(f"Usage for {unmatched} unknown ICCIDs recorded in rollups only")
+        return []
+
+    async def _mark_flushed(self, batch_ids: List[str]) -> None:
+        if batch_ids:
+            await self.batches.update_many({"_id": {"$in": batch_ids}}, {"$set": {"state": "flushed"}})
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of ingestion metrics"""
+        return {
+            "pending_profiles": len(self._pending),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "duplicate_batches": self.duplicate_batches,
+            "flushes": self.flushes,
+            "unmatched": self.unmatched,
+        }
+
+    # ------------------ Background flushing ------------------
+    async def start(self) -> None:
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop flushing and write everything still aggregated"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Final usage flush failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # Logged by flush; retried next interval
+
+
+def read_usage_file(path: str, name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stream records from a CSV (with header) or NDJSON usage file (format from name)"""
+    if (name or path).endswith(".csv"):
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
+        return
+
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield {}  # Counted as a rejected record
+
+
+def _take(records: Iterator[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+    return list(itertools.islice(records, count))
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UsageFileImporter:
+    """
+    Imports usage files dropped into a directory
+    A file is claimed by renaming it, and only moved to processed/ after its
+    usage has been flushed, so a crash leaves it to be imported again
+    """
+
+    PATTERNS = ("*.csv", "*.ndjson", "*.jsonl")
+
+    def __init__(
+        self,
+        ingestor: UsageIngestor,
+        drop_dir: str,
+        poll_interval_seconds: float = 10.0,
+        batch_size: int = 5000
+    ):
+        self.ingestor = ingestor
+        self.drop_dir = drop_dir
+        self.poll_interval_seconds = poll_interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.files_imported = 0
+
+    def _claim(self) -> List[str]:
+        claimed = []
+        for pattern in self.PATTERNS:
+            for path in sorted(glob.glob(os.path.join(self.drop_dir, pattern))):
+                target = f"{path}.{os.getpid()}.processing"
+                try:
+                    os.rename(path, target)
+                except OSError:
+                    continue  # Claimed by another worker
+                claimed.append(target)
+        return claimed
+
+    async def import_file(self, path: str) -> dict:
+        """Ingest one claimed file and move it to processed/"""
+        name = os.path.basename(path).rsplit(".", 2)[0]
+        digest = (await asyncio.to_thread(file_digest, path))[:32]
+        records = read_usage_file(path, name)
+
+        totals = {"accepted": 0, "rejected": 0}
+        batch_index = 0
+        while True:
+            batch = await asyncio.to_thread(_take, records, self.batch_size)
+            if not batch:
+                break
+            # Batches are keyed by file content and position, so a re-import after a
+            # crash skips batches that were already flushed, while a new file that
+            # reuses an old name (e.g. a daily usage.csv) is imported in full
+            result = await self.ingestor.ingest(batch, batch_id=f"file:{digest}:{batch_index}")
+            totals["accepted"] += result["accepted"]
+            totals["rejected"] += result["rejected"]
+            batch_index += 1
+
+        await self.ingestor.flush()
+        processed_dir = os.path.join(self.drop_dir, "processed")
+        os.makedirs(processed_dir, exist_ok=True)
+        root, ext = os.path.splitext(name)
+        os.replace(path, os.path.join(processed_dir, f"{root}.{digest[:12]}{ext}"))
+        self.files_imported += 1
+        logger.info(f"Imported usage file {name}: {totals['accepted']} accepted, {totals['rejected']} rejected")
+        return totals
+
+    async def scan(self) -> int:
+        """Import every file currently in the drop directory"""
+        paths = await asyncio.to_thread(self._claim)
+        for path in paths:
+            try:
+                await self.import_file(path)
+            except Exception as e:
+                logger.error(f"Usage import of {path} failed: {e}")
+                # Release the claim so the file is retried
+                os.replace(path, path.rsplit(".", 2)[0])
+        return len(paths)
+
+    async def start(self) -> None:
+        """Start watching the drop directory"""
+        os.makedirs(self.drop_dir, exist_ok=True)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop watching"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.scan()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Usage drop directory scan failed: {e}")
+            await asyncio.sleep(self.poll_interval_seconds)
@@ -0,0 +1,181 @@
+"""
+Authenticated User Cache for eSIM Myanmar Platform
+Per-process TTL/LRU cache of projected user records used by get_current_user,
+with optional cross-worker invalidation over Redis pub/sub
+"""
+
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Fields served to route handlers; secrets (password, 2FA secrets) are never cached
+USER_CACHE_PROJECTION = {
+    "_id": 0,
+    "user_id": 1,
+    "email": 1,
+    "full_name": 1,
+    "phone_number": 1,
+    "country": 1,
+    "role": 1,
+    "status": 1,
+    "two_factor_enabled": 1,
+    "created_at": 1,
+}
+
+INVALIDATION_CHANNEL = "esim:user-cache:invalidate"
+
+
+class UserCache:
+    """TTL/LRU cache of user records keyed by email, with a user_id index"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 60.0,
+        max_entries: int = 10_000,
+        redis=None,
+        clock=time.monotonic
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.redis = redis
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._emails_by_user_id: Dict[str, str] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+        # Bumped on every invalidation so a lookup that raced with one is not cached
+        self.generation = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, email: str) -> Optional[dict]:
+        """Return cached user for email, or None on miss/expiry"""
+        entry = self._entries.get(email)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at <= self._clock():
+            del self._entries[email]
+            self._emails_by_user_id.pop(user.get("user_id"), None)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(email)
+        self.hits += 1
+        return user
+
+    def put(self, user: dict, generation: Optional[int] = None) -> None:
+        """Cache a projected user record (skipped if an invalidation happened since generation)"""
+        email = user.get("email")
+        if not email:
+            return
+        if generation is not None and generation != self.generation:
+            return
+
+        self._entries[email] = (self._clock() + self.ttl_seconds, user)
+        self._entries.move_to_end(email)
+        if user.get("user_id"):
+            self._emails_by_user_id[user["user_id"]] = email
+
+        while len(self._entries) > self.max_entries:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._emails_by_user_id.pop(evicted.get("user_id"), None)
+            self.evictions += 1
+
+    def _drop(self, user_id: Optional[str] = None, email: Optional[str] = None) -> None:
+        self.generation += 1
+        if user_id and not email:
+            email = self._emails_by_user_id.get(user_id)
+        if not email:
+            return
+        entry = self._entries.pop(email, None)
+        if entry is not None:
+            self._emails_by_user_id.pop(entry[1].get("user_id"), None)
+
+    async def invalidate(self, user_id: Optional[str] = None, email: Optional[str] = None) -> None:
+        """Drop a user locally and broadcast the invalidation to other workers"""
+        self.invalidations += 1
+        self._drop(user_id=user_id, email=email)
+
+        if self.redis is not None:
+            try:
+                await self.redis.publish(
+                    INVALIDATION_CHANNEL,
+                    json.dumps({"user_id": user_id, "email": email})
+                )
+            except Exception as e:
+                logger.warning(f"User cache invalidation broadcast failed: {e}")
+
+    def clear(self) -> None:
+        """Drop all cached users"""
+        self.generation += 1
+        self._entries.clear()
+        self._emails_by_user_id.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of cache metrics"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    # ------------------ Cross-worker invalidation ------------------
+    async def start(self) -> None:
+        """Start listening for invalidations from other workers (no-op without Redis)"""
+        if self.redis is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop the invalidation listener"""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        backoff = 1.0
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything published while we were disconnected is lost, so start clean
+                self.clear()
+                backoff = 1.0
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        data = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    self._drop(user_id=data.get("user_id"), email=data.get("email"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"User cache invalidation listener error: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
@@ -0,0 +1,155 @@
+"""
+Verification Order Store for eSIM Myanmar Platform
+Persists Nexora AI order verifications in MongoDB, so every worker sees the
+same order, with a TTL index that drops abandoned orders. Orders are stored
+as compact orjson blobs; a bounded LRU keeps recently read blobs in process
+and a versioned read only transfers the blob again when it has changed.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+import orjson
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+from services.nexora_ai_service import (
+    OrderVerification,
+    VerificationResult,
+    VerificationStatus,
+    VerificationType,
+)
+
+MAX_UPDATE_ATTEMPTS = 5
+
+
+class OrderUpdateConflict(Exception):
+    """Raised when an order keeps changing underneath an update"""
+    pass
+
+
+def encode_order(order: OrderVerification) -> bytes:
+    """Serialize an order (enums as their values)"""
+    return orjson.dumps(order)
+
+
+def decode_order(payload: bytes) -> OrderVerification:
+    """Rebuild an order serialized by encode_order"""
+    data = orjson.loads(payload)
+    verifications = []
+    for item in data.pop("verifications"):
+        item["verification_type"] = VerificationType(item["verification_type"])
+        item["status"] = VerificationStatus(item["status"])
+        verifications.append(VerificationResult(**item))
+    data["overall_status"] = VerificationStatus(data["overall_status"])
+    return OrderVerification(verifications=verifications, **data)
+
+
+class VerificationOrderStore:
+    """MongoDB-backed order verifications with a read-through LRU of serialized orders"""
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        ttl_hours: float = 72,
+        cache_size: int = 2048,
+        clock: Callable[[], datetime] = datetime.utcnow
+    ):
+        self.orders = db.verification_orders
+        self.ttl = timedelta(hours=ttl_hours)
+        self.cache_size = cache_size
+        self._clock = clock
+        # order_id -> (version, payload)
+        self._cache: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+
+    def _remember(self, order_id: str, version: int, payload: bytes) -> None:
+        self._cache[order_id] = (version, payload)
+        self._cache.move_to_end(order_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _fields(self, order: OrderVerification, version: int, payload: bytes) -> dict:
+        return {
+            "user_id": order.user_id,
+            "overall_status": order.overall_status.value,
+            "version": version,
+            "payload": Binary(payload),
+            "updated_at": self._clock(),
+            "expires_at": self._clock() + self.ttl,
+        }
+
+    async def create(self, order: OrderVerification) -> None:
+        """Store a new order (a retried create of the same order_id is ignored)"""
+        payload = encode_order(order)
+        try:
+            await self.orders.insert_one({"_id": order.order_id, **self._fields(order, 1, payload)})
+        except DuplicateKeyError:
+            return
+        self._remember(order.order_id, 1, payload)
+
+    async def _load(self, order_id: str) -> Optional[Tuple[int, bytes]]:
+        """Current (version, payload), read from MongoDB on every call"""
+        cached = self._cache.get(order_id)
+        projection: Dict[str, object] = {"_id": 0, "version": 1}
+        if cached is None:
+            projection["payload"] = 1
+        else:
+            # Only ship the payload when another write has moved the version on
+            projection["payload"] = {"$cond": [{"$eq": ["$version", cached[0]]}, "$$REMOVE", "$payload"]}
+
+        doc = await self.orders.find_one({"_id": order_id, "expires_at": {"$gt": self._clock()}}, projection)
+        if doc is None:
+            self._cache.pop(order_id, None)
+            return None
+
+        if "payload" not in doc:
+            self._cache.move_to_end(order_id)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        payload = bytes(doc["payload"])
+        self._remember(order_id, doc["version"], payload)
+        return doc["version"], payload
+
+    async def get(self, order_id: str) -> Optional[OrderVerification]:
+        """Latest stored state of an order, or None if unknown or expired"""
+        loaded = await self._load(order_id)
+        return decode_order(loaded[1]) if loaded else None
+
+    async def update(self, order_id: str, mutate: Callable[[OrderVerification], None]) -> Optional[OrderVerification]:
+        """
+        Apply mutate to the latest state and save it, retrying on concurrent
+        writes from other requests or workers. Returns None if the order is gone.
+        """
+        for _ in range(MAX_UPDATE_ATTEMPTS):
+            loaded = await self._load(order_id)
+            if loaded is None:
+                return None
+            version, payload = loaded
+            order = decode_order(payload)
+            mutate(order)
+            order.updated_at = self._clock().isoformat()
+
+            payload = encode_order(order)
+            result = await self.orders.update_one(
+                {"_id": order_id, "version": version},
+                {"$set": self._fields(order, version + 1, payload)}
+            )
+            if result.matched_count:
+                self._remember(order_id, version + 1, payload)
+                return order
+            self.conflicts += 1
+
+        raise OrderUpdateConflict(f"Order {order_id} is being updated concurrently, try again")
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of store metrics"""
+        return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses, "conflicts": self.conflicts}
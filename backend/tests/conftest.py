@@ -0,0 +1,28 @@
+"""
+Shared fixtures for eSIM Myanmar backend tests
+"""
+
+import os
+import uuid
+
+import pytest
+import pytest_asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+@pytest_asyncio.fixture
+async def mongo_db():
+    """Throwaway database on MONGO_URL; skips the test when MongoDB is unreachable"""
+    url = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(url, serverSelectionTimeoutMS=500)
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        client.close()
+        pytest.skip(f"MongoDB not available at {url}")
+
+    name = f"esim_test_{uuid.uuid4().hex[:8]}"
+    yield client[name]
+
+    await client.drop_database(name)
+    client.close()
@@ -0,0 +1,71 @@
+"""
+Local fakes for payment tests
+An in-memory plan catalog and the subset of the transactions collection used
+by PaymentService callbacks and promo settlement.
+"""
+
+from types import SimpleNamespace
+
+PLAN = {"plan_id": "plan-5gb", "name": "5GB", "price": 10000, "data_gb": 5.0}
+
+
+class FakeCatalog:
+    """PlanCatalog serving PLAN only"""
+
+    def get(self, plan_id):
+        return PLAN if plan_id == PLAN["plan_id"] else None
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        value = doc.get(key)
+        if isinstance(condition, dict):
+            if "$lte" in condition and not value <= condition["$lte"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def limit(self, count):
+        return FakeCursor(self.docs[:count])
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeTransactions:
+    """Transactions keyed by transaction_id; records every callback update"""
+
+    def __init__(self, *docs):
+        self.docs = {doc["transaction_id"]: dict(doc) for doc in docs}
+        self.updates = []
+
+    async def insert_one(self, doc):
+        self.docs[doc["transaction_id"]] = dict(doc)
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs.values() if _matches(doc, query)])
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["transaction_id"])
+        return dict(doc) if doc else None
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        self.updates.append(update)
+        doc = self.docs[query["transaction_id"]]
+        if doc["status"] == "completed":
+            return None
+        doc.update(update["$set"])
+        return dict(doc)
+
+    async def update_one(self, query, update):
+        doc = self.docs[query["transaction_id"]]
+        if not _matches(doc, query):
+            return SimpleNamespace(modified_count=0)
+        doc.update(update["$set"])
+        return SimpleNamespace(modified_count=1)
@@ -0,0 +1,119 @@
+"""
+Local fake Redis for tests
+Implements the subset of redis.asyncio used by the platform (strings, TTLs, pipelines)
+with a controllable clock so expiry can be tested without sleeping.
+"""
+
+import math
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self, start: float = 1_700_000_000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class FakePipeline:
+    """Queues commands and applies them in order on execute()"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        results = []
+        for name, args, kwargs in self.commands:
+            results.append(await getattr(self.redis, name)(*args, **kwargs))
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    """In-memory Redis stand-in shared by every "worker" that holds a reference"""
+
+    def __init__(self, clock=None):
+        self.clock = clock or FakeClock()
+        self.data = {}
+        self.expires = {}
+        self.closed = False
+        self.fail = False
+
+    def _check(self):
+        if self.fail:
+            raise ConnectionError("fake redis unavailable")
+
+    def _purge(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= self.clock():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def pipeline(self, transaction: bool = True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        self._check()
+        self._purge(key)
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        self._check()
+        self._purge(key)
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode()
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expires[key] = self.clock() + ex
+        elif px is not None:
+            self.expires[key] = self.clock() + px / 1000
+        return True
+
+    async def incr(self, key, amount: int = 1):
+        self._check()
+        self._purge(key)
+        value = int(self.data.get(key, b"0")) + amount
+        self.data[key] = str(value).encode()
+        return value
+
+    async def expire(self, key, seconds):
+        self._check()
+        self._purge(key)
+        if key not in self.data:
+            return False
+        self.expires[key] = self.clock() + seconds
+        return True
+
+    async def ttl(self, key):
+        self._check()
+        self._purge(key)
+        if key not in self.data:
+            return -2
+        if key not in self.expires:
+            return -1
+        return math.ceil(self.expires[key] - self.clock())
+
+    async def delete(self, *keys):
+        self._check()
+        removed = 0
+        for key in keys:
+            if self.data.pop(key, None) is not None:
+                removed += 1
+            self.expires.pop(key, None)
+        return removed
+
+    async def aclose(self):
+        self.closed = True
@@ -0,0 +1,42 @@
+"""
+Mock payment gateway for tests
+Answers verify_payment from a scripted status table, with optional latency
+and failures, and records how many calls were in flight at once.
+"""
+
+import asyncio
+
+from services.payment_service import PaymentGateway
+
+
+class MockGateway(PaymentGateway):
+    """Scriptable PaymentGateway"""
+
+    supports_verification = True
+
+    def __init__(self, statuses=None, latency: float = 0.0, failing=()):
+        self.statuses = dict(statuses or {})  # gateway_transaction_id -> status
+        self.latency = latency
+        self.failing = set(failing)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create_payment(self, amount: float, currency: str, order_id: str, **kwargs):
+        return {"gateway": "mock", "gateway_transaction_id": f"MOCK-{order_id}", "status": "pending"}
+
+    async def verify_payment(self, transaction_id: str, **kwargs):
+        self.calls.append((transaction_id, asyncio.get_running_loop().time()))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if transaction_id in self.failing:
+                raise RuntimeError("Gateway unavailable")
+            return {"status": self.statuses.get(transaction_id, "pending"), "verified": True}
+        finally:
+            self.in_flight -= 1
+
+    async def refund_payment(self, transaction_id: str, amount=None):
+        return {"status": "refunded"}
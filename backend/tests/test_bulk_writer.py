@@ -0,0 +1,157 @@
+"""
+Tests for the buffered bulk writer
+"""
+
+from datetime import datetime
+import asyncio
+
+import httpx
+import pytest
+
+from services import bulk_writer
+from services.bulk_writer import BulkWriter
+from services.http_client import OutboundHTTP
+from services.supabase_service import SupabaseService
+
+
+class FakeUpstream:
+    def __init__(self):
+        self.up = True
+        self.batches = []
+
+    async def send(self, table, rows):
+        if not self.up:
+            return False
+        self.batches.append((table, list(rows)))
+        return True
+
+
+@pytest.mark.asyncio
+async def test_flushes_by_size_and_on_stop():
+    upstream = FakeUpstream()
+    writer = BulkWriter(upstream.send, max_batch=3, flush_interval_seconds=60)
+    await writer.start()
+
+    for n in range(4):
+        await writer.write("audit_logs", {"n": n})
+    await asyncio.sleep(0.01)
+    assert [len(rows) for _, rows in upstream.batches] == [3]
+
+    await writer.stop()
+    assert [len(rows) for _, rows in upstream.batches] == [3, 1]
+    assert writer.stats()["flushed"] == 4
+
+
+@pytest.mark.asyncio
+async def test_flushes_by_time_per_table():
+    upstream = FakeUpstream()
+    writer = BulkWriter(upstream.send, max_batch=100, flush_interval_seconds=0.05)
+    await writer.start()
+
+    await writer.write("audit_logs", {"n": 1})
+    await writer.write("transactions", {"n": 2})
+    await asyncio.sleep(0.15)
+
+    assert sorted(table for table, _ in upstream.batches) == ["audit_logs", "transactions"]
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_spills_while_down_and_replays(tmp_path):
+    upstream = FakeUpstream()
+    upstream.up = False
+    writer = BulkWriter(upstream.send, max_batch=2, spill_dir=str(tmp_path))
+    await writer.start()
+    for n in range(3):
+        await writer.write("audit_logs", {"n": n})
+    await writer.stop()
+
+    assert writer.stats()["spilled"] == 3
+    assert list(tmp_path.glob("spill-*.jsonl"))
+
+    # A later run replays what was spilled
+    upstream.up = True
+    writer = BulkWriter(upstream.send, spill_dir=str(tmp_path))
+    await writer.start()
+    await writer.stop()
+
+    assert sorted(row["n"] for _, rows in upstream.batches for row in rows) == [0, 1, 2]
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_replays_spilled_rows_while_idle(tmp_path):
+    upstream = FakeUpstream()
+    upstream.up = False
+    writer = BulkWriter(upstream.send, flush_interval_seconds=0.01, spill_dir=str(tmp_path), replay_interval_seconds=0.05)
+    await writer.start()
+    await writer.write("audit_logs", {"n": 1})
+    await asyncio.sleep(0.03)
+    assert writer.stats()["spilled"] == 1
+
+    # Nothing else is written, the replay still happens once it is due
+    upstream.up = True
+    await asyncio.sleep(0.15)
+    assert writer.stats()["replayed"] == 1
+    assert not list(tmp_path.iterdir())
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_backpressure_then_spills(tmp_path):
+    writer = BulkWriter(FakeUpstream().send, max_queue=1, put_timeout_seconds=0.01, spill_dir=str(tmp_path))
+    # Not started: nothing drains the queue
+
+    await writer.write("audit_logs", {"n": 1})
+    await writer.write("audit_logs", {"n": 2})
+
+    assert writer.stats()["queued"] == 1
+    assert writer.stats()["spilled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unwritable_spill_dir_drops_rows_and_keeps_flushing(tmp_path, monkeypatch):
+    def unwritable(path, line):
+        raise PermissionError(13, "Permission denied", path)
+
+    monkeypatch.setattr(bulk_writer, "_append", unwritable)
+    upstream = FakeUpstream()
+    upstream.up = False
+    writer = BulkWriter(upstream.send, max_batch=2, flush_interval_seconds=60, spill_dir=str(tmp_path))
+    await writer.start()
+
+    for n in range(4):
+        await writer.write("audit_logs", {"n": n})
+    await asyncio.sleep(0.01)
+    assert writer.stats()["dropped"] == 4
+    assert not writer._task.done()
+
+    # The loop survived, so rows flow again once the upstream is back
+    upstream.up = True
+    for n in range(2):
+        await writer.write("audit_logs", {"n": n})
+    await asyncio.sleep(0.01)
+    assert writer.stats()["flushed"] == 2
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_supabase_bulk_insert_is_one_request():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(201)
+
+    http = OutboundHTTP(transport=httpx.MockTransport(handler))
+    supabase = SupabaseService(url="https://db.example.com", anon_key="anon", service_role_key="service", http=http)
+
+    ok = await supabase.bulk_insert("audit_logs", [
+        {"action": "login", "created_at": datetime(2025, 1, 1)},
+        {"action": "logout", "user_id": "u1"},
+    ])
+
+    assert ok and len(requests) == 1
+    assert requests[0].url.params["columns"] == "action,created_at,user_id"
+    assert requests[0].headers["Prefer"] == "return=minimal"
+    await http.aclose()
@@ -0,0 +1,88 @@
+"""
+Tests for the indexed device catalog
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from services.device_catalog import DeviceCatalog, tokenize
+from services.nexora_ai_service import NexoraAIService, VerificationStatus
+
+CORPUS_PATH = Path(__file__).parent / "data" / "device_model_corpus.tsv"
+
+
+def load_corpus():
+    cases = []
+    for line in CORPUS_PATH.read_text(encoding="utf-8").splitlines():
+        if line and not line.startswith("#"):
+            platform, model, expected = line.split("\t")
+            cases.append((platform, model, None if expected == "-" else expected))
+    return cases
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return DeviceCatalog.load()
+
+
+@pytest.mark.parametrize("platform,model,expected", load_corpus())
+def test_corpus(catalog, platform, model, expected):
+    entry = catalog.lookup(platform, model)
+    assert (entry.label if entry else None) == expected
+
+
+def test_tokenize_splits_words_and_numbers():
+    assert tokenize("Galaxy S21+ (5G)") == ("galaxy", "s", "21", "5", "g")
+
+
+def test_unknown_platform(catalog):
+    assert catalog.lookup("symbian", "Nokia N8") is None
+    assert catalog.min_version("symbian") is None
+    assert catalog.min_version("ios") == "12.1"
+
+
+def test_lookups_are_cached():
+    catalog = DeviceCatalog.load(cache_size=16)
+    for _ in range(3):
+        catalog.lookup("android", "SM-G991B")
+    info = catalog.lookup.cache_info()
+    assert info.misses == 1
+    assert info.hits == 2
+
+
+def test_load_custom_file(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({
+        "version": "test",
+        "platforms": {
+            "android": {"min_version": "10", "models": [
+                {"label": "Fairphone 4 and later", "family": "Fairphone", "min_generation": 4},
+            ]},
+        },
+    }))
+    catalog = DeviceCatalog.load(path)
+    assert catalog.version == "test"
+    assert catalog.counts() == {"android": 1}
+    assert catalog.lookup("android", "Fairphone 5").label == "Fairphone 4 and later"
+    assert catalog.lookup("android", "Fairphone 3") is None
+    assert catalog.lookup("android", "Pixel 8") is None
+
+
+def test_verify_device_eligibility_uses_catalog(catalog):
+    service = NexoraAIService(device_catalog=catalog)
+
+    result = service.verify_device_eligibility("android", "SM-S918B", "14")
+    assert result.status == VerificationStatus.VERIFIED
+    assert result.details["matched_model"] == "Samsung Galaxy S20 and later"
+
+    result = service.verify_device_eligibility("ios", "iPhone X", "16.1")
+    assert result.status != VerificationStatus.VERIFIED
+    assert result.details["esim_supported"] is False
+
+    result = service.verify_device_eligibility("android", "Pixel 8", "8.1")
+    assert result.status == VerificationStatus.FAILED
+
+    result = service.verify_device_eligibility("blackberry", "KEY2", "10")
+    assert result.errors == ["Unsupported device type: blackberry"]
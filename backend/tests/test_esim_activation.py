@@ -0,0 +1,79 @@
+"""
+Tests for single-round-trip, exactly-once eSIM activation
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from services.esim_service import ESIMService
+from services.plan_catalog import PlanCatalog
+
+
+def test_plan_terms_follow_catalog_version():
+    catalog = SimpleNamespace(version=1, list_plans=lambda is_active=True: (
+        [{"plan_id": "plan_tourist_7d", "validity_days": 7, "data_gb": 5.0}] if is_active else []
+    ))
+    db = SimpleNamespace(esim_profiles=None, devices=None, esim_transfers=None, id_counters=None)
+    service = ESIMService(db, qr_store=object(), plan_catalog=catalog)
+
+    validity = service._plan_terms("validity_days", 30)
+    assert validity["$switch"]["branches"][0]["then"] == {"$literal": 7}
+    assert validity["$switch"]["default"] == {"$literal": 30}
+    assert service._plan_terms("data_gb", 0) is service._plan_terms("data_gb", 0)
+
+    catalog.version = 2
+    catalog.list_plans = lambda is_active=True: []
+    assert service._plan_terms("validity_days", 30) == {"$literal": 30}
+
+
+async def insert_profile(db, profile_id="p1", plan_id="plan_tourist_7d"):
+    await db.esim_profiles.insert_one({
+        "profile_id": profile_id,
+        "user_id": "u1",
+        "plan_id": plan_id,
+        "status": "inactive",
+        "activation_code": "LPA:1$esim.com.mm$ABC$",
+        "created_at": datetime.utcnow(),
+    })
+
+
+@pytest.mark.asyncio
+async def test_activation_applies_plan_terms(mongo_db):
+    catalog = PlanCatalog(mongo_db, refresh_interval_seconds=0)
+    await catalog.seed_defaults()
+    await catalog.load()
+    service = ESIMService(mongo_db, plan_catalog=catalog)
+    await insert_profile(mongo_db)
+
+    profile = await service.activate_profile("p1", "u1", "ios", "$where", None)
+
+    assert profile["status"] == "active"
+    assert profile["data_limit_gb"] == 5.0
+    assert profile["device_model"] == "$where"  # Stored literally, not as a field path
+    assert profile["expiry_date"] - profile["activation_date"] == timedelta(days=7)
+    assert profile["qr_code"] == "/api/esim/profiles/p1/qr.png"
+    with pytest.raises(ValueError, match="Profile not found"):
+        await service.activate_profile("p1", "someone-else", "ios")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_activations_succeed_exactly_once(mongo_db):
+    catalog = PlanCatalog(mongo_db, refresh_interval_seconds=0)
+    await catalog.load()
+    service = ESIMService(mongo_db, plan_catalog=catalog)
+    await insert_profile(mongo_db)
+
+    results = await asyncio.gather(
+        *(service.activate_profile("p1", "u1", "android", f"Model {n}") for n in range(50)),
+        return_exceptions=True
+    )
+
+    activated = [r for r in results if isinstance(r, dict)]
+    rejected = [r for r in results if isinstance(r, ValueError)]
+    assert len(activated) == 1
+    assert len(rejected) == 49
+    assert all(str(e) == "Profile is already active" for e in rejected)
+    assert await mongo_db.devices.count_documents({"profile_id": "p1"}) == 1
@@ -0,0 +1,66 @@
+"""
+Tests for the shared outbound HTTP client
+"""
+
+import httpx
+import pytest
+
+from services.http_client import OutboundHTTP
+
+
+def _flaky_transport(failures: int, calls: list):
+    """Mock upstream answering 503 for the first `failures` requests"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.method)
+        if len(calls) <= failures:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_idempotent_requests_are_retried():
+    calls = []
+    http = OutboundHTTP(retries=2, backoff_base_seconds=0, transport=_flaky_transport(2, calls))
+
+    response = await http.request("GET", "https://api.example.com/rest/v1/plans", upstream="example")
+
+    assert response.json() == {"ok": True}
+    assert calls == ["GET", "GET", "GET"]
+    assert http.stats()["example"]["retries"] == 2
+    assert http.stats()["example"]["errors"] == 2
+    await http.aclose()
+
+
+@pytest.mark.asyncio
+async def test_post_is_not_retried_unless_requested():
+    calls = []
+    http = OutboundHTTP(retries=2, backoff_base_seconds=0, transport=_flaky_transport(1, calls))
+
+    response = await http.request("POST", "https://api.example.com/pay")
+    assert response.status_code == 503
+    assert calls == ["POST"]
+
+    response = await http.request("POST", "https://api.example.com/status", retry=True)
+    assert response.status_code == 200
+    await http.aclose()
+
+
+@pytest.mark.asyncio
+async def test_transport_errors_raise_after_retries():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    http = OutboundHTTP(retries=1, backoff_base_seconds=0, transport=httpx.MockTransport(handler))
+
+    with pytest.raises(httpx.ConnectError):
+        await http.request("GET", "https://down.example.com/health")
+    assert http.stats()["down.example.com"]["requests"] == 2
+    await http.aclose()
+
+
+def test_one_pooled_client_per_origin():
+    http = OutboundHTTP()
+
+    assert http.client("https://a.example.com/x") is http.client("https://a.example.com/y?z=1")
+    assert http.client("https://a.example.com/x") is not http.client("https://b.example.com/x")
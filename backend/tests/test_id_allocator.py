@@ -0,0 +1,72 @@
+"""
+Tests for Luhn ICCIDs and hi/lo block allocation
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.id_allocator import ICCIDAllocator, generate_activation_code, luhn_check_digit, luhn_valid
+
+
+class FakeCounters:
+    """Atomic $inc counter collection (as MongoDB applies it)"""
+
+    def __init__(self):
+        self.docs = {}
+        self.calls = 0
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        self.calls += 1
+        await asyncio.sleep(0)
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"], "next": 0})
+        doc["next"] += update["$inc"]["next"]
+        return dict(doc)
+
+
+def test_luhn_check_digit():
+    # Standard Luhn test vectors
+    assert luhn_check_digit("7992739871") == "3"
+    assert luhn_valid("79927398713")
+    assert not luhn_valid("79927398710")
+    assert not luhn_valid("8995901234567890abc")
+
+
+def test_activation_codes_are_random_lpa_strings():
+    codes = {generate_activation_code() for _ in range(100)}
+
+    assert len(codes) == 100
+    assert all(code.startswith("LPA:1$esim.com.mm$") and code.endswith("$") for code in codes)
+
+
+@pytest.mark.asyncio
+async def test_iccids_are_numeric_luhn_valid_and_block_allocated():
+    counters = FakeCounters()
+    allocator = ICCIDAllocator(SimpleNamespace(id_counters=counters), block_size=100)
+
+    iccids = await allocator.allocate_many(250)
+    iccids.append(await allocator.allocate())
+
+    assert len(set(iccids)) == 251
+    assert all(len(i) == 20 and i.startswith("89959") and luhn_valid(i) for i in iccids)
+    assert iccids[0] == "8995900000000000000" + luhn_check_digit("8995900000000000000")
+    # 3 blocks used plus at most one prefetched
+    assert counters.calls <= 4
+
+
+@pytest.mark.asyncio
+async def test_workers_never_share_serials():
+    counters = FakeCounters()
+    db = SimpleNamespace(id_counters=counters)
+    workers = [ICCIDAllocator(db, block_size=10) for _ in range(4)]
+
+    results = await asyncio.gather(*(w.allocate_many(35) for w in workers for _ in range(3)))
+
+    iccids = [i for batch in results for i in batch]
+    assert len(iccids) == len(set(iccids)) == 4 * 3 * 35
+
+
+def test_prefix_must_leave_room_for_serials():
+    with pytest.raises(ValueError):
+        ICCIDAllocator(SimpleNamespace(id_counters=None), prefix="8995901234567890123")
@@ -0,0 +1,109 @@
+"""
+Tests for the profile lifecycle scheduler
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from services.lifecycle_scheduler import LIFECYCLE_LEASE_ID, LifecycleScheduler
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+class FakeLeases:
+    """Single-document stand-in for the app_meta lease semantics"""
+
+    def __init__(self):
+        self.doc = None
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        takeable = self.doc is None or any(
+            self.doc["owner"] == cond.get("owner") or ("lease_until" in cond and self.doc["lease_until"] <= cond["lease_until"]["$lte"])
+            for cond in query["$or"]
+        )
+        if not takeable:
+            raise DuplicateKeyError("E11000 duplicate key")
+        self.doc = {"_id": LIFECYCLE_LEASE_ID, **update["$set"]}
+        return self.doc
+
+    async def update_one(self, query, update):
+        if self.doc and self.doc["owner"] == query["owner"]:
+            self.doc.update(update["$set"])
+
+
+def make_scheduler(leases, worker_id, clock):
+    db = SimpleNamespace(esim_profiles=None, profile_events=None, app_meta=leases)
+    scheduler = LifecycleScheduler(db, interval_seconds=60, clock=clock)
+    scheduler.lease.worker_id = worker_id
+    return scheduler
+
+
+@pytest.mark.asyncio
+async def test_only_one_worker_holds_the_lease():
+    leases = FakeLeases()
+    now = [NOW]
+    a = make_scheduler(leases, "a", lambda: now[0])
+    b = make_scheduler(leases, "b", lambda: now[0])
+
+    assert await a.acquire_lease() is True
+    assert await b.acquire_lease() is False
+    assert await a.acquire_lease() is True  # renewal
+
+    # The leader stops renewing; the standby takes over once the lease lapses
+    now[0] += timedelta(seconds=181)
+    assert await b.acquire_lease() is True
+    assert await a.acquire_lease() is False
+    assert (a.is_leader, b.is_leader) == (False, True)
+
+
+@pytest.mark.asyncio
+async def test_released_lease_is_taken_over_immediately():
+    leases = FakeLeases()
+    a = make_scheduler(leases, "a", lambda: NOW)
+    b = make_scheduler(leases, "b", lambda: NOW)
+
+    await a.acquire_lease()
+    await a.release_lease()
+
+    assert await b.acquire_lease() is True
+
+
+def profile(profile_id, status="active", expiry=None, limit=10.0, used=0.0):
+    return {
+        "profile_id": profile_id,
+        "user_id": "user-1",
+        "iccid": f"8995900000000000{profile_id}",
+        "status": status,
+        "expiry_date": expiry,
+        "data_limit_gb": limit,
+        "data_used_gb": used,
+    }
+
+
+@pytest.mark.asyncio
+async def test_sweep_expires_and_notifies_once(mongo_db):
+    await mongo_db.esim_profiles.insert_many([
+        profile("0001", expiry=NOW - timedelta(minutes=1)),
+        profile("0002", status="suspended", expiry=NOW - timedelta(days=2)),
+        profile("0003", expiry=NOW + timedelta(days=1)),
+        profile("0004", expiry=NOW + timedelta(days=30), used=9.5),
+        profile("0005", status="inactive", expiry=None),
+    ])
+    scheduler = LifecycleScheduler(mongo_db, batch_size=1, clock=lambda: NOW)
+
+    assert await scheduler.sweep() == {"expired": 2, "expiring_soon": 1, "low_balance": 1}
+    assert await scheduler.sweep() == {"expired": 0, "expiring_soon": 0, "low_balance": 0}
+
+    statuses = {p["profile_id"]: p["status"] async for p in mongo_db.esim_profiles.find()}
+    assert statuses == {"0001": "expired", "0002": "expired", "0003": "active", "0004": "active", "0005": "inactive"}
+    events = sorted((e["profile_id"], e["type"]) async for e in mongo_db.profile_events.find())
+    assert events == [("0001", "expired"), ("0002", "expired"), ("0003", "expiring_soon"), ("0004", "low_balance")]
+
+    # A renewal moves expiry_date, so the profile is warned about again
+    await mongo_db.esim_profiles.update_one(
+        {"profile_id": "0003"}, {"$set": {"expiry_date": NOW + timedelta(days=2)}}
+    )
+    assert (await scheduler.sweep())["expiring_soon"] == 1
@@ -0,0 +1,98 @@
+"""
+Tests for request, MongoDB and outbound HTTP metrics
+"""
+
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+
+from middleware.metrics import MetricsMiddleware
+from services.http_client import OutboundHTTP
+from services.metrics import SERVICE_STATS, MongoCommandListener, render_metrics
+from services.plan_catalog import PlanCatalog
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_request_latency_by_route_template():
+    app = FastAPI()
+
+    @app.get("/api/metrics-test/{item_id}")
+    async def item(item_id: str):
+        return {"item_id": item_id}
+
+    app.add_middleware(MetricsMiddleware)
+    labels = {"method": "GET", "route": "/api/metrics-test/{item_id}", "status": "2xx"}
+    before = sample("esim_http_request_duration_seconds_count", **labels)
+    unmatched = sample("esim_http_request_duration_seconds_count", method="GET", route="<unmatched>", status="4xx")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for n in range(3):
+            await client.get(f"/api/metrics-test/{n}")
+        await client.get("/nope")
+
+    assert sample("esim_http_request_duration_seconds_count", **labels) == before + 3
+    assert sample(
+        "esim_http_request_duration_seconds_count", method="GET", route="<unmatched>", status="4xx"
+    ) == unmatched + 1
+    assert sample("esim_http_requests_in_flight") == 0
+
+
+def test_mongo_command_listener_observes_duration():
+    listener = MongoCommandListener()
+    before = sample("esim_mongo_command_duration_seconds_sum", command="find", outcome="ok")
+
+    listener.succeeded(SimpleNamespace(command_name="find", duration_micros=2500))
+    listener.failed(SimpleNamespace(command_name="insert", duration_micros=1000))
+
+    assert sample("esim_mongo_command_duration_seconds_sum", command="find", outcome="ok") == pytest.approx(before + 0.0025)
+    assert sample("esim_mongo_command_duration_seconds_count", command="insert", outcome="error") >= 1
+
+
+@pytest.mark.asyncio
+async def test_outbound_requests_are_timed_and_exposed():
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+    http = OutboundHTTP(transport=transport)
+    before = sample("esim_outbound_request_duration_seconds_count", upstream="metrics.example", outcome="ok")
+
+    await http.request("GET", "https://metrics.example/status")
+    await http.aclose()
+
+    assert sample(
+        "esim_outbound_request_duration_seconds_count", upstream="metrics.example", outcome="ok"
+    ) == before + 1
+    body, content_type = render_metrics()
+    assert content_type.startswith("text/plain")
+    assert b'esim_outbound_request_duration_seconds_bucket{le="0.001",outcome="ok",upstream="metrics.example"}' in body
+
+
+@pytest.mark.asyncio
+async def test_service_stats_are_exported():
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+    http = OutboundHTTP(transport=transport)
+    await http.request("GET", "https://stats.example/status")
+    await http.aclose()
+    catalog = PlanCatalog(SimpleNamespace(plans=None, app_meta=None))
+
+    SERVICE_STATS.register("http_client", http.stats, label="upstream")
+    SERVICE_STATS.register("plan_catalog", catalog.stats)
+    SERVICE_STATS.register("lifecycle", lambda: {"is_leader": True, "sweeps": 2, "last_sweep_seconds": None})
+    try:
+        body, _ = render_metrics()
+        assert sample("esim_http_client_requests_total", upstream="stats.example") == 1
+        assert sample("esim_plan_catalog_loads_total") == 0
+        assert b"# TYPE esim_plan_catalog_plans gauge" in body
+        assert sample("esim_lifecycle_is_leader") == 1
+        assert sample("esim_lifecycle_sweeps_total") == 2
+        assert b"esim_lifecycle_last_sweep_seconds" not in body
+    finally:
+        SERVICE_STATS.clear()
+
+    assert REGISTRY.get_sample_value("esim_plan_catalog_loads_total") is None
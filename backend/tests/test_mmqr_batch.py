@@ -0,0 +1,122 @@
+"""
+Tests for bulk MMQR verification
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI
+
+from routers.auth import get_admin_user
+from routers.esim_registration import router as registration_router
+from services import mmqr_batch
+from services.mmqr_batch import MMQRBatchVerifier, parse_batch
+from services.mmqr_service import MMQRService
+
+service = MMQRService()
+GOOD = service.generate_payment_qr(order_id="A1")
+OTHER = service.generate_payment_qr(amount=150000, order_id="B2")
+SHORT = service.generate_payment_qr(amount=1000, order_id="C3")
+LARGE = service.generate_payment_qr(amount=1200000, order_id="D4")
+
+
+async def collect(verifier, qr_strings, **kwargs):
+    return [line async for line in verifier.verify(qr_strings, **kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_duplicates_are_validated_once_and_results_keep_input_order(monkeypatch):
+    calls = []
+    original = mmqr_batch.validate_chunk
+    monkeypatch.setattr(mmqr_batch, "validate_chunk", lambda chunk, amount: calls.append(len(chunk)) or original(chunk, amount))
+    verifier = MMQRBatchVerifier(chunk_size=2)
+
+    lines = await collect(verifier, [GOOD, "bad", GOOD, OTHER, GOOD])
+
+    assert sum(calls) == 3
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    assert [line["valid"] for line in lines] == [True, False, True, True, True]
+    assert [line.get("duplicate_of") for line in lines] == [None, None, 0, None, 0]
+
+
+@pytest.mark.asyncio
+async def test_process_pool_fan_out():
+    qr_strings = [service.generate_payment_qr(order_id=f"O{i}") for i in range(30)] + [GOOD] * 5
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        verifier = MMQRBatchVerifier(executor=pool, chunk_size=4, parallel_threshold=10)
+        lines = await collect(verifier, qr_strings)
+
+    assert len(lines) == 35
+    assert all(line["valid"] for line in lines)
+    assert [line["index"] for line in lines] == list(range(35))
+
+
+@pytest.mark.asyncio
+async def test_summary_by_merchant_and_amount():
+    verifier = MMQRBatchVerifier()
+    lines = [orjson.loads(line) async for line in verifier.verify_ndjson([GOOD, GOOD, OTHER, SHORT, LARGE, "bad"])]
+
+    summary = lines[-1]["summary"]
+    assert (summary["total"], summary["unique"], summary["duplicates"]) == (6, 5, 1)
+    assert (summary["valid"], summary["invalid"]) == (3, 2)
+    merchant = summary["by_merchant"]["223511010015222"]
+    assert (merchant["count"], merchant["valid"], merchant["valid_amount"]) == (4, 3, 1470000.0)
+    assert summary["by_amount"] == {"120000": 1, "150000": 1, "1000": 1, "1200000": 1, "none": 1}
+
+
+def test_format_amount_never_uses_exponents():
+    assert mmqr_batch.format_amount(1200000.0) == "1200000"
+    assert mmqr_batch.format_amount(25000000.0) == "25000000"
+    assert mmqr_batch.format_amount(1500.5) == "1500.5"
+    assert mmqr_batch.format_amount(0.0) == "0"
+
+
+def test_parse_batch_formats():
+    assert parse_batch(orjson.dumps([GOOD, OTHER])) == [GOOD, OTHER]
+    ndjson = f'"{GOOD}"\n{{"qr": "{OTHER}"}}\n\n{SHORT}\n'.encode()
+    assert parse_batch(ndjson) == [GOOD, OTHER, SHORT]
+    with pytest.raises(ValueError):
+        parse_batch(b'{"qr": 5}\n')
+
+
+@pytest.mark.asyncio
+async def test_endpoint_streams_ndjson():
+    app = FastAPI()
+    app.include_router(registration_router)
+    app.dependency_overrides[get_admin_user] = lambda: {"user_id": "admin", "role": "admin"}
+    app.state.mmqr_batch_verifier = MMQRBatchVerifier()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/esim-registration/mmqr/verify-batch?expected_amount=150000",
+            content="\n".join([OTHER, GOOD, OTHER]),
+            headers={"content-type": "application/x-ndjson"},
+        )
+        upload = await client.post(
+            "/api/esim-registration/mmqr/verify-batch",
+            files={"file": ("batch.json", orjson.dumps([GOOD]), "application/json")},
+        )
+        bad = await client.post("/api/esim-registration/mmqr/verify-batch", content=b'[1, 2]')
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [line.get("valid") for line in lines[:3]] == [True, False, True]
+    assert lines[3]["summary"]["duplicates"] == 1
+    assert orjson.loads(upload.text.splitlines()[0])["valid"] is True
+    assert bad.status_code == 400
+
+
+def test_cli(tmp_path, monkeypatch, capsysbinary):
+    path = tmp_path / "payments.ndjson"
+    path.write_text(f"{GOOD}\n{GOOD}\n")
+    monkeypatch.setattr("sys.argv", ["mmqr_batch", str(path)])
+
+    mmqr_batch.main()
+
+    lines = [orjson.loads(line) for line in capsysbinary.readouterr().out.splitlines()]
+    assert [line.get("duplicate_of") for line in lines[:2]] == [None, 0]
+    assert lines[2]["summary"]["unique"] == 1
@@ -0,0 +1,118 @@
+"""
+Tests for the MMQR codec, including fuzzing against the original implementation
+"""
+
+import random
+import string
+
+import pytest
+
+from benchmarks.bench_mmqr import legacy_crc, legacy_parse_tlv
+from services.mmqr_codec import MMQRParseError, MMQRPayload, crc16_ccitt, crc16_hex, parse_tlv
+from services.mmqr_service import MMQRService, PaymentStatus
+
+ALPHABET = string.ascii_letters + string.digits + " .-/"
+
+
+def random_tlv(rng: random.Random, entries: int) -> str:
+    parts = []
+    for _ in range(entries):
+        value = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 99)))
+        parts.append(f"{rng.randint(0, 99):02d}{len(value):02d}{value}")
+    return "".join(parts)
+
+
+def test_crc_known_vector():
+    assert crc16_ccitt(b"123456789") == 0x29B1
+
+
+def test_crc_matches_bitwise_implementation():
+    rng = random.Random(1)
+    for _ in range(500):
+        text = "".join(rng.choice(string.printable) for _ in range(rng.randint(0, 300)))
+        assert crc16_hex(text) == legacy_crc(text)
+
+
+def test_parser_matches_original_on_well_formed_input():
+    rng = random.Random(2)
+    for _ in range(2000):
+        data = random_tlv(rng, rng.randint(0, 12))
+        assert parse_tlv(data) == legacy_parse_tlv(data)
+
+
+def test_parser_fuzz_never_disagrees_silently():
+    """On corrupted input the codec either agrees with the original or raises MMQRParseError"""
+    rng = random.Random(3)
+    rejected = 0
+    for _ in range(5000):
+        data = list(random_tlv(rng, rng.randint(1, 8)))
+        for _ in range(rng.randint(1, 3)):
+            position = rng.randrange(len(data) + 1)
+            mutation = rng.choice(("replace", "insert", "delete", "truncate"))
+            if mutation == "replace" and position < len(data):
+                data[position] = rng.choice(ALPHABET + "+-")
+            elif mutation == "insert":
+                data.insert(position, rng.choice(ALPHABET))
+            elif mutation == "delete" and position < len(data):
+                del data[position]
+            elif mutation == "truncate":
+                del data[position:]
+        data = "".join(data)
+
+        try:
+            result = parse_tlv(data)
+        except MMQRParseError:
+            rejected += 1
+            continue
+        assert result == legacy_parse_tlv(data)
+    # Plenty of the mutations must produce malformed lengths or overruns
+    assert rejected > 1000
+
+
+@pytest.mark.parametrize("data", ["0005abc", "00", "00ab12", "00-1x", "0002ab01"])
+def test_malformed_lengths_are_rejected(data):
+    with pytest.raises(MMQRParseError):
+        parse_tlv(data)
+
+
+def test_generated_qr_round_trip():
+    service = MMQRService()
+    qr = service.generate_payment_qr(amount=150000, order_id="ORD-42")
+
+    parsed = service.parse_mmqr(qr)
+
+    assert parsed.crc_valid is True
+    assert parsed.merchant_id == "223511010015222"
+    assert parsed.amount == 150000
+    assert dict(parsed.additional_data) == {"05": "ORD-42"}
+    assert service.validate_payment(qr, 150000)["status"] == PaymentStatus.VERIFIED
+
+
+def test_crc_mismatch_fails_validation():
+    service = MMQRService()
+    qr = service.generate_payment_qr()
+    tampered = qr.replace("120000", "990000")
+
+    result = service.validate_payment(tampered)
+
+    assert result["valid"] is False
+    assert "CRC checksum mismatch" in result["errors"]
+
+
+def test_nested_templates_are_validated_lazily():
+    body = "000201010211" "26060102AB" "5303104" "5802MM" "6205" "0509X"
+    payload = MMQRPayload(body)
+
+    assert payload.template("26")["01"] == "AB"
+    with pytest.raises(MMQRParseError):
+        dict(payload.template("62"))
+    assert payload.crc_valid() is None
+
+
+def test_batch_validation_keeps_order():
+    service = MMQRService()
+    good = service.generate_payment_qr()
+    results = service.validate_payments([good, "garbage", good[:-1] + "0"])
+
+    assert [r["valid"] for r in results] == [True, False, False]
+    assert len({r["timestamp"] for r in results}) == 1
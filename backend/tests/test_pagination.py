@@ -0,0 +1,52 @@
+"""
+Tests for keyset pagination and field projections
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.pagination import build_projection, decode_cursor, encode_cursor, paginate
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 1, 2, 3, 4, 5, 678000)
+    cursor = encode_cursor(created_at, "profile-1")
+
+    assert decode_cursor(cursor) == (created_at, "profile-1")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_projection_whitelist():
+    allowed = {"ticket_id", "subject", "status", "created_at"}
+
+    assert build_projection(None, allowed, "ticket_id", exclude=["blob"]) == {"_id": 0, "blob": 0}
+    assert build_projection("subject", allowed, "ticket_id") == {
+        "_id": 0, "ticket_id": 1, "created_at": 1, "subject": 1
+    }
+    with pytest.raises(ValueError):
+        build_projection("subject,password", allowed, "ticket_id")
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_all_documents_once(mongo_db):
+    base = datetime(2025, 1, 1)
+    # Pairs of documents share a created_at so the id tie-breaker is exercised
+    await mongo_db.items.insert_many([
+        {"item_id": f"i{n:02d}", "user_id": "u1", "created_at": base + timedelta(seconds=n // 2), "blob": "x" * 100}
+        for n in range(7)
+    ])
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = await paginate(
+            mongo_db.items, {"user_id": "u1"}, "item_id", limit=3, cursor=cursor,
+            projection={"_id": 0, "blob": 0}
+        )
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert [d["item_id"] for d in seen] == [f"i{n:02d}" for n in reversed(range(7))]
+    assert all("blob" not in d for d in seen)
@@ -0,0 +1,55 @@
+"""
+Tests for the bounded password hashing pool
+"""
+
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from services.auth_service import create_password_context
+from services.password_hasher import PasswordHasher, HasherBusyError
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_round_trip():
+    hasher = PasswordHasher(create_password_context(4), max_workers=2)
+    verified = sample("esim_password_hash_duration_seconds_count", operation="verify", phase="run")
+    hashed = await hasher.hash("CorrectHorse42!")
+
+    assert await hasher.verify("CorrectHorse42!", hashed)
+    assert not await hasher.verify("wrong-password", hashed)
+    assert hasher.stats()["submitted"] == 3
+    assert sample("esim_password_hash_duration_seconds_count", operation="verify", phase="run") == verified + 2
+    assert sample("esim_password_hash_duration_seconds_count", operation="hash", phase="wait") >= 1
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_queue_limit_rejects_excess_work():
+    hasher = PasswordHasher(create_password_context(4), max_workers=1, max_queue=2)
+    rejected = sample("esim_password_hash_rejected_total")
+
+    results = await asyncio.gather(
+        *(hasher.hash("CorrectHorse42!") for _ in range(5)),
+        return_exceptions=True,
+    )
+
+    assert sum(isinstance(r, HasherBusyError) for r in results) == 2
+    assert hasher.stats()["rejected"] == 2
+    assert hasher.stats()["max_depth"] == 3
+    assert sample("esim_password_hash_rejected_total") == rejected + 2
+    assert sample("esim_password_hash_pending") == 0
+    hasher.shutdown()
+
+
+def test_needs_update_detects_cost_change():
+    old_hash = create_password_context(4).hash("CorrectHorse42!")
+    hasher = PasswordHasher(create_password_context(5))
+
+    assert hasher.needs_update(old_hash)
+    hasher.shutdown()
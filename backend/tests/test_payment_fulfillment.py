@@ -0,0 +1,101 @@
+"""
+Tests for payment callbacks and outbox-driven fulfillment
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from services.payment_service import PaymentService
+from tests.fake_payments import PLAN, FakeCatalog, FakeTransactions
+
+
+def make_transaction(**overrides):
+    return {
+        "transaction_id": "txn-1",
+        "user_id": "user-1",
+        "plan_id": PLAN["plan_id"],
+        "profile_id": "profile-1",
+        "status": "pending",
+        "final_amount": 10000,
+        "created_at": datetime.utcnow(),
+        **overrides,
+    }
+
+
+@pytest.mark.asyncio
+async def test_callback_queues_fulfillment_without_touching_profiles():
+    transactions = FakeTransactions(make_transaction())
+    # esim_profiles=None: any inline fulfillment would fail
+    db = SimpleNamespace(transactions=transactions, plans=None, esim_profiles=None, promo_codes=None)
+    service = PaymentService(db, plan_catalog=FakeCatalog())
+
+    result = await service.process_callback("txn-1", "gw-1", "completed", {"ok": True})
+
+    assert result["status"] == "completed"
+    assert result["fulfillment"]["state"] == "pending"
+    assert result["fulfillment"]["idempotency_key"] == "gw-1"
+
+    # A gateway retry leaves the completed transaction (and its outbox entry) alone
+    again = await service.process_callback("txn-1", "gw-1", "completed", {"ok": True})
+    assert again["fulfillment"] == result["fulfillment"]
+    assert len(transactions.updates) == 2
+
+
+async def seed(db):
+    await db.esim_profiles.insert_one({"profile_id": "profile-1", "data_limit_gb": 1.0})
+    await db.transactions.insert_one(make_transaction())
+    return PaymentService(db, plan_catalog=FakeCatalog())
+
+
+async def data_limit(db):
+    return (await db.esim_profiles.find_one({"profile_id": "profile-1"}))["data_limit_gb"]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_callbacks_credit_once(mongo_db):
+    service = await seed(mongo_db)
+
+    for _ in range(3):
+        await service.process_callback("txn-1", "gw-1", "completed", {})
+    while (leased := await service.claim_fulfillment()) is not None:
+        assert await service.run_fulfillment(leased)
+
+    assert await data_limit(mongo_db) == 6.0
+    txn = await service.get_transaction("txn-1")
+    assert txn["fulfillment"]["state"] == "done"
+    assert txn["fulfillment"]["attempts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redelivered_fulfillment_is_idempotent(mongo_db):
+    service = await seed(mongo_db)
+    await service.process_callback("txn-1", "gw-1", "completed", {})
+
+    leased = await service.claim_fulfillment()
+    # Worker crashed after crediting, before marking the entry done
+    await service._fulfill_order(leased)
+    await mongo_db.transactions.update_one(
+        {"transaction_id": "txn-1"}, {"$set": {"fulfillment.next_attempt_at": datetime.utcnow()}}
+    )
+
+    retried = await service.claim_fulfillment()
+    assert retried["fulfillment"]["attempts"] == 2
+    assert await service.run_fulfillment(retried)
+    assert await data_limit(mongo_db) == 6.0
+
+
+@pytest.mark.asyncio
+async def test_failed_fulfillment_is_rescheduled(mongo_db):
+    service = await seed(mongo_db)
+    await mongo_db.esim_profiles.delete_many({})
+    await service.process_callback("txn-1", "gw-1", "completed", {})
+
+    assert not await service.run_fulfillment(await service.claim_fulfillment())
+
+    txn = await service.get_transaction("txn-1")
+    assert txn["fulfillment"]["state"] == "pending"
+    assert txn["fulfillment"]["last_error"] == "Profile not found"
+    assert txn["fulfillment"]["next_attempt_at"] > datetime.utcnow()
+    assert await service.claim_fulfillment() is None
@@ -0,0 +1,45 @@
+"""
+Tests for the in-memory plan catalog
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from services.plan_catalog import PlanCatalog, DEFAULT_PLANS
+
+
+def test_indexes_by_id_status_and_type():
+    catalog = PlanCatalog(SimpleNamespace(plans=None, app_meta=None))
+    catalog._index([
+        {"plan_id": "a", "plan_type": "prepaid", "is_active": True},
+        {"plan_id": "b", "plan_type": "postpaid", "is_active": True},
+        {"plan_id": "c", "plan_type": "prepaid", "is_active": False},
+    ])
+
+    assert catalog.get("c")["plan_type"] == "prepaid"
+    assert catalog.get("missing") is None
+    assert [p["plan_id"] for p in catalog.list_plans()] == ["a", "b"]
+    assert [p["plan_id"] for p in catalog.list_plans(plan_type="prepaid")] == ["a"]
+    assert [p["plan_id"] for p in catalog.list_plans(is_active=False)] == ["c"]
+    assert catalog.list_plans(plan_type="corporate") == []
+
+
+@pytest.mark.asyncio
+async def test_invalidation_is_seen_by_other_workers(mongo_db):
+    worker_a = PlanCatalog(mongo_db, refresh_interval_seconds=0)
+    worker_b = PlanCatalog(mongo_db, refresh_interval_seconds=0)
+
+    await worker_a.seed_defaults()
+    await worker_a.seed_defaults()
+    await worker_a.load()
+    await worker_b.load()
+    assert len(worker_b.list_plans()) == len(DEFAULT_PLANS)
+    assert not await worker_b.refresh_if_stale()
+
+    await mongo_db.plans.update_one({"plan_id": "plan_basic_5g"}, {"$set": {"price": 4500}})
+    await worker_a.invalidate()
+
+    assert worker_a.get("plan_basic_5g")["price"] == 4500
+    assert await worker_b.refresh_if_stale()
+    assert worker_b.get("plan_basic_5g")["price"] == 4500
@@ -0,0 +1,194 @@
+"""
+Tests for atomic promo code redemption and release
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import asyncio
+
+import pytest
+
+from services.payment_service import PaymentService
+from services.promo_service import PromoService
+from tests.fake_payments import PLAN, FakeCatalog, FakeTransactions
+from tests.fake_redis import FakeClock
+
+
+class CountingCollection:
+    """Minimal promo_codes stand-in counting metadata lookups"""
+
+    def __init__(self, promo):
+        self.promo = promo
+        self.lookups = 0
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        return self.promo if self.promo and query["code"] == self.promo["code"] else None
+
+
+def _promo(**overrides):
+    promo = {
+        "code": "LAUNCH10",
+        "discount_percent": 10,
+        "is_active": True,
+        "valid_until": datetime.utcnow() + timedelta(days=1),
+        "usage_limit": 0,
+    }
+    promo.update(overrides)
+    return promo
+
+
+@pytest.mark.asyncio
+async def test_metadata_is_cached_including_misses():
+    clock = FakeClock()
+    collection = CountingCollection(_promo())
+    promos = PromoService(SimpleNamespace(promo_codes=collection), cache_ttl_seconds=30, clock=clock)
+
+    await promos.check("launch10", "plan_basic_5g")
+    await promos.check("LAUNCH10", "plan_basic_5g")
+    with pytest.raises(ValueError):
+        await promos.check("NOPE", "plan_basic_5g")
+    with pytest.raises(ValueError):
+        await promos.check("NOPE", "plan_basic_5g")
+    assert collection.lookups == 2
+
+    clock.advance(30)
+    await promos.check("LAUNCH10", "plan_basic_5g")
+    assert collection.lookups == 3
+
+
+@pytest.mark.asyncio
+async def test_plan_restriction_and_expiry():
+    collection = CountingCollection(_promo(applicable_plans=["plan_premium_5g"]))
+    promos = PromoService(SimpleNamespace(promo_codes=collection))
+
+    with pytest.raises(ValueError, match="not applicable"):
+        await promos.check("LAUNCH10", "plan_basic_5g")
+
+    collection.promo = _promo(valid_until=datetime.utcnow() - timedelta(seconds=1))
+    promos.invalidate()
+    with pytest.raises(ValueError, match="expired"):
+        await promos.check("LAUNCH10", "plan_basic_5g")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_redemptions_never_exceed_limit(mongo_db):
+    await mongo_db.promo_codes.insert_one(_promo(usage_limit=10, used_count=0))
+    promos = PromoService(mongo_db)
+
+    results = await asyncio.gather(
+        *(promos.redeem("LAUNCH10", "plan_basic_5g") for _ in range(100)),
+        return_exceptions=True,
+    )
+
+    assert sum(isinstance(r, dict) for r in results) == 10
+    assert sum(isinstance(r, ValueError) for r in results) == 90
+    promo = await mongo_db.promo_codes.find_one({"code": "LAUNCH10"})
+    assert promo["used_count"] == 10
+
+
+class RecordingPromos:
+    """Stands in for PromoService: records redemptions and releases"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def redeem(self, code, plan_id):
+        self.calls.append(("redeem", code))
+        return _promo()
+
+    async def release(self, code):
+        self.calls.append(("release", code))
+
+    async def reclaim(self, code):
+        self.calls.append(("reclaim", code))
+
+
+class FailingGateway:
+    async def create_payment(self, **kwargs):
+        raise RuntimeError("Gateway unavailable")
+
+
+def make_payments(**gateways):
+    promos = RecordingPromos()
+    db = SimpleNamespace(transactions=FakeTransactions(), plans=None, promo_codes=None)
+    return PaymentService(db, gateways=gateways, plan_catalog=FakeCatalog(), promo_service=promos), promos
+
+
+@pytest.mark.asyncio
+async def test_promo_is_released_when_payment_cannot_be_created():
+    payments, promos = make_payments(kbz_pay=FailingGateway())
+
+    with pytest.raises(RuntimeError):
+        await payments.create_payment("user-1", PLAN["plan_id"], "kbz_pay", promo_code="LAUNCH10")
+
+    assert promos.calls == [("redeem", "LAUNCH10"), ("release", "LAUNCH10")]
+    assert payments.transactions.docs == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", ["failed", "cancelled", "expired"])
+async def test_promo_is_released_once_when_payment_ends_unpaid(status):
+    payments, promos = make_payments()
+    transaction = await payments.create_payment("user-1", PLAN["plan_id"], "cash", promo_code="LAUNCH10")
+    assert transaction["discount_amount"] == 1000
+
+    await payments.process_callback(transaction["transaction_id"], "gw-1", status, {})
+    await payments.process_callback(transaction["transaction_id"], "gw-1", status, {})
+
+    assert promos.calls == [("redeem", "LAUNCH10"), ("release", "LAUNCH10")]
+
+    # A late successful payment keeps its discount and uses the promo again
+    await payments.process_callback(transaction["transaction_id"], "gw-1", "completed", {})
+    assert promos.calls[-1] == ("reclaim", "LAUNCH10")
+
+
+@pytest.mark.asyncio
+async def test_abandoned_pending_payment_gives_its_promo_use_back():
+    payments, promos = make_payments()
+    abandoned = await payments.create_payment("user-1", PLAN["plan_id"], "cash", promo_code="LAUNCH10")
+    recent = await payments.create_payment("user-1", PLAN["plan_id"], "cash", promo_code="LAUNCH10")
+    payments.transactions.docs[abandoned["transaction_id"]]["created_at"] -= timedelta(hours=1)
+
+    cutoff = datetime.utcnow() - timedelta(minutes=30)
+    assert await payments.release_stale_promo_holds(cutoff) == 1
+    assert await payments.release_stale_promo_holds(cutoff) == 0
+    assert promos.calls == [("redeem", "LAUNCH10"), ("redeem", "LAUNCH10"), ("release", "LAUNCH10")]
+    assert payments.transactions.docs[recent["transaction_id"]]["promo_state"] == "held"
+
+    # Paying after all keeps the discount and takes the use again; expiring it releases nothing more
+    await payments.process_callback(abandoned["transaction_id"], "gw-1", "completed", {})
+    assert promos.calls[-1] == ("reclaim", "LAUNCH10")
+    await payments.process_callback(recent["transaction_id"], "gw-2", "expired", {})
+    assert promos.calls[-1] == ("release", "LAUNCH10")
+    assert promos.calls.count(("release", "LAUNCH10")) == 2
+
+
+@pytest.mark.asyncio
+async def test_completed_payment_keeps_its_promo_use():
+    payments, promos = make_payments()
+    transaction = await payments.create_payment("user-1", PLAN["plan_id"], "cash", promo_code="LAUNCH10")
+
+    await payments.process_callback(transaction["transaction_id"], "gw-1", "completed", {})
+    await payments.process_callback(transaction["transaction_id"], "gw-1", "failed", {})
+
+    assert promos.calls == [("redeem", "LAUNCH10")]
+
+
+@pytest.mark.asyncio
+async def test_release_and_reclaim_adjust_used_count(mongo_db):
+    await mongo_db.promo_codes.insert_one(_promo(usage_limit=1, used_count=0))
+    promos = PromoService(mongo_db)
+
+    await promos.redeem("LAUNCH10", "plan_basic_5g")
+    with pytest.raises(ValueError):
+        await promos.redeem("LAUNCH10", "plan_basic_5g")
+
+    await promos.release("launch10")
+    await promos.release("launch10")  # Never goes below zero
+    assert (await mongo_db.promo_codes.find_one({"code": "LAUNCH10"}))["used_count"] == 0
+
+    await promos.redeem("LAUNCH10", "plan_basic_5g")
+    await promos.reclaim("LAUNCH10")
+    assert (await mongo_db.promo_codes.find_one({"code": "LAUNCH10"}))["used_count"] == 2
+    assert (promos.stats()["released"], promos.stats()["reclaimed"]) == (2, 1)
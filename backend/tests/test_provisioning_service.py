@@ -0,0 +1,128 @@
+"""
+Tests for bulk eSIM provisioning jobs
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from services.esim_service import ESIMService
+from services.provisioning_service import ProvisioningService, bulk_profile_id
+
+
+def test_profile_ids_are_stable_per_job_index():
+    assert bulk_profile_id("job-1", 7) == bulk_profile_id("job-1", 7)
+    assert bulk_profile_id("job-1", 7) != bulk_profile_id("job-1", 8)
+    assert bulk_profile_id("job-1", 7) != bulk_profile_id("job-2", 7)
+
+
+@pytest.mark.asyncio
+async def test_quantity_is_bounded():
+    service = ProvisioningService(
+        SimpleNamespace(provisioning_jobs=None, esim_profiles=None),
+        esim_service=SimpleNamespace(plan_catalog=None)
+    )
+
+    with pytest.raises(ValueError):
+        await service.submit("u1", 0)
+    with pytest.raises(ValueError):
+        await service.submit("u1", 10_001)
+
+
+class FakeProfiles:
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.inserted = []
+
+    def find(self, query, projection=None):
+        async def matches():
+            for profile_id in query["profile_id"]["$in"]:
+                if profile_id in self.existing:
+                    yield {"profile_id": profile_id}
+        return matches()
+
+    async def insert_many(self, docs, ordered=True):
+        self.inserted.extend(docs)
+
+
+class FakeQRStore:
+    def __init__(self):
+        self.stored = []
+
+    async def store_many(self, codes, executor=None):
+        self.stored.extend(codes)
+        return [f"qr-{code}" for code in codes]
+
+
+class FakeAllocator:
+    async def allocate_many(self, count):
+        return [f"8995900000{n:010d}" for n in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_replayed_chunk_skips_items_already_inserted():
+    job = {"job_id": "job-1", "user_id": "partner-1"}
+    profiles = FakeProfiles(existing={bulk_profile_id("job-1", 0), bulk_profile_id("job-1", 2)})
+    qr_store = FakeQRStore()
+    db = SimpleNamespace(esim_profiles=None, devices=None, esim_transfers=None)
+    esim = ESIMService(db, qr_store=qr_store, iccid_allocator=FakeAllocator())
+    service = ProvisioningService(SimpleNamespace(provisioning_jobs=None, esim_profiles=profiles), esim)
+
+    created, failures = await service._provision_chunk(job, 0, 4)
+
+    assert (created, failures) == (4, [])
+    assert [doc["profile_id"] for doc in profiles.inserted] == [bulk_profile_id("job-1", 1), bulk_profile_id("job-1", 3)]
+    assert len(qr_store.stored) == 2
+
+
+async def make_service(db, chunk_size=4):
+    await db.esim_profiles.create_index("profile_id", unique=True)
+    await db.esim_profiles.create_index("iccid", unique=True)
+    return ProvisioningService(db, ESIMService(db), chunk_size=chunk_size)
+
+
+@pytest.mark.asyncio
+async def test_job_provisions_all_profiles_and_reports_failures(mongo_db):
+    service = await make_service(mongo_db)
+    esim = service.esim_service
+    # An ICCID collision on item 5 must be reported, not abort the chunk
+    iccids = iter([f"8995900000000000{n:03d}" for n in range(9)])
+
+    async def allocate_many(count):
+        return [next(iccids) for _ in range(count)]
+
+    esim.iccid_allocator.allocate_many = allocate_many
+    await mongo_db.esim_profiles.insert_one({"profile_id": "existing", "iccid": "8995900000000000005"})
+
+    job = await service.submit("partner-1", 9, device_type="ios")
+    await service.run_job(await service.claim())
+
+    status = await service.get_job(job["job_id"], "partner-1")
+    assert status["status"] == "completed_with_errors"
+    assert (status["created"], status["failed"], status["next_index"]) == (8, 1, 9)
+    assert status["failures"][0]["index"] == 5
+    assert await mongo_db.esim_profiles.count_documents({"job_id": job["job_id"]}) == 8
+    assert await service.claim() is None
+
+
+@pytest.mark.asyncio
+async def test_job_resumes_after_a_crash_without_duplicates(mongo_db):
+    service = await make_service(mongo_db)
+    job = await service.submit("partner-1", 10)
+    claimed = await service.claim()
+
+    # Crash after inserting the first chunk but before its checkpoint
+    await service._provision_chunk(claimed, 0, 4)
+    await mongo_db.provisioning_jobs.update_one({"job_id": job["job_id"]}, {"$set": {"lease_until": claimed["created_at"]}})
+
+    other_worker = await make_service(mongo_db)
+    other_worker.worker_id = "other:1"
+    resumed = await other_worker.claim()
+    assert resumed["attempts"] == 2
+    await other_worker.run_job(resumed)
+
+    status = await other_worker.get_job(job["job_id"])
+    assert (status["status"], status["created"], status["failed"]) == ("completed", 10, 0)
+    assert await mongo_db.esim_profiles.count_documents({"job_id": job["job_id"]}) == 10
+    # The replayed chunk stored no QR images for profiles it skipped
+    assert await mongo_db["qr_codes.files"].count_documents({}) == 10
@@ -0,0 +1,63 @@
+"""
+Tests for the content-addressed QR code store
+"""
+
+import asyncio
+
+import pytest
+
+from services.qr_store import QRCodeStore, qr_key, render_qr_batch, render_qr_png
+
+ACTIVATION_CODE = "LPA:1$esim.com.mm$0123456789ABCDEF0123$"
+
+
+def test_render_produces_png():
+    png = render_qr_png(ACTIVATION_CODE)
+
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    assert qr_key(ACTIVATION_CODE) == qr_key(ACTIVATION_CODE)
+    assert qr_key(ACTIVATION_CODE) != qr_key(ACTIVATION_CODE + "x")
+
+
+@pytest.mark.asyncio
+async def test_store_is_content_addressed(mongo_db):
+    store = QRCodeStore(mongo_db)
+
+    keys = await asyncio.gather(*(store.store(ACTIVATION_CODE) for _ in range(3)))
+
+    assert set(keys) == {qr_key(ACTIVATION_CODE)}
+    assert await mongo_db["qr_codes.files"].count_documents({}) == 1
+    assert await store.load(keys[0]) == render_qr_png(ACTIVATION_CODE)
+
+
+@pytest.mark.asyncio
+async def test_delete_removes_image(mongo_db):
+    store = QRCodeStore(mongo_db)
+    key = await store.store(ACTIVATION_CODE)
+
+    await store.delete(key)
+    await store.delete(key)
+
+    assert await store.load(key) is None
+
+
+def test_batch_render_runs_in_a_process_pool():
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        pngs = pool.submit(render_qr_batch, [ACTIVATION_CODE, ACTIVATION_CODE + "x"]).result()
+
+    assert pngs[0] == render_qr_png(ACTIVATION_CODE)
+    assert len(pngs) == 2
+
+
+@pytest.mark.asyncio
+async def test_store_many_skips_existing_images(mongo_db):
+    store = QRCodeStore(mongo_db)
+    await store.store(ACTIVATION_CODE)
+    codes = [ACTIVATION_CODE] + [f"LPA:1$esim.com.mm${n:020d}$" for n in range(5)]
+
+    keys = await store.store_many(codes, batch_size=2)
+
+    assert keys == [qr_key(code) for code in codes]
+    assert await mongo_db["qr_codes.files"].count_documents({}) == 6
@@ -0,0 +1,144 @@
+"""
+Tests for pending-payment reconciliation
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from services.payment_service import AYAPayGateway, KBZPayGateway, PaymentService, WaveMoneyGateway
+from services.reconciliation_service import GatewayLimiter, ReconciliationService
+from tests.mock_gateway import MockGateway
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+class RecordingPayments:
+    """Stands in for PaymentService: records callbacks instead of applying them"""
+
+    def __init__(self, gateways):
+        self.gateways = gateways
+        self.callbacks = []
+
+    async def process_callback(self, transaction_id, gateway_transaction_id, status, gateway_response):
+        self.callbacks.append((transaction_id, status))
+
+
+def make_service(payments, **kwargs):
+    db = SimpleNamespace(transactions=None, reconciliation_reports=None, app_meta=None)
+    return ReconciliationService(db, payments, clock=lambda: NOW, **kwargs)
+
+
+def pending(transaction_id, gateway="mock", age=timedelta(hours=1)):
+    return {
+        "transaction_id": transaction_id,
+        "payment_method": gateway,
+        "gateway_transaction_id": f"gw-{transaction_id}",
+        "created_at": NOW - age,
+    }
+
+
+@pytest.mark.asyncio
+async def test_gateway_answers_are_applied_through_process_callback():
+    gateway = MockGateway({"gw-paid": "SUCCESS", "gw-declined": "declined"})
+    payments = RecordingPayments({"mock": gateway})
+    service = make_service(payments)
+
+    outcomes = [
+        await service._reconcile_one(pending("paid"), NOW),
+        await service._reconcile_one(pending("declined"), NOW),
+        await service._reconcile_one(pending("waiting"), NOW),
+        await service._reconcile_one(pending("abandoned", age=timedelta(days=2)), NOW),
+        await service._reconcile_one(pending("cash", gateway="card"), NOW),
+        await service._reconcile_one(pending("old-cash", gateway="card", age=timedelta(days=2)), NOW),
+    ]
+
+    assert outcomes == ["completed", "failed", "still_pending", "expired", "skipped", "expired"]
+    assert payments.callbacks == [
+        ("paid", "completed"), ("declined", "failed"), ("abandoned", "expired"), ("old-cash", "expired")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_placeholder_gateways_are_never_reconciled_to_completed():
+    # Their verify_payment always answers "completed" without asking the gateway
+    payments = RecordingPayments({
+        "kbz_pay": KBZPayGateway("merchant", "key"),
+        "wave_money": WaveMoneyGateway("merchant", "key"),
+        "aya_pay": AYAPayGateway("merchant", "key"),
+    })
+    service = make_service(payments)
+
+    outcomes = [
+        await service._reconcile_one(pending(name, gateway=name, age=age), NOW)
+        for name in payments.gateways
+        for age in (timedelta(hours=1), timedelta(days=2))
+    ]
+
+    # Recent ones are left alone; abandoned ones expire without asking the gateway
+    assert outcomes == ["skipped", "expired"] * 3
+    assert payments.callbacks == [(name, "expired") for name in payments.gateways]
+    assert "completed" not in outcomes
+
+
+@pytest.mark.asyncio
+async def test_per_gateway_concurrency_cap():
+    slow = MockGateway(latency=0.02)
+    fast = MockGateway(latency=0.02)
+    payments = RecordingPayments({"slow": slow, "fast": fast})
+    service = make_service(
+        payments,
+        gateway_concurrency={"slow": 2},
+        default_concurrency=8,
+        default_rate_per_second=0,
+    )
+
+    await asyncio.gather(*(
+        service._reconcile_one(pending(f"{name}-{i}", gateway=name), NOW)
+        for i in range(8) for name in ("slow", "fast")
+    ))
+
+    assert slow.max_in_flight == 2
+    assert fast.max_in_flight == 8
+
+
+@pytest.mark.asyncio
+async def test_limiter_spaces_calls_to_the_rate():
+    limiter = GatewayLimiter(concurrency=10, rate_per_second=100)
+    loop = asyncio.get_running_loop()
+    started = []
+
+    async def call():
+        async with limiter:
+            started.append(loop.time())
+
+    await asyncio.gather(*(call() for _ in range(5)))
+
+    # Five calls at 100/s span four 10ms intervals (less a little event loop clock slack)
+    assert started[-1] - started[0] >= 0.035
+
+
+@pytest.mark.asyncio
+async def test_run_pages_through_pending_and_writes_report(mongo_db):
+    gateway = MockGateway({"gw-t0": "completed", "gw-t3": "failed"}, failing={"gw-t4"})
+    payments = PaymentService(mongo_db, gateways={"mock": gateway})
+    await mongo_db.transactions.insert_many([
+        {**pending(f"t{i}", age=timedelta(hours=1, minutes=i)), "status": "pending", "plan_id": "p", "user_id": "u"}
+        for i in range(5)
+    ] + [
+        {**pending("fresh", age=timedelta(minutes=1)), "status": "pending", "plan_id": "p", "user_id": "u"},
+    ])
+    service = ReconciliationService(mongo_db, payments, page_size=2, clock=lambda: NOW)
+
+    report = await service.run()
+
+    assert report["checked"] == 5
+    assert report["promo_holds_released"] == 0
+    assert report["outcomes"] == {"completed": 1, "failed": 1, "still_pending": 2, "error": 1}
+    assert report["errors"] == [{"transaction_id": "t4", "error": "Gateway unavailable"}]
+    assert "gw-fresh" not in [call[0] for call in gateway.calls]
+    statuses = {t["transaction_id"]: t["status"] async for t in mongo_db.transactions.find()}
+    assert (statuses["t0"], statuses["t3"], statuses["t1"]) == ("completed", "failed", "pending")
+    assert (await service.recent_reports())[0]["report_id"] == report["report_id"]
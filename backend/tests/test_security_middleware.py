@@ -0,0 +1,75 @@
+"""
+Tests for the ASGI security middlewares
+"""
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from middleware.security import RateLimitMiddleware, RequestLoggingMiddleware, SecurityHeadersMiddleware
+from middleware.rate_limiter import TokenBucketLimiter
+
+
+def make_app(**rate_limit) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/items")
+    async def items():
+        return {"items": []}
+
+    @app.get("/api/qr.png")
+    async def qr():
+        return Response(b"png", headers={"Cache-Control": "private, max-age=86400", "Server": "uvicorn"})
+
+    @app.get("/page")
+    async def page():
+        return {"ok": True}
+
+    app.add_middleware(RequestLoggingMiddleware)
+    app.add_middleware(SecurityHeadersMiddleware)
+    app.add_middleware(RateLimitMiddleware, limiter=TokenBucketLimiter(), **rate_limit)
+    return app
+
+
+def client(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_security_headers_and_request_id():
+    async with client(make_app()) as c:
+        api = await c.get("/api/items")
+        page = await c.get("/page")
+
+    assert api.json() == {"items": []}
+    assert api.headers["x-frame-options"] == "DENY"
+    assert api.headers["content-security-policy"].startswith("default-src 'self'; script-src")
+    assert api.headers["cache-control"].startswith("no-store")
+    assert api.headers["pragma"] == "no-cache"
+    assert len(api.headers["x-request-id"]) == 16
+    assert api.headers["x-request-id"] != page.headers["x-request-id"]
+
+    assert page.headers["strict-transport-security"].startswith("max-age=63072000")
+    assert "cache-control" not in page.headers
+
+
+@pytest.mark.asyncio
+async def test_route_cache_control_is_kept_and_server_header_removed():
+    async with client(make_app()) as c:
+        response = await c.get("/api/qr.png")
+
+    assert response.headers.get_list("cache-control") == ["private, max-age=86400"]
+    assert "pragma" not in response.headers
+    assert "server" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_requests_get_429():
+    async with client(make_app(requests_per_minute=2)) as c:
+        statuses = [(await c.get("/api/items")).status_code for _ in range(3)]
+        rejected = await c.get("/api/items")
+
+    assert statuses == [200, 200, 429]
+    assert rejected.headers["retry-after"] == "60"
+    assert rejected.json() == {"detail": "Rate limit exceeded. Please slow down."}
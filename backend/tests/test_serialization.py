@@ -0,0 +1,36 @@
+"""
+Tests for the orjson response serializer
+"""
+
+from datetime import datetime
+from decimal import Decimal
+import json
+
+from bson import Decimal128, ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from utils.responses import ORJSONResponse
+from utils.serialization import dumps, serialize_doc
+
+
+def test_matches_legacy_serialization():
+    doc = {
+        "_id": ObjectId(),
+        "profile_id": "p1",
+        "created_at": datetime(2025, 1, 2, 3, 4, 5, 678000),
+        "expiry_date": datetime(2025, 2, 1),
+        "owner": ObjectId("65a1b2c3d4e5f6a7b8c9d0e1"),
+        "devices": [{"registered_at": datetime(2025, 1, 3), "imei": None}],
+        "data_used_gb": 1.5,
+    }
+
+    legacy = json.loads(json.dumps(jsonable_encoder(serialize_doc(doc))))
+    doc.pop("_id")
+
+    assert json.loads(dumps(doc)) == legacy
+
+
+def test_decimal_and_bson_types():
+    content = {"price": Decimal("5000"), "rate": Decimal("0.25"), "total": Decimal128("12.50"), "tags": {"5g"}}
+
+    assert json.loads(ORJSONResponse(content).body) == {"price": 5000, "rate": 0.25, "total": 12.5, "tags": ["5g"]}
@@ -0,0 +1,74 @@
+"""
+Tests for the cached /api/status counters
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from services.status_aggregator import StatusAggregator
+
+
+class FakeCollection:
+    def __init__(self, total=0, active=0):
+        self.total, self.active = total, active
+        self.docs = {}
+        self.counts = 0
+
+    async def estimated_document_count(self):
+        self.counts += 1
+        return self.total
+
+    async def count_documents(self, query):
+        self.counts += 1
+        return self.active
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = dict(doc)
+
+
+def make_db():
+    return SimpleNamespace(
+        users=FakeCollection(total=10),
+        esim_profiles=FakeCollection(total=7, active=3),
+        app_meta=FakeCollection(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_cached_and_shared_between_workers():
+    db = make_db()
+    now = [datetime(2026, 1, 1)]
+    worker_a = StatusAggregator(db, refresh_interval_seconds=60, clock=lambda: now[0])
+    worker_b = StatusAggregator(db, refresh_interval_seconds=60, clock=lambda: now[0])
+
+    snapshot = await worker_a.snapshot()
+    assert snapshot["metrics"] == {"total_users": 10, "total_profiles": 7, "active_profiles": 3}
+    assert snapshot["stale_seconds"] == 0
+
+    now[0] += timedelta(seconds=20)
+    await worker_a.snapshot()
+    assert (await worker_b.snapshot())["stale_seconds"] == 20
+    assert db.esim_profiles.counts == 2  # Computed once, by one worker
+    assert worker_b.stats() == {"computed": 0, "adopted": 1}
+
+
+@pytest.mark.asyncio
+async def test_stale_snapshot_is_recomputed():
+    db = make_db()
+    now = [datetime(2026, 1, 1)]
+    aggregator = StatusAggregator(db, refresh_interval_seconds=60, clock=lambda: now[0])
+    await aggregator.refresh()
+
+    db.users.total = 11
+    now[0] += timedelta(seconds=61)
+    await aggregator.refresh()
+
+    snapshot = await aggregator.snapshot()
+    assert snapshot["metrics"]["total_users"] == 11
+    assert aggregator.stats()["computed"] == 2
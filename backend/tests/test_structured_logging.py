@@ -0,0 +1,85 @@
+"""
+Tests for the queued JSON logging pipeline and access log sampling
+"""
+
+import io
+import json
+import logging
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from middleware.security import RequestLoggingMiddleware
+from utils.structured_logging import configure_logging, request_id_var, shutdown_logging
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    shutdown_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_json_lines_written_by_listener(restore_root_logger):
+    stream = io.StringIO()
+    configure_logging(level="INFO", json_output=True, stream=stream)
+
+    token = request_id_var.set("abc123")
+    logging.getLogger("esim.test").info("issued %s", "profile", extra={"route": "/api/esim/profiles"})
+    request_id_var.reset(token)
+    logging.getLogger("esim.test").debug("not logged")
+    shutdown_logging()  # Drains the queue
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["message"] == "issued profile"
+    assert entry["trace_id"] == "abc123"
+    assert entry["route"] == "/api/esim/profiles"
+    assert entry["level"] == "INFO"
+
+
+def test_text_format_supports_trace_id(restore_root_logger):
+    stream = io.StringIO()
+    configure_logging(level="INFO", json_output=False, fmt="%(trace_id)s %(message)s", stream=stream)
+
+    logging.getLogger("esim.test").warning("plain")
+    shutdown_logging()
+
+    assert stream.getvalue() == "- plain\n"
+
+
+def make_app(**kwargs) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/esim/profiles/{profile_id}")
+    async def profile(profile_id: str):
+        if profile_id == "missing":
+            raise HTTPException(status_code=404)
+        return {"profile_id": profile_id}
+
+    app.add_middleware(RequestLoggingMiddleware, **kwargs)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_access_log_uses_route_template_and_samples_successes(caplog):
+    caplog.set_level(logging.INFO, logger="esim_security")
+    transport = httpx.ASGITransport(app=make_app(route_sample_rates={"/api/esim/profiles/{profile_id}": 0.25}))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for n in range(8):
+            await client.get(f"/api/esim/profiles/{n}")
+        await client.get("/api/esim/profiles/missing")
+        await client.get("/api/esim/12345")
+
+    records = [r for r in caplog.records if r.name == "esim_security"]
+    successes = [r for r in records if r.status == 200]
+    assert len(successes) == 2
+    assert all(r.sampled == 4 for r in successes)
+    assert {r.route for r in records} == {"/api/esim/profiles/{profile_id}", "/api/esim/[NUM]"}
+    # Errors are never sampled away
+    assert [r.status for r in records if r.levelno == logging.WARNING] == [404, 404]
@@ -0,0 +1,166 @@
+"""
+Tests for usage ingestion, aggregation and rollups
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from services.usage_service import BYTES_PER_GB, UsageFileImporter, UsageIngestor, parse_record
+
+ICCID = "89959000000000000016"
+OTHER = "89959000000000000024"
+
+
+class FakeCollection:
+    def __init__(self, name, fail_indexes=()):
+        self.name = name
+        self.fail_indexes = set(fail_indexes)
+        self.writes = []
+        self.docs = {}
+
+    async def bulk_write(self, ops, ordered=True):
+        applied = [op for i, op in enumerate(ops) if i not in self.fail_indexes]
+        self.writes.append(applied)
+        if self.fail_indexes:
+            failed = sorted(self.fail_indexes)
+            self.fail_indexes = set()
+            raise BulkWriteError({"writeErrors": [{"index": i, "code": 1} for i in failed]})
+        return SimpleNamespace(matched_count=len(ops))
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def update_one(self, query, update):
+        return SimpleNamespace(modified_count=0)
+
+    async def update_many(self, query, update):
+        for key in query["_id"]["$in"]:
+            self.docs[key].update(update["$set"])
+
+
+def make_ingestor(**fail):
+    db = SimpleNamespace(
+        esim_profiles=FakeCollection("esim_profiles", fail.get("profiles", ())),
+        usage_rollups=FakeCollection("usage_rollups", fail.get("rollups", ())),
+        usage_batches=FakeCollection("usage_batches"),
+    )
+    return UsageIngestor(db), db
+
+
+def profile_incs(db):
+    return {op._filter["iccid"]: op._doc["$inc"]["data_used_bytes"] for batch in db.esim_profiles.writes for op in batch}
+
+
+def test_parse_record_formats():
+    assert parse_record({"iccid": ICCID, "bytes": "100", "timestamp": "2026-01-01T10:30:00Z"}) == (
+        ICCID, 100, datetime(2026, 1, 1, 10, 30)
+    )
+    assert parse_record({"iccid": ICCID, "bytes_up": 5, "bytes_down": 7, "timestamp": 1767225600})[1] == 12
+    for bad in ({"iccid": "89959abc", "bytes": 1, "timestamp": 0}, {"iccid": ICCID, "bytes": -1, "timestamp": 0},
+                {"iccid": ICCID, "bytes": 1}):
+        with pytest.raises(ValueError):
+            parse_record(bad)
+
+
+@pytest.mark.asyncio
+async def test_records_are_aggregated_per_profile_and_bucket():
+    ingestor, db = make_ingestor()
+    records = [
+        {"iccid": ICCID, "bytes": BYTES_PER_GB, "timestamp": "2026-01-01T10:05:00"},
+        {"iccid": ICCID, "bytes": BYTES_PER_GB, "timestamp": "2026-01-01T10:55:00"},
+        {"iccid": ICCID, "bytes": 10, "timestamp": "2026-01-01T11:00:00"},
+        {"iccid": OTHER, "bytes": 1, "timestamp": "2026-01-02T00:00:00"},
+        {"iccid": "bad"},
+    ]
+
+    result = await ingestor.ingest(records)
+    assert (result["accepted"], result["rejected"]) == (4, 1)
+    assert result["errors"][0]["index"] == 4
+    assert await ingestor.flush() == 2
+
+    (profile_ops,) = db.esim_profiles.writes
+    assert len(profile_ops) == 2
+    assert profile_ops[0]._doc["$inc"]["data_used_gb"] == pytest.approx(2.0, rel=1e-6)
+    rollups = {op._filter["_id"]: op._doc["$inc"]["bytes"] for op in db.usage_rollups.writes[0]}
+    assert rollups == {
+        f"{ICCID}:hour:2026010110": 2 * BYTES_PER_GB,
+        f"{ICCID}:hour:2026010111": 10,
+        f"{ICCID}:day:2026010100": 2 * BYTES_PER_GB + 10,
+        f"{OTHER}:hour:2026010200": 1,
+        f"{OTHER}:day:2026010200": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_batch_ids_make_retries_idempotent():
+    ingestor, db = make_ingestor()
+    batch = [{"iccid": ICCID, "bytes": 5, "timestamp": "2026-01-01T10:00:00"}]
+
+    assert (await ingestor.ingest(batch, batch_id="b1"))["accepted"] == 1
+    assert (await ingestor.ingest(batch, batch_id="b1"))["duplicate"] is True
+    await ingestor.flush()
+    assert (await ingestor.ingest(batch, batch_id="b1"))["duplicate"] is True
+
+    assert db.usage_batches.docs["b1"]["state"] == "flushed"
+    assert profile_incs(db) == {ICCID: 5}
+
+
+@pytest.mark.asyncio
+async def test_only_failed_writes_are_retried():
+    ingestor, db = make_ingestor(profiles=[1])
+    await ingestor.ingest([
+        {"iccid": ICCID, "bytes": 5, "timestamp": "2026-01-01T10:00:00"},
+        {"iccid": OTHER, "bytes": 7, "timestamp": "2026-01-01T10:00:00"},
+    ])
+
+    with pytest.raises(RuntimeError):
+        await ingestor.flush()
+    await ingestor.flush()
+
+    assert [{op._filter["iccid"] for op in batch} for batch in db.esim_profiles.writes] == [{ICCID}, {OTHER}]
+    # Rollups were written once, on the first flush
+    assert len(db.usage_rollups.writes) == 1
+
+
+@pytest.mark.asyncio
+async def test_file_importer_reads_csv_and_ndjson(tmp_path):
+    ingestor, db = make_ingestor()
+    (tmp_path / "cdr-1.csv").write_text(
+        "iccid,bytes_up,bytes_down,timestamp\n"
+        f"{ICCID},100,200,2026-01-01T10:00:00\n"
+        "not-an-iccid,1,1,2026-01-01T10:00:00\n"
+    )
+    (tmp_path / "cdr-2.ndjson").write_text(
+        f'{{"iccid": "{OTHER}", "bytes": 50, "timestamp": 1767261600}}\n'
+        "{broken\n"
+    )
+    importer = UsageFileImporter(ingestor, str(tmp_path), batch_size=1)
+
+    assert await importer.scan() == 2
+
+    assert profile_incs(db) == {ICCID: 300, OTHER: 50}
+    processed = sorted(p.name for p in (tmp_path / "processed").iterdir())
+    assert [name.split(".")[0] for name in processed] == ["cdr-1", "cdr-2"]
+    assert [name.rsplit(".", 1)[1] for name in processed] == ["csv", "ndjson"]
+    assert not list(tmp_path.glob("*.processing"))
+    assert ingestor.stats()["rejected"] == 2
+    assert all(doc["state"] == "flushed" for doc in db.usage_batches.docs.values())
+
+
+@pytest.mark.asyncio
+async def test_file_importer_accepts_reused_file_names(tmp_path):
+    ingestor, db = make_ingestor()
+    importer = UsageFileImporter(ingestor, str(tmp_path), batch_size=1)
+
+    (tmp_path / "usage.csv").write_text(f"iccid,bytes,timestamp\n{ICCID},100,2026-01-01T10:00:00\n")
+    assert await importer.scan() == 1
+    (tmp_path / "usage.csv").write_text(f"iccid,bytes,timestamp\n{ICCID},40,2026-01-02T10:00:00\n")
+    assert await importer.scan() == 1
+
+    assert sum(op._doc["$inc"]["data_used_bytes"] for batch in db.esim_profiles.writes for op in batch) == 140
+    assert len(list((tmp_path / "processed").iterdir())) == 2
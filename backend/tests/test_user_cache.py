@@ -0,0 +1,78 @@
+"""
+Tests for the authenticated user cache
+"""
+
+import pytest
+from prometheus_client import REGISTRY
+
+from services.metrics import SERVICE_STATS
+from services.user_cache import UserCache
+from tests.fake_redis import FakeClock
+
+
+def _user(n: int) -> dict:
+    return {"user_id": f"u{n}", "email": f"user{n}@example.com", "status": "active", "role": "customer"}
+
+
+def test_hit_miss_and_ttl_expiry():
+    clock = FakeClock()
+    cache = UserCache(ttl_seconds=60, clock=clock)
+
+    assert cache.get("user1@example.com") is None
+    cache.put(_user(1))
+    assert cache.get("user1@example.com")["user_id"] == "u1"
+
+    clock.advance(60)
+    assert cache.get("user1@example.com") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_hits_and_misses_are_exported():
+    cache = UserCache(clock=FakeClock())
+    cache.put(_user(1))
+    cache.get("user1@example.com")
+    cache.get("user2@example.com")
+    cache.get("user3@example.com")
+
+    SERVICE_STATS.register("user_cache", cache.stats)
+    try:
+        assert REGISTRY.get_sample_value("esim_user_cache_hits_total") == 1
+        assert REGISTRY.get_sample_value("esim_user_cache_misses_total") == 2
+        assert REGISTRY.get_sample_value("esim_user_cache_size") == 1
+    finally:
+        SERVICE_STATS.clear()
+
+
+def test_lru_eviction():
+    cache = UserCache(max_entries=2, clock=FakeClock())
+    cache.put(_user(1))
+    cache.put(_user(2))
+    cache.get("user1@example.com")
+    cache.put(_user(3))
+
+    assert cache.get("user2@example.com") is None
+    assert cache.get("user1@example.com") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_by_user_id():
+    cache = UserCache(clock=FakeClock())
+    cache.put(_user(1))
+
+    await cache.invalidate(user_id="u1")
+
+    assert cache.get("user1@example.com") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_lookup_racing_an_invalidation_is_not_cached():
+    cache = UserCache(clock=FakeClock())
+
+    generation = cache.generation
+    await cache.invalidate(user_id="u1")
+    cache.put({**_user(1), "status": "active"}, generation=generation)
+
+    assert cache.get("user1@example.com") is None
@@ -0,0 +1,182 @@
+"""
+Tests for the MongoDB-backed verification order store
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from services.nexora_ai_service import NexoraAIService, VerificationStatus
+from services.verification_store import OrderUpdateConflict, VerificationOrderStore, decode_order, encode_order
+
+
+class FakeOrders:
+    """The subset of verification_orders operations the store uses"""
+
+    def __init__(self):
+        self.docs = {}
+        self.payload_reads = 0
+        self.interfere = None  # Called before each update_one, to simulate another worker
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one(self, query, projection):
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc["expires_at"] <= query["expires_at"]["$gt"]:
+            return None
+        result = {"version": doc["version"]}
+        payload = projection["payload"]
+        if payload == 1 or doc["version"] != payload["$cond"][0]["$eq"][1]:
+            result["payload"] = doc["payload"]
+            self.payload_reads += 1
+        return result
+
+    async def update_one(self, query, update):
+        if self.interfere is not None:
+            interfere, self.interfere = self.interfere, None
+            await interfere()
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc["version"] != query["version"]:
+            return SimpleNamespace(matched_count=0)
+        doc.update(update["$set"])
+        return SimpleNamespace(matched_count=1)
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1)
+
+    def __call__(self):
+        return self.now
+
+
+def make_order(service=None):
+    service = service or NexoraAIService()
+    return service.run_full_verification(
+        user_id="user_1",
+        phone="09421234567",
+        provider="MPT",
+        device_type="ios",
+        device_model="iPhone 15 Pro",
+        os_version="17.2"
+    )
+
+
+def make_workers(count=2, **kwargs):
+    db = SimpleNamespace(verification_orders=FakeOrders())
+    clock = Clock()
+    return [VerificationOrderStore(db, clock=clock, **kwargs) for _ in range(count)], db.verification_orders, clock
+
+
+def test_encode_round_trip():
+    order = make_order()
+    decoded = decode_order(encode_order(order))
+    assert decoded == order
+    assert decoded.overall_status is order.overall_status
+    assert not hasattr(order, "__dict__")
+
+
+@pytest.mark.asyncio
+async def test_orders_are_shared_between_workers():
+    (first, second), orders, _ = make_workers()
+    order = make_order()
+    await first.create(order)
+
+    assert await second.get(order.order_id) == order
+
+    def add_payment(o):
+        o.overall_status = VerificationStatus.VERIFIED
+    await first.update(order.order_id, add_payment)
+
+    # second has version 1 cached and must not serve it
+    assert (await second.get(order.order_id)).overall_status == VerificationStatus.VERIFIED
+
+
+@pytest.mark.asyncio
+async def test_unchanged_reads_skip_the_payload():
+    (store,), orders, _ = make_workers(1)
+    order = make_order()
+    await store.create(order)
+
+    for _ in range(3):
+        assert await store.get(order.order_id) == order
+    assert orders.payload_reads == 0
+    assert store.stats()["hits"] == 3
+
+
+@pytest.mark.asyncio
+async def test_update_retries_after_concurrent_write():
+    (first, second), orders, _ = make_workers()
+    order = make_order()
+    await first.create(order)
+
+    async def other_worker():
+        await second.update(order.order_id, lambda o: o.verifications.pop())
+
+    orders.interfere = other_worker
+    updated = await first.update(order.order_id, lambda o: setattr(o, "overall_status", VerificationStatus.FAILED))
+
+    # Both writes survive: the retry re-applied the change on top of the other worker's
+    assert first.conflicts == 1
+    assert updated.overall_status == VerificationStatus.FAILED
+    assert len(updated.verifications) == len(order.verifications) - 1
+    assert await second.get(order.order_id) == updated
+
+
+@pytest.mark.asyncio
+async def test_update_gives_up_under_constant_contention():
+    (store,), orders, _ = make_workers(1)
+    order = make_order()
+    await store.create(order)
+
+    async def bump():
+        orders.docs[order.order_id]["version"] += 1
+        orders.interfere = bump
+
+    orders.interfere = bump
+    with pytest.raises(OrderUpdateConflict):
+        await store.update(order.order_id, lambda o: None)
+
+
+@pytest.mark.asyncio
+async def test_expired_orders_are_gone_and_cache_is_bounded():
+    (store,), orders, clock = make_workers(1, ttl_hours=1, cache_size=2)
+    created = []
+    for n in range(3):
+        order = make_order()
+        order.order_id = f"ORD{n}"
+        await store.create(order)
+        created.append(order)
+
+    assert store.stats()["cached"] == 2
+    assert await store.get("ORD0") == created[0]
+
+    clock.now += timedelta(hours=2)
+    assert await store.get("ORD1") is None
+    assert await store.update("ORD2", lambda o: None) is None
+
+
+@pytest.mark.asyncio
+async def test_service_requires_store():
+    with pytest.raises(RuntimeError):
+        await NexoraAIService().get_verification_status("ORD")
+
+
+@pytest.mark.asyncio
+async def test_mongo_store(mongo_db):
+    await mongo_db.verification_orders.create_index("expires_at", expireAfterSeconds=0)
+    first, second = VerificationOrderStore(mongo_db), VerificationOrderStore(mongo_db)
+    order = make_order()
+    await first.create(order)
+    await first.create(order)
+
+    assert await second.get(order.order_id) == order
+    await first.update(order.order_id, lambda o: setattr(o, "overall_status", VerificationStatus.FAILED))
+    assert (await second.get(order.order_id)).overall_status == VerificationStatus.FAILED
+    assert await second.get(order.order_id) is not None
+    assert second.stats()["hits"] == 1
@@ -2,6 +2,11 @@
 Utility functions for eSIM Myanmar Platform
 """
 
-from .serialization import serialize_doc, serialize_list
+from .serialization import serialize_doc, serialize_list, dumps
+from .responses import ORJSONResponse
+from .redis_client import create_redis_client
+from .pagination import paginate, build_projection, encode_cursor, decode_cursor
+from .structured_logging import configure_logging, request_id_var
 
-__all__ = ["serialize_doc", "serialize_list"]
+__all__ = ["serialize_doc", "serialize_list", "dumps", "ORJSONResponse", "create_redis_client",
+           "paginate", "build_projection", "encode_cursor", "decode_cursor", "configure_logging", "request_id_var"]
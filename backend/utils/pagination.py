@@ -0,0 +1,91 @@
+"""
+Keyset pagination utilities
+Cursor-based paging over (user_id, created_at, <id field>) indexes with
+whitelisted field projections pushed down to MongoDB
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, item_id: str) -> str:
+    """Encode the sort key of the last item on a page as an opaque cursor"""
+    raw = json.dumps({"t": created_at.isoformat(), "id": item_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"]), str(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def build_projection(
+    fields: Optional[str],
+    allowed: Iterable[str],
+    id_field: str,
+    exclude: Iterable[str] = ()
+) -> Dict[str, int]:
+    """
+    Build a Motor projection from a comma-separated fields= parameter
+    Without fields, returns an exclusion projection dropping heavy fields
+    """
+    if not fields:
+        projection = {"_id": 0}
+        projection.update({name: 0 for name in exclude})
+        return projection
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(requested) - set(allowed))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    # The sort key is always needed to build the next cursor
+    projection = {"_id": 0, id_field: 1, "created_at": 1}
+    projection.update({name: 1 for name in requested})
+    return projection
+
+
+async def paginate(
+    collection,
+    query: Dict[str, Any],
+    id_field: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, int]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch one page of documents, newest first
+    Returns (items, next_cursor); next_cursor is None on the last page
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = dict(query)
+
+    if cursor:
+        created_at, item_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, id_field: {"$lt": item_id}},
+        ]
+
+    # Fetch one extra document to know whether another page exists
+    docs = await collection.find(query, projection or {"_id": 0}).sort(
+        [("created_at", -1), (id_field, -1)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last["created_at"], last[id_field])
+
+    return docs, next_cursor
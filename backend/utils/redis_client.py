@@ -0,0 +1,21 @@
+"""
+Shared Redis client for eSIM Myanmar Platform
+Redis is optional: features fall back to in-process state when REDIS_URL is unset
+"""
+
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def create_redis_client(redis_url: Optional[str]):
+    """Return an asyncio Redis client for redis_url, or None if Redis is not configured"""
+    if not redis_url:
+        return None
+    try:
+        import redis.asyncio as redis_asyncio
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed; Redis features disabled")
+        return None
+    return redis_asyncio.from_url(redis_url)
@@ -0,0 +1,19 @@
+"""
+Response classes for eSIM Myanmar Platform
+"""
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from .serialization import dumps
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson, with ObjectId and Decimal support
+    Route handlers returning this directly also skip FastAPI's jsonable_encoder pass
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
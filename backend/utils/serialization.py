@@ -4,8 +4,12 @@ Handles ObjectId and datetime conversion to JSON-serializable formats
 """
 
 from datetime import datetime
+from decimal import Decimal
 from typing import Any, Dict, List, Optional
-from bson import ObjectId
+
+import orjson
+from bson import Decimal128, ObjectId
+from pydantic import BaseModel
 
 
 def serialize_doc(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
@@ -43,3 +47,27 @@ def serialize_list(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     Serialize a list of MongoDB documents
     """
     return [serialize_doc(doc) for doc in docs if doc is not None]
+
+
+def json_default(value: Any) -> Any:
+    """
+    orjson fallback for BSON and other types it does not encode natively
+    datetime, date, UUID and Enum are handled by orjson itself
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    if isinstance(value, Decimal):
+        # Same convention as FastAPI's jsonable_encoder
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes in a single pass"""
+    return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
@@ -106,14 +106,10 @@ const CustomerDashboard = () => {
                   </span>
                 </div>
 
-                {profile.qr_code ? (
-                  <div className="bg-white p-4 rounded-lg mb-4 inline-block">
-                    <img src={profile.qr_code} alt="QR Code" className="w-48 h-48" />
-                  </div>
-                ) : profile.lpa_string && (
+                {(profile.activation_code || profile.lpa_string) && (
                   <div className="bg-white p-4 rounded-lg mb-4 inline-block">
                     <QRCodeSVG 
-                      value={profile.lpa_string}
+                      value={profile.activation_code || profile.lpa_string}
                       size={192}
                       level="H"
                       includeMargin={true}
@@ -0,0 +1,38 @@
+-- Atomic promo code redemption
+-- A single conditional UPDATE: Postgres re-checks the WHERE clause after taking
+-- the row lock, so concurrent redemptions cannot push used_count past usage_limit.
+-- A usage_limit of NULL or 0 means unlimited.
+
+create or replace function public.redeem_promo_code(p_code text)
+returns setof public.promo_codes
+language sql
+security definer
+set search_path = public
+as $$
+    update public.promo_codes
+       set used_count = coalesce(used_count, 0) + 1
+     where code = p_code
+       and is_active
+       and (valid_from is null or valid_from <= now())
+       and (valid_until is null or valid_until >= now())
+       and (coalesce(usage_limit, 0) = 0 or coalesce(used_count, 0) < usage_limit)
+    returning *;
+$$;
+
+create or replace function public.increment_promo_usage(p_promo_id uuid)
+returns setof public.promo_codes
+language sql
+security definer
+set search_path = public
+as $$
+    update public.promo_codes
+       set used_count = coalesce(used_count, 0) + 1
+     where id = p_promo_id
+       and (coalesce(usage_limit, 0) = 0 or coalesce(used_count, 0) < usage_limit)
+    returning *;
+$$;
+
+revoke all on function public.redeem_promo_code(text) from public, anon, authenticated;
+revoke all on function public.increment_promo_usage(uuid) from public, anon, authenticated;
+grant execute on function public.redeem_promo_code(text) to service_role;
+grant execute on function public.increment_promo_usage(uuid) to service_role;